@@ -1,15 +1,17 @@
 # app.py
 import io
-import pandas as pd
+import sqlite3
 import streamlit as st
 from pathlib import Path
-from PIL import Image
 
-from chatbot.extract_text import extract_form_bytes
-from chatbot.blob_uploader import save_csv_to_blob
-from chatbot.openai_client import OpenAIClient
-from chatbot.reply_generator import ReplyGenerator
-from chatbot.sanity_check import data_sanity_check
+from chatbot.dedup import get_index, pdf_fingerprint, persist_outcome
+from chatbot.extract_text import extraction_cache_stats
+from chatbot.jobs import get_job, job_referrals, submit_job
+from chatbot.persist_queue import save_status
+from chatbot.reply_renderer import reply_stats
+from chatbot.pipeline import build_record
+
+JOB_POLL_SECONDS = 0.5
 
 
 st.set_page_config(
@@ -21,7 +23,7 @@ st.set_page_config(
 # Logo + Title
 logo_path = Path(__file__).parent / "cpe-government-of-alberta-logo.jpg"
 if logo_path.exists():
-    st.image(Image.open(logo_path), width=220)
+    st.image(str(logo_path), width=220)
 st.title("Surgical Referral Form Assistant")
 
 # State for last response
@@ -35,32 +37,150 @@ if "last_failed" not in st.session_state:  # NEW: store sanity_check list
     st.session_state.last_failed = None
 if "last_message" not in st.session_state:  # NEW: store full reply from LLM
     st.session_state.last_message = None
+if "last_save_id" not in st.session_state:  # tracking id of the last queued save
+    st.session_state.last_save_id = None
+if "last_duplicates" not in st.session_state:  # earlier forms like the last one (chatbot.dedup)
+    st.session_state.last_duplicates = None
+if "last_outcome" not in st.session_state:  # the whole outcome, for persist_outcome
+    st.session_state.last_outcome = None
+if "last_referrals" not in st.session_state:  # every referral form in the last PDF (bundles hold several)
+    st.session_state.last_referrals = []
+if "referral_saves" not in st.session_state:  # document number -> (save id, already saved)
+    st.session_state.referral_saves = {}
+if "job_id" not in st.session_state:  # validation job still running for this session
+    # the last job id is kept in the URL, so a refresh reattaches to it
+    st.session_state.job_id = st.query_params.get("job")
+if "job_error" not in st.session_state:
+    st.session_state.job_error = None
 
 # ----- helpers -----
-def dict_to_lines(d: dict) -> str:
-    return "\n".join(f"{k}: {v}" for k, v in (d or {}).items())
-
 def badge(label: str) -> str:
     colors = {"PASS":"#16a34a","FAIL":"#dc2626"}
     lab = (label or "").upper()
     return f"<span style='background:{colors.get(lab, '#374151')};color:#fff;padding:6px 12px;border-radius:8px;font-weight:600'>{lab}</span>"
 
 def dict_to_csv_bytes(d: dict) -> bytes:
-    df = pd.DataFrame([d or {}])
+    return records_to_csv_bytes([d or {}])
+
+def records_to_csv_bytes(records: list) -> bytes:
+    import pandas as pd  # only needed once a result is shown, keep it off the cold start
+
+    df = pd.DataFrame(records)
     buf = io.StringIO()
     df.to_csv(buf, index=False)
     return buf.getvalue().encode("utf-8")
 
+def show_outcome(outcome: dict) -> None:
+    """Keep a finished validation in session state so it stays visible at top."""
+    st.session_state.last_result = outcome["result"]
+    st.session_state.last_text = outcome["text"]
+    st.session_state.last_data = outcome["data"]            # extracted fields
+    st.session_state.last_failed = outcome["check"]         # NEW: sanity_check list
+    st.session_state.last_message = outcome["reply"]
+    save_id, already_saved = st.session_state.referral_saves.get(outcome.get("document", 1), (None, False))
+    st.session_state.last_save_id = save_id
+    st.session_state.last_already_saved = already_saved
+    st.session_state.last_duplicates = outcome.get("duplicates") or []
+    st.session_state.last_outcome = outcome
+
+def show_referrals(outcomes: list) -> None:
+    """A finished PDF: keep all its referrals and show the first."""
+    st.session_state.last_referrals = outcomes
+    st.session_state.referral_saves = {}
+    st.session_state.pop("referral_pick", None)
+    show_outcome(outcomes[0])
+
+def pick_referral() -> None:
+    show_outcome(st.session_state.last_referrals[st.session_state.referral_pick])
+
+def describe_duplicate(match: dict) -> str:
+    when = f"{match['validated_at']} UTC" + (f" ({match['filename']})" if match.get("filename") else "")
+    if match["kind"] == "exact":
+        return f"The same file was validated on {when}: {match['verdict']}."
+    if match["kind"] == "same_fields":
+        return f"A form with the same contents was validated on {when}: {match['verdict']}."
+    differs = ", ".join(match["differs"]) or "formatting only"
+    return f"A similar form ({match['similarity']:.0%} of fields match) was validated on {when}: {match['verdict']}. Differs in: {differs}."
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id: str) -> None:
+    """Poll a validation job; shows the verdict while the reply streams, reruns the page when done."""
+    job = get_job(job_id)
+    if job is None:  # purged, or a stale link
+        st.session_state.job_id = None
+        st.rerun()
+    if job["status"] in ("queued", "running"):
+        if job["verdict"]:
+            st.markdown(badge(job["verdict"]), unsafe_allow_html=True)
+            if job["verdict"] != "PASS":
+                st.write(job["partial"] or "")
+        else:
+            st.info("Reading form..." if job["status"] == "running" else "Waiting for a free worker...")
+        return
+
+    if job["status"] == "done":
+        show_referrals(job_referrals(job))
+        st.session_state.job_error = None
+    else:
+        st.session_state.job_error = job["error"]
+    st.session_state.job_id = None
+    st.rerun()
+
 def update_case_management(data: dict) -> bool:
     """Stub: replace with your real integration (e.g., Salesforce)."""
     # TODO: push `data` to your case management system
     return True
 
+# ----- sidebar: cache effectiveness -----
+with st.sidebar:
+    stats = extraction_cache_stats()
+    st.caption(
+        f"Extraction cache: {stats['memory_hits'] + stats['disk_hits']} hits / "
+        f"{stats['misses']} misses ({stats['hit_rate']:.0%})"
+    )
+    replies = reply_stats()
+    st.caption(
+        f"Replies without LLM: {replies['deterministic'] + replies['cached']} / "
+        f"{replies['deterministic'] + replies['cached'] + replies['llm']} ({replies['bypass_rate']:.0%}, "
+        f"{replies['cached']} from reply cache)"
+    )
+
 # ----- TOP RESULT WINDOW -----
 st.subheader("Validation Result")
 result_container = st.container()
 
 with result_container:
+    if st.session_state.job_id:
+        # validation in progress (survives reruns and refreshes)
+        job_progress(st.session_state.job_id)
+        st.stop()
+
+    if st.session_state.job_error:
+        st.error(f"Validation failed: {st.session_state.job_error}")
+
+    referrals = st.session_state.last_referrals
+    if st.session_state.last_result and len(referrals) > 1:
+        # a bundle: one result per referral form in the PDF
+        failed = sum(r["result"] != "PASS" for r in referrals)
+        st.caption(
+            f"This PDF holds {len(referrals)} referral forms: "
+            + (f"{failed} need review." if failed else "all pass.")
+        )
+        st.selectbox(
+            "Referral",
+            range(len(referrals)),
+            format_func=lambda i: f"{i + 1} of {len(referrals)}: {referrals[i]['result']}",
+            key="referral_pick",
+            on_change=pick_referral,
+        )
+        st.download_button(
+            "Download CSV of all referrals",
+            data=records_to_csv_bytes([r["record"] for r in referrals]),
+            file_name="surgical_forms_bundle.csv",
+            mime="text/csv",
+            key="download_bundle_csv_btn",
+        )
+
     if st.session_state.last_result:
         st.markdown(badge(st.session_state.last_result), unsafe_allow_html=True)
 
@@ -68,26 +188,27 @@ with result_container:
         if st.session_state.last_result != "PASS":
             st.write(st.session_state.last_text)
 
+        # likely resubmission of an earlier referral
+        if st.session_state.last_duplicates:
+            reused = (st.session_state.last_outcome or {}).get("reused")
+            st.warning(
+                "Possible resubmission. " + " ".join(describe_duplicate(m) for m in st.session_state.last_duplicates)
+                + (" The earlier result was reused." if reused else "")
+            )
+
         # If PASS, show CSV download + Update Case Management
     if st.session_state.last_data:
-        status_tag = "pass" if st.session_state.last_result == "PASS" else "fail"
-
-        # include the status_tag in CSV contents too
-        data_with_status = dict(st.session_state.last_data)
-        data_with_status["validation_status"] = status_tag.upper()
-
-        # ✅ NEW: add the sanity-check issues as `failed`
-        failed_list = st.session_state.get("last_failed")
-        if failed_list:
-            if isinstance(failed_list, list):
-                data_with_status["failed"] = " | ".join(str(x) for x in failed_list)
-            else:
-                data_with_status["failed"] = str(failed_list)
-
-        # ✅ NEW: add the full LLM reply as `message`
-        last_msg = st.session_state.get("last_message")
-        if last_msg:
-            data_with_status["message"] = str(last_msg)
+        # extracted fields + validation_status, sanity-check issues as `failed`
+        # and the full LLM reply as `message`
+        data_with_status = build_record(
+            st.session_state.last_data,
+            st.session_state.last_result,
+            st.session_state.get("last_failed"),
+            st.session_state.get("last_message"),
+        )
+        referral = (st.session_state.last_outcome or {}).get("record", {}).get("referral")
+        if referral:  # which form of a bundle this is
+            data_with_status["referral"] = referral
 
         csv_bytes = dict_to_csv_bytes(data_with_status)
 
@@ -106,11 +227,29 @@ with result_container:
         with col2:
             if st.button("Update Case Management", key="update_case_btn", use_container_width=True):
                 try:
-                    blob_path = save_csv_to_blob(data_with_status)
-                    st.success(f"Case saved ✅\nBlob Path: {blob_path}")
+                    # spooled locally and uploaded in the background (not again if a reused result is already saved)
+                    to_save = {**(st.session_state.last_outcome or {}), "record": data_with_status}
+                    document = to_save.get("document", 1)
+                    suffix = f"doc{document}" if to_save.get("documents", 1) > 1 else ""
+                    st.session_state.last_save_id = persist_outcome(to_save, name_suffix=suffix)
+                    st.session_state.last_already_saved = to_save.get("already_saved", False)
+                    st.session_state.referral_saves[document] = (
+                        st.session_state.last_save_id, st.session_state.last_already_saved
+                    )
                 except Exception as e:
                     st.error(f"Could not save to case management: {e}")
 
+            if st.session_state.last_save_id:
+                status = save_status(st.session_state.last_save_id) or {"state": "queued"}
+                if st.session_state.get("last_already_saved"):
+                    st.info(f"Already saved for the earlier submission ✅\nTracking id: {st.session_state.last_save_id}")
+                elif status["state"] == "saved":
+                    st.success(f"Case saved ✅\nBlob Path: {status['blob_path']}")
+                elif status["state"] == "failed":
+                    st.error(f"Could not save to case management: {status['error']}")
+                else:
+                    st.info(f"Saving in the background… tracking id: {st.session_state.last_save_id}")
+
 
     else:
         st.info("No validation yet. Upload a PDF below and click Validate.")
@@ -119,35 +258,24 @@ with result_container:
 # ----- INPUT + VALIDATE BELOW -----
 uploaded = st.file_uploader("Upload Surgical Referral PDF", type=["pdf"], key="upload_box")
 
+# flag a file that was validated before, before paying for it again
+if uploaded:
+    index = get_index()
+    try:
+        seen = index.match_pdf(pdf_fingerprint(uploaded.getvalue())) if index is not None else None
+    except sqlite3.Error:
+        seen = None  # a busy / locked index only costs the early warning
+    if seen is not None:
+        st.warning(describe_duplicate(seen) + " Validate will reuse that result unless the rules have changed since.")
+
 if st.button("Validate"):
     if not uploaded:
         st.error("Please upload a PDF first.")
         st.stop()
 
-    with st.spinner("Reading form..."):
-        pdf_bytes = uploaded.read()
-        data = extract_form_bytes(pdf_bytes)
-       
-    form_text = dict_to_lines(data)
-
-    with st.spinner("Checking against rules..."):
-        openai_client = OpenAIClient()
-        generator = ReplyGenerator(openai_client)
-        check = data_sanity_check(data)
-        reply_text = generator.generate(form_text,check)
-
-    # Determine PASS/FAIL/etc.
-    first_word = (reply_text or "").strip().split(maxsplit=1)[0].upper()
-    if first_word not in {"PASS", "FAIL"}:
-        first_word = "FAIL"  # fallback if model forgets
-
-    # Save to state so it stays visible at top
-    st.session_state.last_result = first_word
-    parts = reply_text.split(maxsplit=1)
-    clean_text = parts[1] if len(parts) > 1 else ""
-    st.session_state.last_text = clean_text.strip()
-    st.session_state.last_data = data                      # extracted fields
-    st.session_state.last_failed = check                   # NEW: sanity_check list
-    st.session_state.last_message = reply_text
-
+    # runs on the worker pool; the result window above polls it
+    job_id = submit_job(uploaded.getvalue(), uploaded.name)
+    st.session_state.job_id = job_id
+    st.session_state.job_error = None
+    st.query_params["job"] = job_id
     st.rerun()
@@ -0,0 +1,128 @@
+# benchmarks/bench_api.py
+"""
+Load test for the HTTP validation API (chatbot/api.py).
+
+By default starts the API in-process on a free port with Azure replaced by
+the stand-ins in benchmarks/fakes.py, then has N concurrent keep-alive
+clients POST the reference PDFs to /validate:
+
+    python -m benchmarks.bench_api --clients 1,8,32 --requests 200 --poll-delay 0.5 --llm-latency 0.5
+
+With --url it drives an already running server instead (real Azure calls,
+so mind the cost). Reports requests/sec and p50/p95 latency per client count.
+"""
+import argparse
+import http.client
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# the stand-ins need no credentials, only names
+os.environ.setdefault("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "offline-benchmark")
+os.environ.setdefault("DEDUP_ENABLED", "0")  # measure the pipeline, not resubmission reuse
+
+from benchmarks.bench_pipeline import percentile  # noqa: E402
+from benchmarks.record_analyze_results import reference_pdfs  # noqa: E402
+
+
+def start_local_server(poll_delay: float, llm_latency: float, warm_cache: bool, max_in_flight: int) -> Tuple[str, object]:
+    from benchmarks import fakes
+    from chatbot import api, extract_text
+    from chatbot.cache import TieredCache
+
+    fakes.install(poll_delay=poll_delay, llm_latency=llm_latency)
+    extract_text._cache = TieredCache("benchmark", max_items=10_000 if warm_cache else 0, disk_dir=None)
+    os.environ["API_MAX_IN_FLIGHT"] = str(max_in_flight)
+    server = api.make_server("127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, name="bench-api", daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}", server
+
+
+def run_level(url: str, pdfs: List[bytes], clients: int, requests: int, token: Optional[str]) -> Tuple[float, List[float], Counter]:
+    """`requests` POSTs spread over `clients` threads; returns (req/s, latencies, status counts)."""
+    parts = urlsplit(url)
+    headers = {"Content-Type": "application/pdf"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client(i: int) -> None:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                break
+            body = pdfs[n % len(pdfs)]
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/validate", body=body, headers={**headers, "X-Client-Id": f"bench-{i}"})
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+                status = "conn-error"
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return requests / wall, latencies, statuses
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load test for the HTTP validation API.")
+    parser.add_argument("--url", help="drive a running server instead of an in-process one with fakes")
+    parser.add_argument("--token", default=os.environ.get("API_TOKEN"), help="bearer token (default: API_TOKEN)")
+    parser.add_argument("--clients", default="1,8,32", help="concurrent clients per level")
+    parser.add_argument("--requests", type=int, default=200, help="requests per level")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds per simulated analyze call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per simulated chat completion")
+    parser.add_argument("--warm-cache", action="store_true", help="keep the extraction cache between requests")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="in-process server's pipeline slots")
+    args = parser.parse_args(argv)
+
+    pdfs = [p.read_bytes() for p in reference_pdfs()]
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_local_server(args.poll_delay, args.llm_latency, args.warm_cache, args.max_in_flight)
+        print(f"in-process API at {url}: analyze delay {args.poll_delay}s, LLM latency {args.llm_latency}s, "
+              f"{'warm' if args.warm_cache else 'cold'} extraction cache")
+    print(f"{len(pdfs)} reference PDFs, {args.requests} requests per level\n")
+
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}  statuses")
+    for clients in (int(c) for c in args.clients.split(",")):
+        rate, latencies, statuses = run_level(url, pdfs, clients, args.requests, args.token)
+        summary = ", ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str))
+        print(f"{clients:>7} {rate:>8.2f} {percentile(latencies, 50) * 1000:>9.1f} "
+              f"{percentile(latencies, 95) * 1000:>9.1f}  {summary}")
+    if latencies:
+        print(f"\nmean latency at the last level: {statistics.mean(latencies) * 1000:.1f} ms")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_async.py
+"""
+Overlap benchmark of chatbot.async_pipeline, offline, with the aio
+stand-ins in benchmarks/fakes.py:
+
+    python -m benchmarks.bench_async --forms 200 --concurrency 10,50,200 --poll-delay 0.5 --llm-latency 0.5
+
+Every form is a distinct synthetic PDF whose recording needs a chat
+completion (patient names made unique, caches cold), so each one pays for
+an analyze call and an LLM reply. With the stages overlapping across forms,
+wall time should approach forms / concurrency x (analyze + LLM) rather than
+forms x (analyze + LLM); "peak in flight" is how many analyze / chat calls
+were actually awaiting their stand-in at once.
+
+The governors cap concurrency per service (DOCINTEL_MAX_CONCURRENCY,
+OPENAI_MAX_CONCURRENCY, 16 by default in the app). They are raised to
+--governor-limit here so the pipeline itself is measured; pass e.g.
+--governor-limit 16 to see the production cap instead.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+# the stand-ins need no credentials, only names
+os.environ.setdefault("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "offline-benchmark")
+
+from benchmarks import fakes  # noqa: E402
+from benchmarks.bench_bundles import needs_llm, with_patient  # noqa: E402
+from chatbot import extract_text, reply_cache  # noqa: E402
+from chatbot.async_pipeline import AsyncValidationPipeline  # noqa: E402
+from chatbot.cache import TieredCache  # noqa: E402
+
+
+def make_forms(recordings: dict, sources: list, count: int, tag: str) -> list:
+    """Register `count` single-referral PDFs (cycling through `sources`); returns [(name, bytes)]."""
+    pdfs = []
+    for i in range(count):
+        pdf = f"%PDF-1.7 async {tag} form {i}".encode()
+        fields = with_patient(sources[i % len(sources)]["fields"], f"Async {tag} Patient {i}")
+        recordings[hashlib.sha256(pdf).hexdigest()] = {"source": f"async-{tag}-{i}.pdf", "fields": fields}
+        pdfs.append((f"async-{tag}-{i}.pdf", pdf))
+    return pdfs
+
+
+async def run_level(stand_ins, pdfs: list, concurrency: int) -> tuple:
+    """(wall seconds, outcomes, errors) for one batch through AsyncValidationPipeline."""
+    outcomes = errors = 0
+    start = time.perf_counter()
+    async with AsyncValidationPipeline(docintel_client=stand_ins.docintel_aio, openai_client=stand_ins.openai_aio) as pipeline:
+        async for _, outcome in pipeline.validate_many(pdfs, concurrency):
+            outcomes += 1
+            errors += "error" in outcome
+    return time.perf_counter() - start, outcomes, errors
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline overlap benchmark of the async pipeline.")
+    parser.add_argument("--forms", type=int, default=200)
+    parser.add_argument("--concurrency", default="10,50,200", help="forms in flight (validate_many)")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds per simulated analyze call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per simulated chat completion")
+    parser.add_argument("--governor-limit", type=int, default=1000, help="per-service concurrency cap")
+    args = parser.parse_args(argv)
+
+    # read when the governors are first built, i.e. on the first call below
+    os.environ["DOCINTEL_MAX_CONCURRENCY"] = str(args.governor_limit)
+    os.environ["OPENAI_MAX_CONCURRENCY"] = str(args.governor_limit)
+
+    stand_ins = fakes.install(poll_delay=args.poll_delay, llm_latency=args.llm_latency)
+    recorded = sorted((r for r in stand_ins.docintel.recordings.values() if "fields" in r), key=lambda r: r["source"])
+    sources = [r for r in recorded if needs_llm(r["fields"])] or recorded
+    serial = args.forms * (args.poll_delay + args.llm_latency)
+    print(f"{args.forms} forms, analyze delay {args.poll_delay}s, LLM latency {args.llm_latency}s, "
+          f"governor cap {os.environ['DOCINTEL_MAX_CONCURRENCY']} / {os.environ['OPENAI_MAX_CONCURRENCY']}, "
+          f"serial estimate {serial:.1f}s\n")
+    print(f"{'conc':>5} {'seconds':>8} {'forms/s':>8} {'overlap':>8} {'analyze':>8} {'LLM':>5} "
+          f"{'peak analyze':>13} {'peak LLM':>9} {'errors':>7}")
+
+    for level in (int(c) for c in args.concurrency.split(",")):
+        # cold caches: every form pays for its analyze call and reply
+        extract_text._cache = TieredCache("benchmark", max_items=0, disk_dir=None)
+        reply_cache._cache = TieredCache("benchmark-replies", max_items=0, disk_dir=None)
+        stand_ins.docintel_aio.in_flight.reset()
+        stand_ins.openai_aio.in_flight.reset()
+        pdfs = make_forms(stand_ins.docintel.recordings, sources, args.forms, f"c{level}")
+
+        analyze_before, llm_before = stand_ins.docintel.calls, stand_ins.openai.calls
+        wall, outcomes, errors = asyncio.run(run_level(stand_ins, pdfs, level))
+        print(f"{level:>5} {wall:>8.2f} {outcomes / wall:>8.1f} {serial / wall:>7.1f}x "
+              f"{stand_ins.docintel.calls - analyze_before:>8} {stand_ins.openai.calls - llm_before:>5} "
+              f"{stand_ins.docintel_aio.in_flight.peak:>13} {stand_ins.openai_aio.in_flight.peak:>9} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
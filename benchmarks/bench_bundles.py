@@ -0,0 +1,85 @@
+# benchmarks/bench_bundles.py
+"""
+Multi-referral PDFs (faxed bundles) through pipeline.validate_referrals,
+offline, with Azure replaced by the stand-ins in benchmarks/fakes.py:
+
+    python -m benchmarks.bench_bundles --sizes 1,2,4,8 --poll-delay 0.5 --llm-latency 0.5
+
+Each bundle is a synthetic PDF whose recording holds N referrals taken from
+the reference recordings that need a chat completion (forms whose reply is
+rendered locally cost next to nothing either way), with patient names made
+unique so no reply comes from the reply cache. Every size is timed with the referrals checked one
+after another (--workers 1) and concurrently (REFERRAL_MAX_WORKERS); the
+bundle is analyzed once either way, so concurrent time should stay close
+to a single form's.
+"""
+import argparse
+import hashlib
+import os
+import time
+
+# the stand-ins need no credentials, only names
+os.environ.setdefault("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "offline-benchmark")
+os.environ.setdefault("DEDUP_ENABLED", "0")  # measure the pipeline, not resubmission reuse
+
+from benchmarks import fakes  # noqa: E402
+from chatbot import extract_text, reply_cache  # noqa: E402
+from chatbot.cache import TieredCache  # noqa: E402
+from chatbot.openai_client import OpenAIClient  # noqa: E402
+from chatbot.pipeline import validate_referrals  # noqa: E402
+from chatbot.reply_generator import ReplyGenerator, render_reply  # noqa: E402
+from chatbot.sanity_check import data_sanity_check  # noqa: E402
+
+
+def with_patient(fields: dict, name: str) -> dict:
+    return {**fields, "Patient Name": {"value": name, "content": name}}
+
+
+def needs_llm(fields: dict) -> bool:
+    data = {name: extract_text._normalize_value(f) for name, f in with_patient(fields, "Bundle Patient").items()}
+    return render_reply(data_sanity_check(data), data) is None
+
+
+def make_bundle(recordings: dict, sources: list, size: int, tag: str) -> bytes:
+    """Register a bundle of `size` referrals (cycling through `sources`); returns its (fake) PDF bytes."""
+    documents = []
+    for i in range(size):
+        documents.append(with_patient(sources[i % len(sources)]["fields"], f"Bundle {tag} Patient {i}"))
+    pdf = f"%PDF-1.7 bundle {tag} of {size}".encode()
+    recordings[hashlib.sha256(pdf).hexdigest()] = {"source": f"bundle-{tag}.pdf", "documents": documents}
+    return pdf
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of multi-referral PDFs.")
+    parser.add_argument("--sizes", default="1,2,4,8", help="referrals per bundle")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds per simulated analyze call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per simulated chat completion")
+    args = parser.parse_args(argv)
+
+    stand_ins = fakes.install(poll_delay=args.poll_delay, llm_latency=args.llm_latency)
+    recorded = sorted((r for r in stand_ins.docintel.recordings.values() if "fields" in r), key=lambda r: r["source"])
+    sources = [r for r in recorded if needs_llm(r["fields"])] or recorded
+    generator = ReplyGenerator(OpenAIClient())
+    print(f"analyze delay {args.poll_delay}s, LLM latency {args.llm_latency}s\n")
+    print(f"{'forms':>5} {'workers':>8} {'seconds':>8} {'analyze':>8} {'LLM':>5}  verdicts")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        for workers in (1, None):
+            # cold caches: every run pays for its analyze call and replies
+            extract_text._cache = TieredCache("benchmark", max_items=0, disk_dir=None)
+            reply_cache._cache = TieredCache("benchmark-replies", max_items=0, disk_dir=None)
+            pdf = make_bundle(stand_ins.docintel.recordings, sources, size, f"{size}-{workers or 'default'}")
+
+            analyze_before, llm_before = stand_ins.docintel.calls, stand_ins.openai.calls
+            start = time.perf_counter()
+            outcomes = validate_referrals(pdf, generator, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            verdicts = "".join(o["result"][0] for o in outcomes)
+            print(f"{len(outcomes):>5} {workers or 'default':>8} {elapsed:>8.2f} "
+                  f"{stand_ins.docintel.calls - analyze_before:>8} {stand_ins.openai.calls - llm_before:>5}  {verdicts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_dedup.py
+"""
+Fingerprint index (chatbot/dedup.py) at archive scale.
+
+    python -m benchmarks.bench_dedup [--forms 100000] [--queries 500]
+
+Fills a fresh index with synthetic referrals (random patients, physicians,
+checkboxes and free-text conditions), then times lookups of:
+  exact     a stored PDF hash
+  rescan    a stored form with case / spacing changes (same fields)
+  edited    a stored form with one field changed (should be a near match)
+  new       an unrelated form (should match nothing)
+and reports the share of edited forms found and of new forms flagged.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_pipeline import percentile
+from chatbot.dedup import FingerprintIndex, pdf_fingerprint
+
+
+FIRST = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST = ["Smith", "Nguyen", "Brown", "Tremblay", "Martin", "Singh", "Lee", "Wilson", "Roy", "Clark"]
+CHECKBOXES = ["Anal Fissure", "Hemorrhoids", "Hernia - Inguinal", "Other Condition Check", "Positive FIT",
+              "Rectal Bleeding", "Refer to Next Available Surgeon", "Symptomatic Gallstones"]
+WORDS = "pain bleeding chronic recurrent left right lower abdominal mass suspected history weeks months".split()
+
+
+def synthetic_form(rng: random.Random) -> dict:
+    form = {name: rng.choice(["Yes", "No", "No", "No"]) for name in CHECKBOXES}
+    form.update({
+        "Program name": "Edmonton Zone FAST Program Facilitated Access to Surgical Treatment",
+        "Patient Name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        "Personal Health Number": f"{rng.randrange(10**8, 10**9)}",
+        "Date of Birth": f"{rng.randrange(1930, 2005)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        "Referring Physician": f"Dr. {rng.choice(LAST)}",
+        "Other Condition": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(0, 8))),
+        "Reason for Ineligibility": "",
+        "Refer to Specific Hospital or Surgeon": "",
+    })
+    return form
+
+
+def rescan(form: dict) -> dict:
+    return {k: f"  {v.upper()} " if v else v for k, v in form.items()}
+
+
+def edited(form: dict, rng: random.Random) -> dict:
+    form = dict(form)
+    name = rng.choice(CHECKBOXES)
+    form[name] = "No" if form[name] == "Yes" else "Yes"
+    return form
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate fingerprint index.")
+    parser.add_argument("--forms", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    outcome = {"result": "PASS", "text": "", "check": ["PASS"], "reply": "PASS", "record": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        index = FingerprintIndex(Path(tmp) / "fingerprints.sqlite3")
+        stored = []
+        start = time.perf_counter()
+        for i in range(args.forms):
+            form = synthetic_form(rng)
+            pdf_hash = pdf_fingerprint(f"pdf-{i}".encode())
+            index.add(pdf_hash, form, {**outcome, "data": form}, "v1")
+            if len(stored) < args.queries:
+                stored.append((pdf_hash, form))
+        elapsed = time.perf_counter() - start
+        size = (Path(tmp) / "fingerprints.sqlite3").stat().st_size + (Path(tmp) / "fingerprints.sqlite3-wal").stat().st_size
+        print(f"indexed {args.forms} forms in {elapsed:.1f}s ({args.forms / elapsed:.0f}/s), "
+              f"{size / 2**20:.0f} MiB on disk\n")
+
+        print(f"{'query':>7} {'p50 ms':>8} {'p95 ms':>8}  found")
+        cases = {
+            "exact": lambda h, f: index.match_pdf(h, "v1"),
+            "rescan": lambda h, f: index.match_fields(rescan(f), "v1"),
+            "edited": lambda h, f: index.match_fields(edited(f, rng), "v1"),
+            "new": lambda h, f: index.match_fields(synthetic_form(rng), "v1"),
+        }
+        for label, lookup in cases.items():
+            latencies, found = [], 0
+            for pdf_hash, form in stored:
+                t0 = time.perf_counter()
+                result = lookup(pdf_hash, form)
+                latencies.append(time.perf_counter() - t0)
+                found += bool(result)
+            print(f"{label:>7} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f}  "
+                  f"{found}/{len(stored)}")
+
+
+if __name__ == "__main__":
+    main()
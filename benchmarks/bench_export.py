@@ -0,0 +1,73 @@
+# benchmarks/bench_export.py
+"""
+Bulk export (chatbot/export.py) of a synthetic archive in the fake blob
+store, with a simulated download round trip:
+
+    python -m benchmarks.bench_export [--forms 2000] [--days 90] [--latency 0.03] [--workers 1,16]
+
+workers=1 is the one-blob-at-a-time baseline (what clicking through forms
+or a read_csv_blob loop costs). Reports seconds, forms/s, output size and
+the peak Python memory of each export.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks import fakes
+from chatbot.blob_uploader import _dict_to_csv_bytes, blob_name_for
+from chatbot.blob_reader import list_forms
+from chatbot.export import FORMATS, export_to_tempfile
+
+
+CONTAINER = "filled-forms"
+
+
+def populate(blob_service, forms: int, days: int, seed: int = 0) -> datetime:
+    """Upload `forms` synthetic saved forms spread over the last `days` days; returns the newest timestamp."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    blob_service.get_container_client(CONTAINER).create_container()
+    for i in range(forms):
+        status = "PASS" if rng.random() < 0.6 else "FAIL"
+        record = {f"Field {k}": rng.choice(["Yes", "No", "", "some longer free text " * 3]) for k in range(30)}
+        record.update(validation_status=status, failed="" if status == "PASS" else "Invalid section: mismatch.",
+                      message=f"Form {i} reviewed.")
+        ts = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        name = blob_name_for(record, name_suffix=f"{i:05d}", ts=ts)
+        blob_service.get_blob_client(CONTAINER, name).upload_blob(_dict_to_csv_bytes(record))
+    return now
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the bulk forms export.")
+    parser.add_argument("--forms", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--latency", type=float, default=0.03, help="seconds per simulated blob download")
+    parser.add_argument("--workers", default="1,16")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    args = parser.parse_args(argv)
+
+    stand_ins = fakes.install()
+    now = populate(stand_ins.blob, args.forms, args.days)
+    stand_ins.blob.download_latency = args.latency
+    names = list_forms(CONTAINER, (now - timedelta(days=args.days)).date(), now.date())["name"].tolist()
+    print(f"{len(names)} forms over {args.days} days, {args.latency * 1000:.0f} ms per download\n")
+
+    print(f"{'format':>8} {'workers':>7} {'seconds':>8} {'forms/s':>8} {'size KiB':>9} {'peak MiB':>9}")
+    for fmt in args.formats.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            tracemalloc.start()
+            start = time.perf_counter()
+            with export_to_tempfile(CONTAINER, names, fmt, max_workers=workers) as out:
+                elapsed = time.perf_counter() - start
+                size = out.seek(0, 2)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{fmt:>8} {workers:>7} {elapsed:>8.2f} {len(names) / elapsed:>8.1f} "
+                  f"{size / 1024:>9.0f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
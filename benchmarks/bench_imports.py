@@ -0,0 +1,140 @@
+# benchmarks/bench_imports.py
+"""
+Cold-start import benchmark for the Streamlit entry points.
+
+Runs each script's top-level imports in a fresh interpreter under
+`python -X importtime` and reports how long they took, the slowest imports,
+and which heavy libraries they pulled in:
+
+    python -m benchmarks.bench_imports                       # app.py and pages/dashboard.py
+    python -m benchmarks.bench_imports pages/metrics.py --repeat 7
+    python -m benchmarks.bench_imports --budget-ms 250       # exit 1 on a regression
+
+streamlit is imported and the secrets loaded before timing starts, since
+the Streamlit server has done both before it runs a page. A script fails
+the check when its imports take longer than --budget-ms or load one of the
+libraries listed for it in LAZY (those must only be imported on first use).
+"""
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SCRIPTS = ("app.py", "pages/dashboard.py")
+
+# libraries each entry point must not import at startup
+LAZY: Dict[str, Tuple[str, ...]] = {
+    "app.py": ("openai", "azure", "httpx", "requests", "pandas", "numpy", "pypdf", "PIL"),
+    "pages/dashboard.py": ("openai", "azure", "httpx", "requests", "pypdf", "PIL"),
+}
+# reported whenever loaded, whatever the script
+HEAVY = ("openai", "azure", "httpx", "requests", "pandas", "numpy", "pyarrow", "pypdf", "PIL")
+
+MARKER = "bench-imports: start"
+PREAMBLE = f"""
+import sys, time
+import streamlit as st
+try:
+    "BENCH_IMPORTS" in st.secrets
+except Exception:
+    pass
+sys.stderr.write({MARKER!r} + "\\n")
+_t0 = time.perf_counter()
+"""
+EPILOGUE = """
+sys.stderr.write("bench-imports: wall %d\\n" % ((time.perf_counter() - _t0) * 1e6))
+"""
+
+
+def top_level_imports(script: Path) -> str:
+    """Source of the module-level import statements of `script`."""
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """(wall µs, [(module, depth, self µs, cumulative µs)]) for imports after the marker."""
+    lines = stderr.splitlines()
+    try:
+        lines = lines[lines.index(MARKER) + 1:]
+    except ValueError:
+        raise RuntimeError("import benchmark did not start:\n" + stderr)
+
+    wall = 0.0
+    entries = []
+    for line in lines:
+        if line.startswith("bench-imports: wall "):
+            wall = float(line.rsplit(" ", 1)[1])
+        elif line.startswith("import time:") and "self [us]" not in line:
+            # "import time:  <self> | <cumulative> | <two spaces per nesting level><name>"
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return wall, entries
+
+
+def measure(script: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    code = PREAMBLE + top_level_imports(ROOT / script) + "\n" + EPILOGUE
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {script} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def loaded(entries: List[Tuple[str, int, int, int]], roots: Tuple[str, ...]) -> List[str]:
+    names = {name.split(".")[0] for name, _, _, _ in entries}
+    return [r for r in roots if r in names]
+
+
+def report(script: str, repeat: int, top: int, budget_ms: float) -> bool:
+    runs = [measure(script) for _ in range(max(1, repeat))]
+    wall, entries = min(runs, key=lambda r: r[0])
+    wall_ms = wall / 1000
+
+    print(f"{script}: {wall_ms:.1f} ms to import (best of {len(runs)}), {len(entries)} modules")
+    direct = sorted((e for e in entries if e[1] == 0), key=lambda e: -e[3])[:top]
+    print(f"  {'slowest top-level imports':<44} {'cumulative ms':>13}")
+    for name, _, _, cumulative in direct:
+        print(f"  {name:<44} {cumulative / 1000:>13.1f}")
+    by_self = sorted(entries, key=lambda e: -e[2])[:top]
+    print(f"  {'slowest modules (own time)':<44} {'self ms':>13}")
+    for name, _, self_us, _ in by_self:
+        print(f"  {name:<44} {self_us / 1000:>13.1f}")
+
+    heavy = loaded(entries, HEAVY)
+    print(f"  heavy libraries loaded: {', '.join(heavy) or 'none'}")
+
+    ok = True
+    eager = loaded(entries, LAZY.get(script, ()))
+    if eager:
+        print(f"  FAIL: imported at startup, should load on first use: {', '.join(eager)}")
+        ok = False
+    if budget_ms and wall_ms > budget_ms:
+        print(f"  FAIL: {wall_ms:.1f} ms is over the {budget_ms:.0f} ms budget")
+        ok = False
+    print()
+    return ok
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the Streamlit pages.")
+    parser.add_argument("scripts", nargs="*", default=list(DEFAULT_SCRIPTS), help="paths relative to the repo root")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per script (best run is kept)")
+    parser.add_argument("--top", type=int, default=8, help="rows in each table")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when a script's imports take longer")
+    args = parser.parse_args(argv)
+
+    results = [report(script, args.repeat, args.top, args.budget_ms) for script in args.scripts]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
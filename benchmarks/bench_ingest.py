@@ -0,0 +1,70 @@
+# benchmarks/bench_ingest.py
+"""
+Reference workload for the folder ingester (chatbot/ingest.py): forms/ and
+test-forms/ through extract -> check -> reply -> persist, offline, with
+Azure replaced by the stand-ins in benchmarks/fakes.py:
+
+    python -m benchmarks.bench_ingest --workers 1,4,16 --poll-delay 0.5 --llm-latency 0.5
+
+Each level starts from an empty results file and a cold extraction cache,
+then runs again over the same results file to check that resuming skips
+every file without a single analyze call.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# the stand-ins need no credentials, only names
+os.environ.setdefault("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "offline-benchmark")
+os.environ.setdefault("DEDUP_ENABLED", "0")  # measure the pipeline, not resubmission reuse
+
+from benchmarks import fakes  # noqa: E402
+from benchmarks.record_analyze_results import REFERENCE_DIRS, REPO_ROOT  # noqa: E402
+from chatbot import extract_text  # noqa: E402
+from chatbot.cache import TieredCache  # noqa: E402
+from chatbot.ingest import Ingester, Progress  # noqa: E402
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the folder ingester.")
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds per simulated analyze call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per simulated chat completion")
+    parser.add_argument("--persist", action="store_true", help="also queue saves to the fake blob store")
+    args = parser.parse_args(argv)
+
+    stand_ins = fakes.install(poll_delay=args.poll_delay, llm_latency=args.llm_latency)
+    roots = [REPO_ROOT / d for d in REFERENCE_DIRS]
+    print(f"{', '.join(str(d) for d in REFERENCE_DIRS)}: analyze delay {args.poll_delay}s, "
+          f"LLM latency {args.llm_latency}s\n")
+    print(f"{'workers':>7} {'files':>6} {'files/s':>8} {'errors':>7} {'analyze':>8}   "
+          f"{'resume s':>8} {'skipped':>8} {'analyze':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (int(w) for w in args.workers.split(",")):
+            out = Path(tmp) / f"results-{workers}.jsonl"
+            extract_text._cache = TieredCache("benchmark", max_items=0, disk_dir=None)  # cold
+
+            analyze_before = stand_ins.docintel.calls
+            start = time.perf_counter()
+            progress = Ingester(roots, out, workers=workers, persist=args.persist,
+                                progress=Progress(stream=open(os.devnull, "w"))).run()
+            elapsed = time.perf_counter() - start
+            analyze_first = stand_ins.docintel.calls - analyze_before
+
+            analyze_before = stand_ins.docintel.calls
+            start = time.perf_counter()
+            resumed = Ingester(roots, out, workers=workers, progress=Progress(stream=open(os.devnull, "w")))
+            resumed.run()
+            resume_elapsed = time.perf_counter() - start
+
+            print(f"{workers:>7} {progress.done:>6} {progress.done / elapsed:>8.2f} {progress.errors:>7} "
+                  f"{analyze_first:>8}   {resume_elapsed:>8.3f} {resumed.skipped:>8} "
+                  f"{stand_ins.docintel.calls - analyze_before:>8}")
+
+
+if __name__ == "__main__":
+    main()
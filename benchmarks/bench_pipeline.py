@@ -0,0 +1,165 @@
+# benchmarks/bench_pipeline.py
+"""
+Offline end-to-end benchmark of the validation pipeline.
+
+Runs the real extract_form_bytes -> data_sanity_check ->
+ReplyGenerator.generate -> save_csv_to_blob path over the PDFs in forms/
+and test-forms/, with Azure replaced by the stand-ins in benchmarks/fakes.py:
+
+    python -m benchmarks.bench_pipeline --poll-delay 0.8 --llm-latency 0.6 --concurrency 1,4,16
+
+Reports per-stage p50/p95 latency, forms/sec per concurrency level, and
+peak traced memory / net allocated blocks per form (single-threaded pass).
+
+Every reference recording has a decided outcome, so the app renders its
+reply locally and never calls the LLM. Each level therefore runs in two
+reply modes (--modes): "rendered", as the app does, and "llm", where every
+form goes to the (simulated) chat completion so --llm-latency and the LLM
+path are measured too. The reply cache starts cold in both.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+# the stand-ins need no credentials, only names
+os.environ.setdefault("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "offline-benchmark")
+os.environ.setdefault("DEDUP_ENABLED", "0")  # measure the pipeline, not resubmission reuse
+
+from benchmarks import fakes  # noqa: E402
+from benchmarks.record_analyze_results import reference_pdfs  # noqa: E402
+from chatbot import extract_text, reply_cache  # noqa: E402
+from chatbot.blob_uploader import save_csv_to_blob  # noqa: E402
+from chatbot.cache import TieredCache  # noqa: E402
+from chatbot.openai_client import OpenAIClient  # noqa: E402
+from chatbot.pipeline import build_record, dict_to_lines, parse_verdict  # noqa: E402
+from chatbot.reply_generator import ReplyGenerator  # noqa: E402
+from chatbot.sanity_check import data_sanity_check  # noqa: E402
+
+STAGES = ("extract", "sanity_check", "reply", "persist", "total")
+MODES = ("rendered", "llm")
+
+
+class LLMReplyGenerator(ReplyGenerator):
+    """ReplyGenerator that never renders a reply locally (the "llm" mode)."""
+
+    def render_locally(self, form_data_text, check, data=None):
+        return None
+
+
+def make_generator(mode: str) -> ReplyGenerator:
+    return (LLMReplyGenerator if mode == "llm" else ReplyGenerator)(OpenAIClient())
+
+
+def run_form(pdf_bytes: bytes, generator: ReplyGenerator) -> Dict[str, float]:
+    """One form through the real pipeline; returns seconds per stage."""
+    timings = {}
+    t0 = time.perf_counter()
+    data = extract_text.extract_form_bytes(pdf_bytes)
+    t1 = time.perf_counter()
+    check = data_sanity_check(data)
+    t2 = time.perf_counter()
+    reply = generator.generate(dict_to_lines(data), check, data)
+    t3 = time.perf_counter()
+    result, _ = parse_verdict(reply)
+    save_csv_to_blob(build_record(data, result, check, reply))
+    t4 = time.perf_counter()
+    timings.update(extract=t1 - t0, sanity_check=t2 - t1, reply=t3 - t2, persist=t4 - t3, total=t4 - t0)
+    return timings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def fresh_cache(warm: bool) -> None:
+    # cold runs must pay for every analyze call; never touch the user's disk cache
+    extract_text._cache = TieredCache("benchmark", max_items=10_000 if warm else 0, disk_dir=None)
+    # replies are never served from the cache: repeated rounds / levels would skip the LLM
+    reply_cache._cache = TieredCache("benchmark-replies", max_items=0, disk_dir=None)
+
+
+def run_level(
+    pdfs: List[Tuple[str, bytes]], concurrency: int, warm: bool, mode: str = "rendered"
+) -> Tuple[float, Dict[str, List[float]]]:
+    fresh_cache(warm)
+    generator = make_generator(mode)
+    if warm:
+        for _, payload in pdfs:
+            extract_text.extract_form_bytes(payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda p: run_form(p[1], generator), pdfs))
+    wall = time.perf_counter() - start
+
+    per_stage = {stage: [r[stage] for r in results] for stage in STAGES}
+    return len(pdfs) / wall, per_stage
+
+
+def allocation_pass(pdfs: List[Tuple[str, bytes]]) -> Tuple[float, float]:
+    """Peak traced KiB and net allocated blocks per form, single-threaded."""
+    fresh_cache(False)
+    generator = ReplyGenerator(OpenAIClient())
+    peaks, blocks = [], []
+    tracemalloc.start()
+    try:
+        for _, payload in pdfs:
+            tracemalloc.reset_peak()
+            base_current, _ = tracemalloc.get_traced_memory()
+            base_blocks = sys.getallocatedblocks()
+            run_form(payload, generator)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - base_current) / 1024)
+            blocks.append(sys.getallocatedblocks() - base_blocks)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks), statistics.mean(blocks)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds per simulated analyze call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per simulated chat completion")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--rounds", type=int, default=1, help="repeat the reference PDF set this many times")
+    parser.add_argument("--warm-cache", action="store_true", help="pre-populate the extraction cache")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help="reply modes: rendered (locally, as the app does), llm (every form to the LLM)")
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(",") if m]
+    if any(m not in MODES for m in modes):
+        parser.error(f"--modes: expected some of {', '.join(MODES)}")
+
+    stand_ins = fakes.install(poll_delay=args.poll_delay, llm_latency=args.llm_latency)
+    pdfs = [(p.name, p.read_bytes()) for p in reference_pdfs()] * max(1, args.rounds)
+    print(f"{len(pdfs)} forms, analyze delay {args.poll_delay}s, LLM latency {args.llm_latency}s, "
+          f"{'warm' if args.warm_cache else 'cold'} extraction cache\n")
+
+    header = f"{'mode':>8} {'conc':>5} {'forms/s':>8}  " + "  ".join(f"{s + ' p50/p95 ms':>24}" for s in STAGES)
+    print(header)
+    for mode in modes:
+        for level in (int(c) for c in args.concurrency.split(",")):
+            llm_before, analyze_before = stand_ins.openai.calls, stand_ins.docintel.calls
+            rate, per_stage = run_level(pdfs, level, args.warm_cache, mode)
+            cells = "  ".join(
+                f"{percentile(per_stage[s], 50) * 1000:>11.2f} / {percentile(per_stage[s], 95) * 1000:>10.2f}"
+                for s in STAGES
+            )
+            print(f"{mode:>8} {level:>5} {rate:>8.2f}  {cells}")
+            print(f"{'':>8} {'':>5} {'':>8}  analyze calls: {stand_ins.docintel.calls - analyze_before}, "
+                  f"LLM calls: {stand_ins.openai.calls - llm_before}")
+
+    peak_kib, net_blocks = allocation_pass(pdfs)
+    print(f"\nper form: peak traced memory {peak_kib:.1f} KiB, net allocated blocks {net_blocks:.0f}")
+
+
+if __name__ == "__main__":
+    main()
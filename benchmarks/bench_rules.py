@@ -0,0 +1,74 @@
+# benchmarks/bench_rules.py
+"""
+Per-form validation cost vs. rule count, per record and batched.
+
+    python -m benchmarks.bench_rules [--forms 20000] [--rule-counts 4,16,64,256]
+
+Rule tables are synthetic (the real RULES plus extra PairRules on
+generated fields) so the numbers show how cost scales as rules are added.
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from chatbot.rules import PairRule, compile_rules
+from chatbot.sanity_check import PROGRAM_NAME, RULES
+
+
+def synthetic_rules(count: int) -> list:
+    rules = list(RULES)
+    for i in range(max(0, count - len(RULES))):
+        rules.append(PairRule(
+            f"Flag {i}", f"Text {i}", text_when_yes=bool(i % 2),
+            mismatch_message=f"Invalid section {i}: mismatch.", fallback_message=f"Invalid section {i}: missing.",
+        ))
+    return rules
+
+
+def synthetic_forms(rules: list, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    fields = set()
+    for rule in rules:
+        fields.update([rule.field] if hasattr(rule, "field") else [rule.flag, rule.text])
+    forms = []
+    for _ in range(count):
+        form = {name: rng.choice(["Yes", "No", "", "some text"]) for name in fields}
+        form["Program name"] = PROGRAM_NAME if rng.random() < 0.95 else "Other program"
+        forms.append(form)
+    return forms
+
+
+def bench(rule_count: int, form_count: int) -> dict:
+    rules = synthetic_rules(rule_count)
+    validator = compile_rules(rules)
+    forms = synthetic_forms(rules, form_count)
+    frame = pd.DataFrame(forms)
+
+    start = time.perf_counter()
+    for form in forms:
+        validator.validate(form)
+    per_record = (time.perf_counter() - start) / form_count
+
+    start = time.perf_counter()
+    validator.validate_frame(frame)
+    batched = (time.perf_counter() - start) / form_count
+
+    return {"rules": len(rules), "per_record_us": per_record * 1e6, "batched_us": batched * 1e6}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--forms", type=int, default=20000)
+    parser.add_argument("--rule-counts", default="4,16,64,256")
+    args = parser.parse_args(argv)
+
+    print(f"{'rules':>6} {'per-record µs/form':>20} {'batched µs/form':>17}")
+    for count in (int(c) for c in args.rule_counts.split(",")):
+        r = bench(count, args.forms)
+        print(f"{r['rules']:>6} {r['per_record_us']:>20.2f} {r['batched_us']:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
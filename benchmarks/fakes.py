@@ -0,0 +1,323 @@
+# benchmarks/fakes.py
+"""
+Local stand-ins for the Azure services the pipeline talks to, registered
+through chatbot.clients.set_client so the real code paths run unchanged:
+
+  FakeDocumentIntelligence  replays recorded analyze results (by PDF sha256)
+                            after a configurable poll delay, one document
+                            per referral for bundle recordings
+  FakeAzureOpenAI           returns a canned reply after a configurable latency
+                            (or streams it, with stream=True)
+  FakeAsyncDocumentIntelligence / FakeAsyncAzureOpenAI
+                            aio twins of the two above (same recordings,
+                            latency and call counters), for callers that own
+                            their clients, e.g. chatbot.async_pipeline
+  FakeBlobService           in-memory container store (block + append blobs,
+                            ETags, conditional GETs / uploads / deletes,
+                            prefix listing), with an optional per-download latency
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, ResourceNotModifiedError,
+)
+
+from chatbot import clients
+
+
+RECORDINGS_PATH = Path(__file__).resolve().parent / "recordings" / "analyze_results.json"
+
+
+def load_recordings(path: Path = RECORDINGS_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    sha256(pdf bytes) -> {"source": file name, "fields": {name: {"value", "content"}}}
+    (a multi-referral recording has "documents": [fields, ...] instead of "fields").
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ----- Document Intelligence -----
+class _Poller:
+    def __init__(self, result, delay: float):
+        self._result, self._delay = result, delay
+
+    def result(self):
+        time.sleep(self._delay)
+        return self._result
+
+
+class FakeDocumentIntelligence:
+    def __init__(self, recordings: Dict[str, Dict[str, Any]], poll_delay: float = 0.0, default_fields: Optional[dict] = None):
+        self.recordings = recordings
+        self.poll_delay = poll_delay
+        self.default_fields = default_fields or {}
+        self.calls = 0
+
+    def begin_analyze_document(self, model_id, request, **kwargs):
+        self.calls += 1
+        return _Poller(self.analyze(request), self.poll_delay)
+
+    def analyze(self, request):
+        """The recorded AnalyzeResult for a request (no delay)."""
+        payload = getattr(request, "bytes_source", None) or request["bytes_source"]
+        recording = self.recordings.get(hashlib.sha256(payload).hexdigest())
+        # a bundle recording lists one field set per referral form: {"documents": [fields, ...]}
+        if recording and "documents" in recording:
+            documents = recording["documents"]
+        else:
+            documents = [recording["fields"] if recording else self.default_fields]
+        docs = [
+            SimpleNamespace(fields={
+                name: SimpleNamespace(value=f.get("value"), content=f.get("content")) for name, f in fields.items()
+            })
+            for fields in documents
+        ]
+        return SimpleNamespace(documents=docs)
+
+
+class _InFlight:
+    """Counts concurrent calls into an async stand-in (current and peak)."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+
+    def __enter__(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        self.current -= 1
+
+    def reset(self) -> None:
+        self.peak = self.current
+
+
+class _AsyncPoller:
+    def __init__(self, result, delay: float, in_flight: _InFlight):
+        self._result, self._delay, self._in_flight = result, delay, in_flight
+
+    async def result(self):
+        with self._in_flight:
+            await asyncio.sleep(self._delay)
+        return self._result
+
+
+class FakeAsyncDocumentIntelligence:
+    def __init__(self, sync: FakeDocumentIntelligence):
+        self._sync = sync
+        self.in_flight = _InFlight()
+
+    async def begin_analyze_document(self, model_id, request, **kwargs):
+        self._sync.calls += 1
+        return _AsyncPoller(self._sync.analyze(request), self._sync.poll_delay, self.in_flight)
+
+    async def close(self):
+        pass
+
+
+# ----- Azure OpenAI -----
+class _Completions:
+    def __init__(self, owner: "FakeAzureOpenAI"):
+        self._owner = owner
+
+    def create(self, model, messages, stream: bool = False, **kwargs):
+        owner = self._owner
+        usage = self._usage(messages)
+        if stream:
+            return self._stream(usage, include_usage=bool(kwargs.get("stream_options", {}).get("include_usage")))
+        time.sleep(owner.latency)
+        return self._response(usage)
+
+    def _usage(self, messages):
+        owner = self._owner
+        owner.calls += 1
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(owner.reply) // 4,
+            total_tokens=prompt_tokens + len(owner.reply) // 4,
+        )
+
+    def _response(self, usage):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self._owner.reply))],
+            usage=usage,
+        )
+
+    def _stream(self, usage, include_usage: bool):
+        # latency is spread over ~4-character pieces, first piece after a tenth of it
+        reply, latency = self._owner.reply, self._owner.latency
+        pieces = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+        time.sleep(latency / 10)
+        for piece in pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+            time.sleep(latency * 0.9 / max(1, len(pieces)))
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeAzureOpenAI:
+    def __init__(self, reply: str = "FAIL\nSome fields on the form need review.", latency: float = 0.0):
+        self.reply = reply
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+
+class _AsyncCompletions(_Completions):
+    def __init__(self, owner: "FakeAzureOpenAI", in_flight: _InFlight):
+        super().__init__(owner)
+        self._in_flight = in_flight
+
+    async def create(self, model, messages, **kwargs):
+        usage = self._usage(messages)
+        with self._in_flight:
+            await asyncio.sleep(self._owner.latency)
+        return self._response(usage)
+
+
+class FakeAsyncAzureOpenAI:
+    def __init__(self, sync: FakeAzureOpenAI):
+        self.in_flight = _InFlight()
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(sync, self.in_flight))
+
+    async def close(self):
+        pass
+
+
+# ----- Blob Storage -----
+class _Blob:
+    def __init__(self, service: "FakeBlobService", container: str, name: str):
+        self._svc, self.container, self.name = service, container, name
+
+    def _store(self) -> Dict[str, dict]:
+        store = self._svc.containers.get(self.container)
+        if store is None:
+            raise ResourceNotFoundError("container not found")
+        return store
+
+    def _put(self, data: bytes, kind: str) -> None:
+        self._store()[self.name] = {"data": bytes(data), "etag": f'"{next(self._svc._etags)}"', "kind": kind}
+
+    def _check_unmodified(self, etag, match_condition) -> None:
+        blob = self._store().get(self.name)
+        if match_condition == MatchConditions.IfNotModified and (blob is None or etag != blob["etag"]):
+            raise ResourceModifiedError("condition not met")
+
+    def upload_blob(self, data, overwrite: bool = False, etag=None, match_condition=None, **kwargs):
+        with self._svc.lock:
+            self._check_unmodified(etag, match_condition)
+            if not overwrite and self.name in self._store():
+                raise ResourceExistsError("blob exists")
+            self._put(data if isinstance(data, bytes) else data.encode("utf-8"), "block")
+
+    def create_append_blob(self, **kwargs):
+        with self._svc.lock:
+            self._put(b"", "append")
+
+    def append_block(self, data, **kwargs):
+        with self._svc.lock:
+            blob = self._store().get(self.name)
+            if blob is None:
+                raise ResourceNotFoundError("blob not found")
+            self._put(blob["data"] + data, "append")
+
+    def download_blob(self, etag=None, match_condition=None, **kwargs):
+        with self._svc.lock:
+            blob = self._store().get(self.name)
+            if blob is None:
+                raise ResourceNotFoundError("blob not found")
+            if match_condition == MatchConditions.IfModified and etag == blob["etag"]:
+                raise ResourceNotModifiedError("not modified")
+            data, blob_etag = blob["data"], blob["etag"]
+        if self._svc.download_latency:
+            time.sleep(self._svc.download_latency)
+        return SimpleNamespace(readall=lambda: data, properties=SimpleNamespace(etag=blob_etag))
+
+    def get_blob_properties(self, **kwargs):
+        with self._svc.lock:
+            blob = self._store().get(self.name)
+            if blob is None:
+                raise ResourceNotFoundError("blob not found")
+            return SimpleNamespace(name=self.name, etag=blob["etag"], size=len(blob["data"]))
+
+    def delete_blob(self, etag=None, match_condition=None, **kwargs):
+        with self._svc.lock:
+            if self.name in self._store():
+                self._check_unmodified(etag, match_condition)
+            if self._store().pop(self.name, None) is None:
+                raise ResourceNotFoundError("blob not found")
+
+
+class _Container:
+    def __init__(self, service: "FakeBlobService", name: str):
+        self._svc, self.name = service, name
+
+    def create_container(self, **kwargs):
+        with self._svc.lock:
+            if self.name in self._svc.containers:
+                raise ResourceExistsError("container exists")
+            self._svc.containers[self.name] = {}
+
+    def get_container_properties(self, **kwargs):
+        if self.name not in self._svc.containers:
+            raise ResourceNotFoundError("container not found")
+        return SimpleNamespace(name=self.name)
+
+    def list_blobs(self, name_starts_with: str = "", **kwargs):
+        with self._svc.lock:
+            store = self._svc.containers.get(self.name)
+            if store is None:
+                raise ResourceNotFoundError("container not found")
+            names = sorted(n for n in store if n.startswith(name_starts_with or ""))
+        return [SimpleNamespace(name=n) for n in names]
+
+    def upload_blob(self, name, data, overwrite: bool = False, **kwargs):
+        _Blob(self._svc, self.name, name).upload_blob(data, overwrite=overwrite)
+        return _Blob(self._svc, self.name, name)
+
+    def get_blob_client(self, blob):
+        return _Blob(self._svc, self.name, blob)
+
+
+class FakeBlobService:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.containers: Dict[str, Dict[str, dict]] = {}
+        self._etags = itertools.count(1)
+        self.download_latency = 0.0  # seconds per download_blob, like a round trip to Azure
+
+    def get_container_client(self, container):
+        return _Container(self, container)
+
+    def get_blob_client(self, container, blob):
+        return _Blob(self, container, blob)
+
+
+def install(poll_delay: float = 0.0, llm_latency: float = 0.0, recordings: Optional[dict] = None) -> SimpleNamespace:
+    """
+    Register all stand-ins in the shared client registry and return them.
+    The aio twins (docintel_aio, openai_aio) are returned only: async callers
+    own their clients, so they are passed in rather than registered.
+    """
+    fakes = SimpleNamespace(
+        docintel=FakeDocumentIntelligence(recordings if recordings is not None else load_recordings(), poll_delay),
+        openai=FakeAzureOpenAI(latency=llm_latency),
+        blob=FakeBlobService(),
+    )
+    fakes.docintel_aio = FakeAsyncDocumentIntelligence(fakes.docintel)
+    fakes.openai_aio = FakeAsyncAzureOpenAI(fakes.openai)
+    clients.set_client("docintel", fakes.docintel)
+    clients.set_client("openai", fakes.openai)
+    clients.set_client("blob", fakes.blob)
+    return fakes
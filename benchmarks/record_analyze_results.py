@@ -0,0 +1,120 @@
+# benchmarks/record_analyze_results.py
+"""
+Capture Document Intelligence results for the reference PDFs so the
+offline benchmark replays real field values:
+
+    python -m benchmarks.record_analyze_results            # needs live secrets
+    python -m benchmarks.record_analyze_results --synthetic
+
+--synthetic writes hand-built stand-ins instead (derived from each test
+file's name: pass / wrong FIT / wrong surgeon / ...), for environments
+without Azure access. Synthetic entries are marked "synthetic": true.
+"""
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+from benchmarks.fakes import RECORDINGS_PATH
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+REFERENCE_DIRS = ("forms", "test-forms")
+
+PROGRAM_NAME = "Edmonton Zone FAST Program Facilitated Access to Surgical Treatment"
+
+
+def reference_pdfs() -> list:
+    return sorted(p for d in REFERENCE_DIRS for p in (REPO_ROOT / d).glob("*.pdf"))
+
+
+def _sel(on: bool) -> dict:
+    return {"value": ":selected:" if on else ":unselected:", "content": None}
+
+
+def _text(value: str) -> dict:
+    return {"value": value, "content": value}
+
+
+def synthetic_fields(name: str) -> dict:
+    """Plausible custom-model output for a reference PDF, keyed off its file name."""
+    n = name.lower()
+    fields = {
+        "Program name": _text(PROGRAM_NAME),
+        "Refer to Next Available Surgeon": _sel(True),
+        "Refer to Specific Hospital or Surgeon": _text(""),
+        "Positive FIT": _sel(False),
+        "Reason for Ineligibility": _text(""),
+        "Other Condition Check": _sel(False),
+        "Other Condition": _text(""),
+        "Patient Name": _text("Test Patient"),
+        "Referring Physician": _text("Dr. Example"),
+        "Hernia - Inguinal": _sel(True),
+        "Symptomatic Gallstones": _sel(False),
+        "Anal Fissure": _sel(False),
+        "Hemorrhoids": _sel(False),
+        "Rectal Bleeding": _sel(False),
+    }
+    if "wrong-form" in n:
+        fields["Program name"] = _text("Edmonton Zone Breast Surgery Referral")
+    elif "spam" in n:
+        fields = {k: _text("") for k in fields}
+        fields["Program name"] = _text(PROGRAM_NAME)
+        fields["Positive FIT"] = _sel(True)
+    elif "wrong-fit1" in n:
+        fields["Reason for Ineligibility"] = _text("Declined SCOPE program")
+    elif "wrong-fit2" in n:
+        fields["Positive FIT"] = _sel(True)
+    elif "wrong-surgical1" in n:
+        fields["Refer to Specific Hospital or Surgeon"] = _text("Dr. Smith, Royal Alexandra")
+    elif "wrong-surgical2" in n:
+        fields["Refer to Next Available Surgeon"] = _sel(False)
+    elif "wrong-other-condition1" in n:
+        fields["Other Condition"] = _text("Lipoma on upper back")
+    elif "wrong-other-condition2" in n:
+        fields["Other Condition Check"] = _sel(True)
+    elif "other-condition" in n:
+        fields["Other Condition Check"] = _sel(True)
+        fields["Other Condition"] = _text("Lipoma on upper back")
+    return fields
+
+
+def live_fields(pdf_bytes: bytes) -> dict:
+    from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+    from chatbot.clients import get_docintel_client
+    from chatbot.settings import require_setting
+
+    poller = get_docintel_client().begin_analyze_document(
+        require_setting("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID"), AnalyzeDocumentRequest(bytes_source=pdf_bytes)
+    )
+    result = poller.result()
+    if not result.documents:
+        return {}
+    return {
+        name: {"value": None if getattr(f, "value", None) is None else str(f.value), "content": getattr(f, "content", None)}
+        for name, f in (result.documents[0].fields or {}).items()
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Record analyze results for the offline benchmark.")
+    parser.add_argument("--synthetic", action="store_true", help="write stand-in results instead of calling Azure")
+    parser.add_argument("--out", default=str(RECORDINGS_PATH))
+    args = parser.parse_args(argv)
+
+    recordings = {}
+    for path in reference_pdfs():
+        payload = path.read_bytes()
+        recordings[hashlib.sha256(payload).hexdigest()] = {
+            "source": str(path.relative_to(REPO_ROOT)),
+            "synthetic": args.synthetic,
+            "fields": synthetic_fields(path.name) if args.synthetic else live_fields(payload),
+        }
+        print(f"recorded {path.relative_to(REPO_ROOT)}")
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(recordings, f, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# chatbot/acroform.py
+import io
+import re
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+
+# Title printed on the FAST General Surgery Referral form. The custom model
+# returns it as "Program name"; fillable PDFs carry it as page text instead.
+PROGRAM_NAME = "Edmonton Zone FAST Program Facilitated Access to Surgical Treatment"
+
+# Fields we must find in the AcroForm before trusting the local result.
+# Without them data_sanity_check would fail the form for the wrong reason.
+REQUIRED_FIELDS = (
+    "Refer to Next Available Surgeon",
+    "Positive FIT",
+    "Other Condition Check",
+)
+
+# Columns the rules read as checkboxes (PairRule flags); the others hold text.
+CHECKBOX_FIELDS = (
+    "Refer to Next Available Surgeon",
+    "Positive FIT",
+    "Other Condition Check",
+)
+
+# AcroForm widget name (compared with _key) -> field name the custom model returns.
+# Fields that already use the model's names map to themselves automatically.
+# No bare "other" / "fit": too generic to tell the checkbox from its text.
+FIELD_ALIASES = {
+    "nextavailable": "Refer to Next Available Surgeon",
+    "nextavailablesurgeon": "Refer to Next Available Surgeon",
+    "refertonextavailable": "Refer to Next Available Surgeon",
+    "specificsurgeon": "Refer to Specific Hospital or Surgeon",
+    "specifichospitalorsurgeon": "Refer to Specific Hospital or Surgeon",
+    "refertospecifichospitalorsurgeon": "Refer to Specific Hospital or Surgeon",
+    "positivefit": "Positive FIT",
+    "reasonforineligibility": "Reason for Ineligibility",
+    "ineligibilityreason": "Reason for Ineligibility",
+    "othercondition": "Other Condition",
+    "otherconditiontext": "Other Condition",
+    "otherconditioncheck": "Other Condition Check",
+    "otherconditioncheckbox": "Other Condition Check",
+    "othertext": "Other Condition",
+}
+
+
+def _key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", (name or "").lower())
+
+
+# Checkbox / radio states that mean "not ticked". Off is the PDF standard; some
+# form designers export a Yes/No pair instead, so No must not read as ticked.
+UNSELECTED_STATES = ("", "off", "no")
+
+
+def _kind_matches(name: str, field: Dict[str, Any]) -> bool:
+    """A checkbox column only takes a /Btn field and a text column any other (fields without /FT pass)."""
+    kind = field.get("/FT")
+    return kind is None or (name in CHECKBOX_FIELDS) == (kind == "/Btn")
+
+
+def _button_selected(field: Dict[str, Any]) -> bool:
+    """Whether a checkbox / radio field is ticked: its state is one of the widget's own "on" appearances."""
+    state = str(field.get("/V") or "").lstrip("/")
+    if state.lower() in UNSELECTED_STATES:
+        return False
+    states = {str(s).lstrip("/") for s in field.get("/_States_") or ()}
+    return not states or state in states  # a stale value with no appearance is not ticked
+
+
+def _field_value(field: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Turn a pypdf field into the {"value", "content"} shape _normalize_value expects.
+    Checkboxes/radios become :selected:/:unselected: so they normalise to Yes/No.
+    """
+    value = field.get("/V")
+    if field.get("/FT") == "/Btn":
+        return {"value": ":selected:" if _button_selected(field) else ":unselected:", "content": None}
+    if isinstance(value, list):  # multi-select choice fields
+        value = ", ".join(str(v) for v in value)
+    return {"value": None if value is None else str(value), "content": None}
+
+
+def _page_text_has_program_name(reader: "PdfReader") -> bool:
+    try:
+        text = " ".join(reader.pages[0].extract_text().split()) if reader.pages else ""
+    except Exception:
+        text = ""
+    if PROGRAM_NAME in text:
+        return True
+    title = str((reader.metadata or {}).get("/Title") or "")
+    return " ".join(title.split()) == PROGRAM_NAME
+
+
+def read_acroform_fields(pdf_bytes: bytes) -> Optional[Dict[str, Dict[str, Optional[str]]]]:
+    """
+    Read field values straight from a fillable PDF's /AcroForm.
+
+    Returns raw {"value", "content"} dicts keyed by the custom model's field
+    names (ready for _normalize_value), or None when the PDF has no usable
+    form fields (flattened / scanned PDFs) and must go to Document Intelligence.
+    """
+    from pypdf import PdfReader  # imported on first PDF, not at app start
+    from pypdf.errors import PdfReadError
+
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        fields = reader.get_fields() or {}
+    except (PdfReadError, ValueError, KeyError, TypeError):
+        return None
+    if not fields:
+        return None
+
+    known = {_key(name): name for name in REQUIRED_FIELDS + (
+        "Program name",
+        "Refer to Specific Hospital or Surgeon",
+        "Reason for Ineligibility",
+        "Other Condition",
+    )}
+
+    data: Dict[str, Dict[str, Optional[str]]] = {}
+    for raw_name, field in fields.items():
+        # pypdf reports children as "parent.child"; match on the leaf first
+        leaf = raw_name.rsplit(".", 1)[-1]
+        candidates = (
+            known.get(_key(raw_name)), known.get(_key(leaf)),
+            FIELD_ALIASES.get(_key(raw_name)), FIELD_ALIASES.get(_key(leaf)),
+        )
+        # a text box never fills a checkbox column (or the reverse), whatever it's called
+        name = next((c for c in candidates if c and _kind_matches(c, field)), raw_name)
+        if not _kind_matches(name, field):
+            continue  # e.g. a text box literally named "Positive FIT"; without it the PDF goes to Document Intelligence
+        data[name] = _field_value(field)
+
+    if not all(name in data for name in REQUIRED_FIELDS):
+        return None
+
+    if "Program name" not in data:
+        program = PROGRAM_NAME if _page_text_has_program_name(reader) else ""
+        data["Program name"] = {"value": program, "content": None}
+    return data
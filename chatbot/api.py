@@ -0,0 +1,362 @@
+# chatbot/api.py
+"""
+Headless HTTP API for the validation pipeline (for integrations that submit
+referrals programmatically; no Streamlit involved).
+
+    python -m chatbot.api --port 8600
+
+    POST /validate          body: the PDF (application/pdf)
+                            ?persist=1 also queues the save (see persist_queue)
+    POST /validate/batch    body: a zip of PDFs; ?persist=1 as above
+    GET  /saves/<save_id>   state of a queued save
+    GET  /healthz
+
+Responses are JSON. A form comes back with the columns app.py saves:
+
+    {"validation_status": "PASS" | "FAIL", "failed": "...", "message": "...",
+     "fields": {...extracted fields...}, "save_id": "..." (with persist=1),
+     "duplicates": [...earlier forms like this one...], "reused": "exact" | "same_fields"}
+
+"duplicates" and "reused" are only present for resubmissions (see
+chatbot/dedup.py). A reused result of a form that was already saved is not
+saved again: persist=1 returns the earlier save_id with "already_saved": true.
+
+A PDF holding several referral forms (a faxed bundle) comes back as
+
+    {"validation_status": "PASS" only if all pass, "documents": n,
+     "referrals": [one form as above, plus "document": 1..n, ...]}
+
+The batch endpoint returns {"count": n, "results": [...]} in upload order,
+each result also carrying "file" (or "file" and "error" if that PDF failed).
+
+Request bodies are read in chunks (Content-Length or chunked transfer
+encoding) and rejected with 413 past API_MAX_BODY_MB; so is a zip with more
+than API_MAX_ZIP_MEMBERS entries or PDFs unpacking past API_MAX_UNZIPPED_MB. At most
+API_MAX_IN_FLIGHT requests run the pipeline at once; the rest wait up to
+API_QUEUE_TIMEOUT_SECONDS and then get 503 with Retry-After. When API_TOKEN
+is set, requests need "Authorization: Bearer <token>". Rate limits are
+shared fairly per client (X-Client-Id header, else the client address).
+
+Settings: API_HOST, API_PORT, API_MAX_BODY_MB, API_MAX_ZIP_MEMBERS,
+API_MAX_UNZIPPED_MB, API_MAX_IN_FLIGHT, API_QUEUE_TIMEOUT_SECONDS, API_TOKEN,
+BULK_MAX_WORKERS (batch concurrency).
+"""
+import argparse
+import hmac
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from chatbot.batch import DEFAULT_MAX_WORKERS, UploadTooLarge, expand_uploads, validate_indexed
+from chatbot.governor import tenant_scope
+from chatbot.metrics import span
+from chatbot.pipeline import pdf_response, validate_referrals
+from chatbot.settings import get_int_setting, get_setting
+
+
+READ_CHUNK_BYTES = 64 * 1024
+DISCARD_MAX_BYTES = 64 * 1024 * 1024  # larger rejected bodies are not drained, the connection is closed
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+
+log = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def _get_generator():
+    # built on first request so starting the server needs no credentials
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                from chatbot.openai_client import OpenAIClient
+                from chatbot.reply_generator import ReplyGenerator
+
+                _generator = ReplyGenerator(OpenAIClient())
+    return _generator
+
+
+def _persist(outcome: Dict[str, Any], name_suffix: str = "") -> None:
+    from chatbot.dedup import persist_outcome
+
+    persist_outcome(outcome, name_suffix=name_suffix)
+
+
+def _document_suffix(outcome: Dict[str, Any]) -> str:
+    # which referral of a bundle a saved blob holds
+    return f"doc{outcome['document']}" if outcome.get("documents", 1) > 1 else ""
+
+
+class ValidationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so load tests measure the pipeline and not TCP setup
+    server_version = "FormValidationAPI/1"
+
+    # ----- routing -----
+    def do_GET(self) -> None:
+        self._handle(self._get)
+
+    def do_POST(self) -> None:
+        self._handle(self._post)
+
+    def _get(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path.startswith("/saves/"):
+            from chatbot.persist_queue import save_status
+
+            status = save_status(path[len("/saves/"):])
+            if status is None:
+                raise ApiError(404, "unknown save id")
+            return 200, status
+        raise ApiError(404, "not found")
+
+    def _post(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        if path not in ("/validate", "/validate/batch"):
+            raise ApiError(404, "not found")
+        persist = query.get("persist", "0").lower() in ("1", "true", "yes")
+        body = self._read_body()
+        with self.server.admit(), tenant_scope(self._tenant()):
+            if path == "/validate":
+                return 200, self._validate_one(body, persist)
+            return 200, self._validate_batch(body, persist)
+
+    def _handle(self, route) -> None:
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self._body_read = False  # the handler is reused for every request on a keep-alive connection
+        try:
+            if parts.path != "/healthz":  # probes carry no token
+                self._check_auth()
+            with span("api.request"):
+                status, payload = route(parts.path.rstrip("/") or "/", query)
+            self._send_json(status, payload)
+        except Exception as e:
+            if self.command == "POST" and not self._body_read:
+                self.close_connection = True  # the unread body would be parsed as the next request
+            if isinstance(e, ApiError):
+                self._send_json(e.status, {"error": str(e)}, e.headers)
+            else:
+                log.exception("API request failed: %s", e)
+                self._send_json(500, {"error": str(e)})
+
+    # ----- request helpers -----
+    def _check_auth(self) -> None:
+        token = self.server.token
+        if not token:
+            return
+        given = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+            raise ApiError(401, "missing or invalid bearer token", {"WWW-Authenticate": "Bearer"})
+
+    def _tenant(self) -> str:
+        return "api:" + (self.headers.get("X-Client-Id") or self.client_address[0])
+
+    def _read_body(self) -> bytes:
+        """Read the request body in chunks, stopping at the size limit."""
+        limit = self.server.max_body_bytes
+        body = bytearray()
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            while True:
+                size_line = self.rfile.readline(1024)
+                try:
+                    size = int(size_line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    self.close_connection = True
+                    raise ApiError(400, "malformed chunked body")
+                if size == 0:
+                    while self.rfile.readline(1024) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    break
+                if len(body) + size > limit:
+                    self.close_connection = True
+                    raise ApiError(413, f"body larger than {limit} bytes")
+                while size:
+                    chunk = self.rfile.read(min(size, READ_CHUNK_BYTES))
+                    if not chunk:
+                        self.close_connection = True
+                        raise ApiError(400, "body ended early")
+                    body += chunk
+                    size -= len(chunk)
+                self.rfile.readline(1024)  # CRLF after each chunk
+        else:
+            try:
+                remaining = int(self.headers.get("Content-Length", "0"))
+            except ValueError:
+                raise ApiError(400, "bad Content-Length")
+            if remaining > limit:
+                self._discard(remaining)
+                raise ApiError(413, f"body larger than {limit} bytes")
+            while remaining:
+                chunk = self.rfile.read(min(remaining, READ_CHUNK_BYTES))
+                if not chunk:
+                    self.close_connection = True
+                    raise ApiError(400, "body ended early")
+                body += chunk
+                remaining -= len(chunk)
+        self._body_read = True
+        if not body:
+            raise ApiError(400, "empty body")
+        return bytes(body)
+
+    def _discard(self, length: int) -> None:
+        """Drain a rejected body so the client sees the error instead of a reset; huge ones just close."""
+        if length > DISCARD_MAX_BYTES:
+            self.close_connection = True
+            return
+        while length:
+            chunk = self.rfile.read(min(length, READ_CHUNK_BYTES))
+            if not chunk:
+                break
+            length -= len(chunk)
+        self._body_read = True
+
+    def handle_expect_100(self) -> bool:
+        # clients sending "Expect: 100-continue" learn about an oversized body before uploading it
+        try:
+            too_big = int(self.headers.get("Content-Length", "0")) > self.server.max_body_bytes
+        except ValueError:
+            too_big = False
+        if too_big:
+            self.close_connection = True
+            self._send_json(413, {"error": f"body larger than {self.server.max_body_bytes} bytes"})
+            return False
+        return super().handle_expect_100()
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        log.debug("%s - %s", self.address_string(), format % args)
+
+    # ----- endpoints -----
+    def _validate_one(self, body: bytes, persist: bool) -> Dict[str, Any]:
+        if not body.startswith(PDF_MAGIC):
+            raise ApiError(415, "body is not a PDF")
+        outcomes = validate_referrals(body, _get_generator())
+        if persist:
+            for outcome in outcomes:
+                _persist(outcome, name_suffix=_document_suffix(outcome))
+        return pdf_response(outcomes)
+
+    def _validate_batch(self, body: bytes, persist: bool) -> Dict[str, Any]:
+        if not body.startswith(ZIP_MAGIC):
+            raise ApiError(415, "body is not a zip archive")
+        try:
+            pdfs = expand_uploads(
+                [("upload.zip", body)],
+                max_members=self.server.max_zip_members,
+                max_total_bytes=self.server.max_unzipped_bytes,
+            )
+        except UploadTooLarge as e:
+            raise ApiError(413, str(e).replace("upload.zip", "archive"))
+        except Exception as e:
+            raise ApiError(400, f"unreadable zip archive: {e}")
+        results = [None] * len(pdfs)
+        referrals: Dict[int, List[Dict[str, Any]]] = {}  # a bundle's referrals, until all are in
+        # by position: entry names can repeat within a zip
+        for i, outcome in validate_indexed(pdfs, _get_generator(), max_workers=self.server.batch_workers):
+            name = pdfs[i][0]
+            if "error" in outcome:
+                results[i] = {"file": name[len("upload.zip/"):], "error": outcome["error"]}
+                continue
+            if persist:
+                _persist(outcome, name_suffix="-".join(filter(None, (f"{i:04d}", _document_suffix(outcome)))))
+            referrals.setdefault(i, []).append(outcome)
+            if len(referrals[i]) == outcome.get("documents", 1):
+                results[i] = {"file": name[len("upload.zip/"):], **pdf_response(referrals.pop(i))}
+        return {"count": len(results), "results": results}
+
+
+class ValidationServer(ThreadingHTTPServer):
+    """Thread per connection; at most `max_in_flight` requests run the pipeline at once."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        max_in_flight: int = 16,
+        queue_timeout: float = 30.0,
+        max_body_bytes: int = 20 * 1024 * 1024,
+        token: str = "",
+        batch_workers: int = DEFAULT_MAX_WORKERS,
+        max_zip_members: int = 1000,
+        max_unzipped_bytes: int = 200 * 1024 * 1024,
+    ):
+        super().__init__(address, ValidationHandler)
+        self._slots = threading.BoundedSemaphore(max(1, int(max_in_flight)))
+        self.queue_timeout = queue_timeout
+        self.max_body_bytes = max_body_bytes
+        self.token = token
+        self.batch_workers = batch_workers
+        self.max_zip_members = max_zip_members
+        self.max_unzipped_bytes = max_unzipped_bytes
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Hold one pipeline slot; 503 if none frees up within queue_timeout."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ApiError(503, "server busy, retry later", {"Retry-After": "1"})
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+def make_server(host: Optional[str] = None, port: Optional[int] = None) -> ValidationServer:
+    """Server configured from settings (port 0 picks a free port)."""
+    return ValidationServer(
+        (host or get_setting("API_HOST", "127.0.0.1"), get_int_setting("API_PORT", 8600) if port is None else port),
+        max_in_flight=get_int_setting("API_MAX_IN_FLIGHT", 16),
+        queue_timeout=get_int_setting("API_QUEUE_TIMEOUT_SECONDS", 30),
+        max_body_bytes=get_int_setting("API_MAX_BODY_MB", 20) * 1024 * 1024,
+        token=str(get_setting("API_TOKEN", "") or ""),
+        max_zip_members=get_int_setting("API_MAX_ZIP_MEMBERS", 1000),
+        max_unzipped_bytes=get_int_setting("API_MAX_UNZIPPED_MB", 200) * 1024 * 1024,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="HTTP API for form validation.")
+    parser.add_argument("--host", help="default: API_HOST or 127.0.0.1")
+    parser.add_argument("--port", type=int, help="default: API_PORT or 8600")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.host, args.port)
+    host, port = server.server_address[:2]
+    log.info("Validation API listening on http://%s:%d", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
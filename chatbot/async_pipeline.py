@@ -0,0 +1,177 @@
+# chatbot/async_pipeline.py
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from azure.core.credentials import AzureKeyCredential
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient as AsyncDocumentIntelligenceClient
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+
+from chatbot.blob_uploader import save_csv_to_blob_async
+from chatbot.extract_text import extract_documents_bytes_async
+from chatbot.openai_client import AsyncOpenAIClient
+from chatbot.pipeline import build_record, dict_to_lines, parse_verdict
+from chatbot.reply_generator import ReplyGenerator
+from chatbot.sanity_check import data_sanity_check
+from chatbot.settings import get_int_setting, require_setting
+
+
+DEFAULT_CONCURRENCY = get_int_setting("ASYNC_MAX_IN_FLIGHT", 200)
+
+
+class AsyncValidationPipeline:
+    """
+    extract -> sanity check -> reply -> (optional) persist on one event loop.
+
+    Every stage awaits network I/O, so with many forms in flight the stages
+    overlap across forms (form N's chat completion runs while form N+1 is
+    still being analyzed). Use as an async context manager so the aio
+    clients and their connection pools are closed cleanly:
+
+        async with AsyncValidationPipeline() as pipeline:
+            async for name, outcome in pipeline.validate_many(pdfs):
+                ...
+
+    `docintel_client` / `openai_client` are pre-built aio clients (e.g. the
+    stand-ins in benchmarks/fakes.py); by default they are built from settings.
+    Either way they are closed on exit.
+    """
+
+    def __init__(self, container: str = "filled-forms", docintel_client=None, openai_client=None):
+        self.container = container
+        self._docintel = docintel_client
+        self._openai_client = openai_client
+        self._openai = None
+        self._blob = None
+        self._container_ready = None
+        self.generator = None
+
+    async def __aenter__(self) -> "AsyncValidationPipeline":
+        if self._docintel is None:
+            self._docintel = AsyncDocumentIntelligenceClient(
+                require_setting("AZURE_DOCINTEL_ENDPOINT", "https://<your-resource>.cognitiveservices.azure.com"),
+                AzureKeyCredential(require_setting("AZURE_DOCINTEL_KEY", "<your-key>")),
+                retry_total=0,  # 429s and transient errors are retried by chatbot.governor
+            )
+        self._openai = AsyncOpenAIClient(self._openai_client)
+        self.generator = ReplyGenerator(self._openai)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._docintel.close()
+        await self._openai.close()
+        if self._blob is not None:
+            await self._blob.close()
+
+    async def _blob_service(self) -> AsyncBlobServiceClient:
+        # created on first save only; most validations never persist
+        if self._blob is None:
+            self._blob = AsyncBlobServiceClient.from_connection_string(
+                require_setting("AZURE_STORAGE_CONNECTION_STRING", "DefaultEndpointsProtocol=...")
+            )
+        if self._container_ready is None:
+            self._container_ready = asyncio.ensure_future(self._create_container())
+        await self._container_ready
+        return self._blob
+
+    async def _create_container(self) -> None:
+        try:
+            await self._blob.get_container_client(self.container).create_container()
+        except Exception:
+            pass  # ignore if already exists
+
+    async def validate_referrals(
+        self, pdf_bytes: bytes, persist: bool = False, name_suffix: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Async equivalent of pipeline.validate_referrals (plus optional save):
+        one outcome per referral form in the PDF, whose replies run concurrently.
+        """
+        documents = await extract_documents_bytes_async(pdf_bytes, self._docintel)
+        count = len(documents)
+        outcomes = await asyncio.gather(*(
+            self._validate_document(data, d, count, persist, name_suffix) for d, data in enumerate(documents, 1)
+        ))
+        return list(outcomes)
+
+    async def validate(self, pdf_bytes: bytes, persist: bool = False, name_suffix: str = "") -> Dict[str, Any]:
+        """The first referral's outcome of validate_referrals."""
+        return (await self.validate_referrals(pdf_bytes, persist, name_suffix))[0]
+
+    async def _validate_document(
+        self, data: Dict[str, str], document: int, count: int, persist: bool, name_suffix: str
+    ) -> Dict[str, Any]:
+        check: List[str] = data_sanity_check(data)
+        reply_text = await self.generator.agenerate(dict_to_lines(data), check, data)
+        result, text = parse_verdict(reply_text)
+        outcome = {
+            "data": data,
+            "check": check,
+            "reply": reply_text,
+            "result": result,
+            "text": text,
+            "record": build_record(data, result, check, reply_text),
+            "document": document,
+            "documents": count,
+        }
+        if count > 1:
+            outcome["record"]["referral"] = f"{document} of {count}"
+            name_suffix = "-".join(filter(None, (name_suffix, f"doc{document}")))
+        if persist:
+            svc = await self._blob_service()
+            outcome["blob_path"] = await save_csv_to_blob_async(
+                outcome["record"], svc, self.container, name_suffix
+            )
+        return outcome
+
+    async def validate_many(
+        self,
+        pdfs: List[Tuple[str, bytes]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        persist: bool = False,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (name, outcome) in completion order, once per referral form, with
+        at most `concurrency` PDFs in flight. A failing PDF yields {"error": "..."}.
+        """
+        sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def run(i: int, name: str, payload: bytes) -> Tuple[str, List[Dict[str, Any]]]:
+            async with sem:
+                try:
+                    return name, await self.validate_referrals(payload, persist=persist, name_suffix=f"{i:04d}")
+                except Exception as e:
+                    return name, [{"error": str(e)}]
+
+        tasks = [asyncio.create_task(run(i, name, payload)) for i, (name, payload) in enumerate(pdfs)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                name, outcomes = await fut
+                for outcome in outcomes:
+                    yield name, outcome
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def validate_many_sync(
+    pdfs: List[Tuple[str, bytes]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    persist: bool = False,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Blocking wrapper: run a whole batch on a fresh event loop and return all outcomes."""
+
+    async def _run() -> List[Tuple[str, Dict[str, Any]]]:
+        async with AsyncValidationPipeline() as pipeline:
+            return [item async for item in pipeline.validate_many(pdfs, concurrency, persist)]
+
+    return asyncio.run(_run())
+
+
+def validate_pdf_sync(pdf_bytes: bytes, persist: bool = False) -> Dict[str, Any]:
+    """Blocking wrapper around AsyncValidationPipeline.validate for a single form."""
+
+    async def _run() -> Dict[str, Any]:
+        async with AsyncValidationPipeline() as pipeline:
+            return await pipeline.validate(pdf_bytes, persist=persist)
+
+    return asyncio.run(_run())
@@ -0,0 +1,113 @@
+# chatbot/batch.py
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chatbot.governor import current_tenant, tenant_scope
+from chatbot.pipeline import validate_referrals
+from chatbot.settings import get_int_setting
+
+
+DEFAULT_MAX_WORKERS = get_int_setting("BULK_MAX_WORKERS", 4)
+
+
+class UploadTooLarge(ValueError):
+    """An archive with more members, or more uncompressed bytes, than allowed."""
+
+
+def expand_uploads(
+    files: Iterable[Tuple[str, bytes]],
+    max_members: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+) -> List[Tuple[str, bytes]]:
+    """
+    Flatten (name, bytes) uploads into a list of PDFs.
+    Zip archives are opened and every .pdf inside is returned as `archive.zip/inner.pdf`.
+
+    With `max_members` / `max_total_bytes`, an archive with more entries, or
+    PDFs that would unpack to more bytes in total, raises UploadTooLarge
+    before anything past the limit is decompressed (zip bombs).
+    """
+    pdfs: List[Tuple[str, bytes]] = []
+    total = 0
+    for name, payload in files:
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(payload)) as zf:
+                infos = zf.infolist()
+                if max_members is not None and len(infos) > max_members:
+                    raise UploadTooLarge(f"{name} has {len(infos)} entries, more than {max_members}")
+                for info in infos:
+                    if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                        continue
+                    if info.filename.startswith("__MACOSX/"):
+                        continue
+                    total += info.file_size
+                    if max_total_bytes is not None and total > max_total_bytes:
+                        raise UploadTooLarge(f"{name} unpacks to more than {max_total_bytes} bytes")
+                    with zf.open(info) as member:
+                        # never trust the declared size: read at most one byte past it
+                        data = member.read(info.file_size + 1)
+                    if len(data) > info.file_size:
+                        raise UploadTooLarge(f"{name}/{info.filename} is larger than its declared size")
+                    pdfs.append((f"{name}/{info.filename}", data))
+        elif name.lower().endswith(".pdf"):
+            pdfs.append((name, payload))
+    return pdfs
+
+
+def validate_many(
+    pdfs: List[Tuple[str, bytes]],
+    generator,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """validate_indexed, yielding each PDF's name (names can repeat) instead of its position."""
+    for i, outcome in validate_indexed(pdfs, generator, max_workers):
+        yield pdfs[i][0], outcome
+
+
+def validate_indexed(
+    pdfs: List[Tuple[str, bytes]],
+    generator,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Validate PDFs on a bounded thread pool and yield (index, outcome) as each
+    one finishes, once per referral form in it (outcome["document"] /
+    outcome["documents"] tell a bundle's referrals apart). Document
+    Intelligence polling and LLM calls are I/O bound, so batch time scales
+    with len(pdfs) / max_workers rather than their sum.
+
+    A failing PDF yields {"error": "..."} instead of stopping the batch.
+    The worker threads' calls are attributed to the caller's governor tenant,
+    so a big batch shares rate limits fairly with other sessions.
+    """
+    max_workers = max(1, int(max_workers))
+    tenant = current_tenant()
+
+    def run(name, payload):
+        with tenant_scope(tenant):
+            return validate_referrals(payload, generator, filename=name)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-validate") as pool:
+        futures = {pool.submit(run, name, payload): i for i, (name, payload) in enumerate(pdfs)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                outcomes = fut.result()
+            except Exception as e:
+                yield i, {"error": str(e)}
+                continue
+            for outcome in outcomes:
+                yield i, outcome
+
+
+def summary_row(name: str, outcome: Dict[str, Any]) -> Dict[str, str]:
+    """One line of the live results table."""
+    if "error" in outcome:
+        return {"file": name, "result": "ERROR", "issues": outcome["error"]}
+    check = outcome.get("check") or []
+    issues = "" if check == ["PASS"] else " | ".join(str(c) for c in check)
+    if outcome.get("documents", 1) > 1:
+        name = f"{name} (referral {outcome['document']}/{outcome['documents']})"
+    return {"file": name, "result": outcome["result"], "issues": issues}
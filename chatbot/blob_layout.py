@@ -0,0 +1,173 @@
+# chatbot/blob_layout.py
+"""
+Where saved forms live in the container.
+
+    <status>/<YYYY>/<MM>/<DD>/form_<YYYY-MM-DD_HH-MM-SS>_<µs>-<hex>[_suffix]_<status>.csv
+
+Status and UTC save date are virtual directories, so a status / date-range
+filter becomes a handful of prefix listings (partition_prefixes) instead of
+a listing of the whole archive. Forms saved before this layout sit flat at
+the container root (form_<timestamp>_..._<status>.csv); they are still found
+through flat_prefixes, and migrate_flat_blobs moves them into the folders:
+
+    python -m chatbot.blob_layout --container filled-forms [--dry-run]
+"""
+import argparse
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from chatbot.clients import get_blob_service
+from chatbot.manifest import rename_entries, timestamp_from_name
+
+
+STATUSES = ("pass", "fail")
+FLAT_PREFIX = "form_"
+# a month with more selected days than this is listed whole (and filtered by date)
+MAX_DAY_PREFIXES_PER_MONTH = 7
+
+
+def file_name_of(blob_name: str) -> str:
+    return blob_name.rsplit("/", 1)[-1]
+
+
+def status_of(blob_name: str) -> str:
+    """pass/fail from the status folder, else from the file name (default fail)."""
+    head = blob_name.split("/", 1)[0] if "/" in blob_name else ""
+    if head in STATUSES:
+        return head
+    return "pass" if "pass" in file_name_of(blob_name).lower() else "fail"
+
+
+def partition_path(file_name: str, status: str, ts: datetime) -> str:
+    return f"{status}/{ts:%Y/%m/%d}/{file_name}"
+
+
+def partitioned_name(blob_name: str) -> Optional[str]:
+    """Dated-folder name for a flat form_*.csv blob; None if it is not one."""
+    if "/" in blob_name or not blob_name.startswith(FLAT_PREFIX) or not blob_name.lower().endswith(".csv"):
+        return None
+    ts = timestamp_from_name(blob_name)
+    if ts is None:
+        return None
+    return partition_path(blob_name, status_of(blob_name), ts)
+
+
+# ----- prefix planning -----
+def _covering(start: date, end: date) -> List[Tuple[str, date]]:
+    """
+    ("year" | "month" | "day", first day) spans covering start..end: whole
+    years and busy months as one span, otherwise single days. Month spans
+    may cover days outside the window, so callers filter by date.
+    """
+    if end < start:
+        start, end = end, start
+    spans = []
+    for year in range(start.year, end.year + 1):
+        y_start, y_end = max(start, date(year, 1, 1)), min(end, date(year, 12, 31))
+        if (y_start, y_end) == (date(year, 1, 1), date(year, 12, 31)):
+            spans.append(("year", y_start))
+            continue
+        for month in range(y_start.month, y_end.month + 1):
+            m_last = date(year, month, calendar.monthrange(year, month)[1])
+            m_start, m_end = max(y_start, date(year, month, 1)), min(y_end, m_last)
+            days = (m_end - m_start).days + 1
+            if days > MAX_DAY_PREFIXES_PER_MONTH:
+                spans.append(("month", m_start))
+            else:
+                spans.extend(("day", m_start + timedelta(days=i)) for i in range(days))
+    return spans
+
+
+_PARTITION_FORMATS = {"year": "%Y/", "month": "%Y/%m/", "day": "%Y/%m/%d/"}
+_FLAT_FORMATS = {"year": FLAT_PREFIX + "%Y-", "month": FLAT_PREFIX + "%Y-%m-", "day": FLAT_PREFIX + "%Y-%m-%d_"}
+
+
+def partition_prefixes(start: date, end: date, statuses: Iterable[str] = STATUSES) -> List[str]:
+    """Blob prefixes holding every dated-folder form saved start..end (UTC) with one of `statuses`."""
+    spans = _covering(start, end)
+    return [f"{status}/{day.strftime(_PARTITION_FORMATS[level])}" for status in statuses for level, day in spans]
+
+
+def flat_prefixes(start: date, end: date) -> List[str]:
+    """Same for forms still at the container root (not migrated yet)."""
+    return [day.strftime(_FLAT_FORMATS[level]) for level, day in _covering(start, end)]
+
+
+def prefix_last_day(prefix: str) -> Optional[date]:
+    """Last date a prefix from partition_prefixes / flat_prefixes can hold, or None if unknown."""
+    parts = prefix.rstrip("/").split("/")
+    try:
+        if parts[0] in STATUSES and len(parts) > 1:
+            year, month, day = (list(map(int, parts[1:4])) + [None, None])[:3]
+        elif prefix.startswith(FLAT_PREFIX):
+            fields = prefix[len(FLAT_PREFIX):].rstrip("-_").split("-")
+            year, month, day = (list(map(int, fields)) + [None, None])[:3]
+        else:
+            return None
+        if month is None:
+            return date(year, 12, 31)
+        if day is None:
+            return date(year, month, calendar.monthrange(year, month)[1])
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+# ----- migration -----
+def migrate_flat_blobs(container: str, dry_run: bool = False, max_workers: int = 8) -> Dict[str, str]:
+    """
+    Move flat form_*.csv blobs into their dated folders (copy, then delete the
+    original) and point their manifest rows at the new names. Safe to re-run:
+    a move interrupted after the copy is finished by the next run.
+    Returns {old name: new name} for the blobs moved (or, with dry_run, to be moved).
+    """
+    container_client = get_blob_service().get_container_client(container)
+    moves = {}
+    for blob in container_client.list_blobs(name_starts_with=FLAT_PREFIX):
+        new = partitioned_name(blob.name)
+        if new:
+            moves[blob.name] = new
+    if dry_run or not moves:
+        return moves
+
+    def move(item: Tuple[str, str]) -> Optional[str]:
+        old, new = item
+        try:
+            payload = container_client.get_blob_client(old).download_blob().readall()
+            container_client.get_blob_client(new).upload_blob(payload, overwrite=True)
+            container_client.get_blob_client(old).delete_blob()
+            return None
+        except Exception as e:
+            return f"{old}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        errors = list(pool.map(move, moves.items()))
+    moved = {old: new for (old, new), error in zip(moves.items(), errors) if error is None}
+    if moved:
+        rename_entries(container, moved)
+
+    from chatbot.blob_reader import invalidate
+
+    invalidate(container)
+    failed = [e for e in errors if e]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(moves)} blobs were not moved; first error: {failed[0]}")
+    return moved
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Move flat form_*.csv blobs into <status>/<YYYY>/<MM>/<DD>/ folders.")
+    parser.add_argument("--container", default="filled-forms")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would move")
+    args = parser.parse_args(argv)
+
+    moves = migrate_flat_blobs(args.container, dry_run=args.dry_run)
+    for old, new in sorted(moves.items()):
+        print(f"  {old} -> {new}")
+    print(f"{len(moves)} blobs {'to move' if args.dry_run else 'moved'}.")
+
+
+if __name__ == "__main__":
+    main()
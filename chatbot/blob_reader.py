@@ -1,57 +1,196 @@
 # services/blob_reader.py  (or chatbot/blob_reader.py)
 import io
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 import pandas as pd
-import streamlit as st
-from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import ResourceNotFoundError
 
+from chatbot.blob_layout import (
+    STATUSES,
+    file_name_of,
+    flat_prefixes,
+    partition_prefixes,
+    prefix_last_day,
+    status_of,
+)
+from chatbot.clients import get_blob_service
+from chatbot.manifest import timestamp_from_name
+from chatbot.settings import get_int_setting
 
-def _svc() -> BlobServiceClient:
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobServiceClient
+
+
+# Process-wide caches, shared by every Streamlit session and rerun.
+#   blobs:    (container, name) -> (etag, bytes), revalidated with If-None-Match
+#   listings: (container, prefix) -> {"names", "listed_at", "full_at"}
+_lock = threading.Lock()
+_blob_cache: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+_listing_cache: Dict[Tuple[str, str], dict] = {}
+
+BLOB_CACHE_MAX_ITEMS = get_int_setting("BLOB_CACHE_MAX_ITEMS", 512)
+# re-check for new blobs at most this often; do a full relist (to notice deletes) this often
+LISTING_REFRESH_SECONDS = get_int_setting("BLOB_LISTING_REFRESH_SECONDS", 15)
+LISTING_FULL_RELIST_SECONDS = get_int_setting("BLOB_LISTING_FULL_RELIST_SECONDS", 600)
+LISTING_WORKERS = 8  # concurrent prefix listings in list_forms
+
+
+def _svc() -> "BlobServiceClient":
+    """
+    Shared BlobServiceClient (connection string from Streamlit secrets).
+    """
+    return get_blob_service()
+
+
+def _list_names(client, name_starts_with: str) -> List[str]:
+    names = []
+    for b in client.list_blobs(name_starts_with=name_starts_with):
+        name = getattr(b, "name", "")
+        if name and name.lower().endswith(".csv"):
+            names.append(name)
+    return names
+
+
+def _is_closed(prefix: str, now: float) -> bool:
+    """True for a dated prefix whose days are all past; no new saves can appear under it."""
+    last_day = prefix_last_day(prefix)
+    # a day of slack for saves queued just before midnight
+    return last_day is not None and last_day < datetime.utcfromtimestamp(now).date() - timedelta(days=1)
+
+
+def _cached_names(container: str, prefix: str = "", refresh: bool = False) -> Optional[List[str]]:
     """
-    Create a BlobServiceClient using the connection string from Streamlit secrets.
+    Sorted CSV names under `prefix` (None if the container can't be listed).
+
+    Within LISTING_REFRESH_SECONDS the cached names are returned as-is; after
+    that new blobs are merged in (nothing is listed for dated prefixes whose
+    days are over). A full enumeration, which also drops deleted names,
+    happens on first use, every LISTING_FULL_RELIST_SECONDS, when
+    `refresh=True`, or after invalidate().
     """
+    key = (container, prefix)
+    now = time.time()
+    with _lock:
+        entry = _listing_cache.get(key)
+        entry = dict(entry) if entry else None
+
+    client = _svc().get_container_client(container)
     try:
-        conn = st.secrets["AZURE_STORAGE_CONNECTION_STRING"]
-    except KeyError:
-        raise RuntimeError(
-            "Missing AZURE_STORAGE_CONNECTION_STRING in Streamlit secrets.\n"
-            "Go to your Streamlit app → ⋯ → Edit secrets and add:\n"
-            'AZURE_STORAGE_CONNECTION_STRING = "DefaultEndpointsProtocol=...;AccountName=...;AccountKey=...;EndpointSuffix=core.windows.net"'
-        )
-    return BlobServiceClient.from_connection_string(conn)
+        if entry is None or refresh or now - entry["full_at"] > LISTING_FULL_RELIST_SECONDS:
+            entry = {"names": sorted(_list_names(client, prefix)), "listed_at": now, "full_at": now}
+        elif now - entry["listed_at"] > LISTING_REFRESH_SECONDS and not _is_closed(prefix, now):
+            names = entry["names"]
+            seen = set(names)
+            new = [n for n in _list_names(client, prefix) if n not in seen]
+            if new:
+                names = sorted(seen.union(new))
+            entry = {"names": names, "listed_at": now, "full_at": entry["full_at"]}
+    except Exception:  # includes a container that doesn't exist yet
+        return None
+
+    with _lock:
+        _listing_cache[key] = entry
+    return entry["names"]
 
 
-def list_csv_blobs(container: str, prefix: Optional[str] = None) -> pd.DataFrame:
+def list_csv_blobs(container: str, prefix: Optional[str] = None, refresh: bool = False) -> pd.DataFrame:
     """
     List CSV blobs in a container (optionally under a prefix).
-    Returns a DataFrame with a single column: 'name'.
+    Returns a DataFrame with a single column: 'name'. Listings are cached
+    per prefix (see _cached_names).
     """
-    client = _svc().get_container_client(container)
+    names = _cached_names(container, prefix or "", refresh)
+    return pd.DataFrame({"name": list(names or [])}, columns=["name"])
 
-    try:
-        client.get_container_properties()
-    except ResourceNotFoundError:
-        return pd.DataFrame(columns=["name"])
 
-    names = []
-    try:
-        for b in client.list_blobs(name_starts_with=prefix or ""):
-            name = getattr(b, "name", "")
-            if name and name.lower().endswith(".csv"):
-                names.append({"name": name})
-    except Exception:
-        return pd.DataFrame(columns=["name"])
+def list_forms(
+    container: str,
+    start: date,
+    end: date,
+    statuses: Sequence[str] = STATUSES,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """
+    Forms saved from `start` to `end` (UTC dates, inclusive) with one of
+    `statuses`, as a DataFrame of name / status / timestamp (newest first).
+
+    Only the status/date folders covering the window are listed (plus the
+    matching prefixes of forms not yet moved out of the container root), so
+    the cost follows the size of the window, not of the archive.
+    """
+    if not statuses:
+        return pd.DataFrame(columns=["name", "status", "timestamp"])
+    prefixes = partition_prefixes(start, end, statuses) + flat_prefixes(start, end)
+    workers = max(1, min(LISTING_WORKERS, len(prefixes)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        listings = list(pool.map(lambda p: _cached_names(container, p, refresh) or [], prefixes))
+
+    first, last = min(start, end), max(start, end)
+    rows = []
+    for name in {n for names in listings for n in names}:
+        status, ts = status_of(name), timestamp_from_name(file_name_of(name))
+        # month / flat prefixes can hold other days and statuses
+        if status in statuses and ts is not None and first <= ts.date() <= last:
+            rows.append((name, status, ts))
+    rows.sort(key=lambda r: (r[2], r[0]), reverse=True)
+    return pd.DataFrame(rows, columns=["name", "status", "timestamp"])
+
 
-    df = pd.DataFrame(names, columns=["name"])
-    return df.sort_values("name", ascending=True).reset_index(drop=True) if not df.empty else df
+def read_blob_bytes(container: str, blob_name: str) -> bytes:
+    """
+    Download a blob, serving it from the process-wide cache when the stored
+    ETag is still current (a conditional GET that returns 304, no body).
+    A blob that no longer exists raises ResourceNotFoundError and is dropped
+    from the cache.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+
+    key = (container, blob_name)
+    client = _svc().get_blob_client(container=container, blob=blob_name)
+
+    with _lock:
+        cached = _blob_cache.get(key)
+    if cached is not None:
+        etag, payload = cached
+        try:
+            stream = client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+        except ResourceNotModifiedError:
+            with _lock:
+                if key in _blob_cache:
+                    _blob_cache.move_to_end(key)
+            return payload
+        except ResourceNotFoundError:
+            with _lock:
+                _blob_cache.pop(key, None)
+            raise
+    else:
+        stream = client.download_blob()
+
+    payload = stream.readall()
+    with _lock:
+        _blob_cache[key] = (stream.properties.etag, payload)
+        _blob_cache.move_to_end(key)
+        while len(_blob_cache) > BLOB_CACHE_MAX_ITEMS:
+            _blob_cache.popitem(last=False)
+    return payload
 
 
 def read_csv_blob(container: str, blob_name: str) -> pd.DataFrame:
     """
     Download a CSV blob and load it into a pandas DataFrame.
     """
-    client = _svc().get_blob_client(container=container, blob=blob_name)
-    stream = client.download_blob()
-    buf = io.BytesIO(stream.readall())
+    buf = io.BytesIO(read_blob_bytes(container, blob_name))
     return pd.read_csv(buf)  # add encoding='utf-8-sig' if needed
+
+
+def invalidate(container: str, blob_name: Optional[str] = None) -> None:
+    """Forget cached listings (and one cached blob, if given) for a container."""
+    with _lock:
+        for key in [k for k in _listing_cache if k[0] == container]:
+            del _listing_cache[key]
+        if blob_name:
+            _blob_cache.pop((container, blob_name), None)
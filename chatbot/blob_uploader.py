@@ -1,52 +1,79 @@
 # services/blob_uploader.py
+import asyncio
 import io
+import secrets
 from datetime import datetime
-from typing import Dict
-import pandas as pd
-import streamlit as st
-from azure.storage.blob import BlobServiceClient
+from typing import Dict, Optional
+
+from chatbot.blob_layout import partition_path
+from chatbot.clients import ensure_container
+from chatbot.manifest import safe_append_entry
+from chatbot.metrics import span
 
 def _dict_to_csv_bytes(data: Dict) -> bytes:
     """Convert a dictionary to CSV bytes."""
+    import pandas as pd  # first save pays the import, not every app start
+
     df = pd.DataFrame([data or {}])
     buf = io.StringIO()
     df.to_csv(buf, index=False)
     return buf.getvalue().encode("utf-8")
 
 
-def save_csv_to_blob(data: Dict, container: str = "filled-forms") -> str:
+def blob_name_for(data: Dict, name_suffix: str = "", ts: Optional[datetime] = None) -> str:
     """
-    Save a single form dict as a CSV in Azure Blob Storage.
-    Filename ends in _pass.csv or _fail.csv based on `validation_status`.
-    Uses Azure connection from Streamlit secrets.
+    Blob name for a saved form, in its status / UTC date folder (chatbot.blob_layout):
+        <pass|fail>/<YYYY>/<MM>/<DD>/form_<UTC timestamp>_<microseconds>-<random hex>[_suffix]_<pass|fail>.csv
+    Unique even for saves in the same second, and still sorts by save time within a folder.
     """
-    try:
-        conn_str = st.secrets["AZURE_STORAGE_CONNECTION_STRING"]
-    except KeyError:
-        raise RuntimeError(
-            "Missing AZURE_STORAGE_CONNECTION_STRING in Streamlit secrets.\n"
-            "Go to your app → ⋯ → Edit secrets and add it there."
-        )
-
-    svc = BlobServiceClient.from_connection_string(conn_str)
-    container_client = svc.get_container_client(container)
-
-    # Create the container if it doesn't exist
-    try:
-        container_client.create_container()
-    except Exception:
-        pass  # ignore if already exists
-
     # Determine pass/fail tag
     status = str(data.get("validation_status", "")).lower()
     if status not in ("pass", "fail"):
         status = "fail"
 
     # Timestamp in UTC
+    ts = ts or datetime.utcnow()
+    suffix = f"_{name_suffix}" if name_suffix else ""
+    # hex digits can never spell "pass"/"fail", so name-based status inference still works
+    file_name = f"form_{ts:%Y-%m-%d_%H-%M-%S}_{ts:%f}-{secrets.token_hex(3)}{suffix}_{status}.csv"
+    return partition_path(file_name, status, ts)
+
+
+def save_csv_to_blob(data: Dict, container: str = "filled-forms", name_suffix: str = "") -> str:
+    """
+    Save a single form dict as a CSV in Azure Blob Storage.
+    Filename ends in _pass.csv or _fail.csv based on `validation_status`;
+    `name_suffix` is an optional label inserted before the status.
+    Blocks until uploaded; the UI uses chatbot.persist_queue instead.
+    Uses Azure connection from Streamlit secrets.
+    """
     ts = datetime.utcnow()
-    file_name = f"form_{ts:%Y-%m-%d_%H-%M-%S}_{status}.csv"
+    file_name = blob_name_for(data, name_suffix, ts)
+    upload_csv(data, container, file_name)
+
+    # keep the dashboard's index in step (never fails the save itself)
+    safe_append_entry(container, file_name, data, ts)
+
+    return f"{container}/{file_name}"
+
 
-    csv_bytes = _dict_to_csv_bytes(data)
-    container_client.upload_blob(name=file_name, data=csv_bytes, overwrite=True)
+def upload_csv(data: Dict, container: str, file_name: str) -> None:
+    """Upload one form as `file_name` (rewriting the same name is harmless, so retries are safe)."""
+    # shared client; the container is created once per process
+    container_client = ensure_container(container)
+    with span("blob.upload"):
+        container_client.upload_blob(name=file_name, data=_dict_to_csv_bytes(data), overwrite=True)
 
+
+async def save_csv_to_blob_async(data: Dict, svc, container: str = "filled-forms", name_suffix: str = "") -> str:
+    """
+    asyncio version of save_csv_to_blob using a caller-owned
+    azure.storage.blob.aio.BlobServiceClient (the container must exist).
+    """
+    ts = datetime.utcnow()
+    file_name = blob_name_for(data, name_suffix, ts)
+    container_client = svc.get_container_client(container)
+    with span("blob.upload"):
+        await container_client.upload_blob(name=file_name, data=_dict_to_csv_bytes(data), overwrite=True)
+    await asyncio.to_thread(safe_append_entry, container, file_name, data, ts)
     return f"{container}/{file_name}"
@@ -0,0 +1,122 @@
+# chatbot/bulk_validation.py
+import argparse
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pandas as pd
+
+from chatbot import sanity_check as sc
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Stripped string column; missing columns / NaN / None read as ""."""
+    if name not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[name].where(df[name].notna(), "").astype(str).str.strip()
+
+
+def vectorized_sanity_check(df: pd.DataFrame) -> pd.Series:
+    """
+    data_sanity_check over a whole DataFrame of extracted forms (one row per
+    form, columns = field names). Returns a Series of per-row error lists
+    identical to calling data_sanity_check on each row's dict; ["PASS"] when
+    a row has no errors.
+
+    Empty / NaN cells are treated as missing values, so read archived CSVs with
+    dtype=str, keep_default_na=False (as load_archive does).
+    """
+    return sc.VALIDATOR.validate_frame(df)
+
+
+def status_from_check(check: List[str]) -> str:
+    return "PASS" if check == ["PASS"] else "FAIL"
+
+
+# ----- archive re-scoring -----
+def archive_names(container: str = "filled-forms", use_manifest: bool = True) -> List[str]:
+    """
+    Names of every saved form: from the manifest (one small read instead of
+    listing the whole container), or by listing when there is no manifest
+    yet or `use_manifest` is False. Forms saved before the manifest existed
+    are only in it after manifest.rebuild_manifest.
+    """
+    if use_manifest:
+        from chatbot.manifest import read_manifest_rows
+
+        names = sorted(row["name"] for row in read_manifest_rows(container))
+        if names:
+            return names
+    from chatbot.blob_reader import list_csv_blobs
+
+    return list_csv_blobs(container, refresh=True)["name"].tolist()
+
+
+def load_archive(container: str = "filled-forms", max_workers: int = 16, use_manifest: bool = True) -> pd.DataFrame:
+    """
+    Concatenate every saved form CSV in `container` into one string-typed
+    DataFrame with a `blob_name` column. Blobs are fetched concurrently;
+    names in the manifest whose blob is gone are skipped.
+    """
+    from chatbot.blob_reader import read_blob_bytes
+
+    names = archive_names(container, use_manifest)
+
+    def _read(name: str) -> Optional[pd.DataFrame]:
+        try:
+            df = pd.read_csv(io.BytesIO(read_blob_bytes(container, name)), dtype=str, keep_default_na=False)
+        except Exception:
+            return None
+        df["blob_name"] = name
+        return df.head(1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = [f for f in pool.map(_read, names) if f is not None]
+    if not frames:
+        return pd.DataFrame(columns=["blob_name"])
+    return pd.concat(frames, ignore_index=True, sort=False).fillna("")
+
+
+def rescore(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Re-run the current rules over archived rows and compare with what was saved.
+    Returns blob_name, old/new status, old/new failed and a `changed` flag.
+    """
+    checks = vectorized_sanity_check(df)
+    new_failed = checks.map(lambda c: " | ".join(c))
+    report = pd.DataFrame({
+        "blob_name": _column(df, "blob_name"),
+        "old_status": _column(df, "validation_status").str.upper(),
+        "new_status": checks.map(status_from_check),
+        "old_failed": _column(df, "failed"),
+        "new_failed": new_failed,
+    })
+    report["changed"] = (report["old_status"] != report["new_status"]) | (report["old_failed"] != report["new_failed"])
+    return report
+
+
+def rescore_archive(container: str = "filled-forms", use_manifest: bool = True) -> pd.DataFrame:
+    """Load the whole archive and report which forms change status under the current rules."""
+    return rescore(load_archive(container, use_manifest=use_manifest))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-score every saved form with the current sanity-check rules.")
+    parser.add_argument("--container", default="filled-forms")
+    parser.add_argument("--out", help="Write the full report to this CSV path.")
+    parser.add_argument("--list", action="store_true",
+                        help="List the container instead of reading the forms' names from the manifest.")
+    args = parser.parse_args(argv)
+
+    report = rescore_archive(args.container, use_manifest=not args.list)
+    changed = report[report["changed"]]
+    status_flips = changed[changed["old_status"] != changed["new_status"]]
+    print(f"{len(report)} forms re-scored, {len(changed)} changed, {len(status_flips)} changed status.")
+    for row in status_flips.itertuples():
+        print(f"  {row.blob_name}: {row.old_status} -> {row.new_status}")
+    if args.out:
+        report.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
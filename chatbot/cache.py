@@ -0,0 +1,187 @@
+# chatbot/cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+def content_key(*parts: Union[bytes, str]) -> str:
+    """Stable sha256 hex digest over the given parts (str parts are utf-8 encoded)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class TieredCache:
+    """
+    Two-tier cache for JSON-serialisable values:
+      1. an in-process LRU (bounded by item count)
+      2. an optional on-disk tier (one JSON file per key) with TTL and
+         total-size eviction, so entries survive Streamlit restarts.
+
+    Keys should already be hashes (see `content_key`).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_items: int = 256,
+        disk_dir: Optional[Union[str, Path]] = None,
+        max_disk_bytes: int = 100 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 30 * 24 * 3600,
+    ):
+        self.name = name
+        self.max_items = max(0, int(max_items))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None  # computed lazily on first write
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # ----- public API -----
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return self._memory[key]
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._memory_put(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._stats["writes"] += 1
+            self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = None
+        if self.disk_dir and self.disk_dir.exists():
+            for path in self.disk_dir.glob("*/*.json"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus a derived hit rate, e.g. for display in the UI."""
+        with self._lock:
+            s = dict(self._stats)
+            s["memory_items"] = len(self._memory)
+        lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = (s["memory_hits"] + s["disk_hits"]) / lookups if lookups else 0.0
+        return s
+
+    # ----- memory tier -----
+    def _memory_put(self, key: str, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # ----- disk tier -----
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _expired(self, mtime: float) -> bool:
+        return bool(self.ttl_seconds) and (time.time() - mtime) > self.ttl_seconds
+
+    def _disk_get(self, key: str) -> Optional[Any]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            st_ = path.stat()
+            if self._expired(st_.st_mtime):
+                path.unlink()
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path, None)  # refresh recency for size eviction
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key: str, value: Any) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            # write atomically so concurrent readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(payload)
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict_disk(self) -> None:
+        """Drop expired entries, then least-recently-used ones until under 90% of the budget."""
+        entries = []
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                st_ = path.stat()
+            except OSError:
+                continue
+            entries.append((st_.st_mtime, st_.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= target and not self._expired(mtime):
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["evictions"] += evicted
@@ -0,0 +1,133 @@
+# chatbot/clients.py
+"""
+Process-wide Azure / OpenAI clients.
+
+Clients are built lazily on first use and shared by every Streamlit session
+and worker thread, so requests reuse warm keep-alive connections instead of
+doing a new TLS handshake per operation. Pool sizes come from settings:
+AZURE_HTTP_POOL_SIZE (Blob + Document Intelligence) and
+OPENAI_MAX_CONNECTIONS.
+
+The SDKs are imported inside the factories: together they take over a
+second to import, and a page that never touches a client shouldn't pay it.
+"""
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Set
+
+from chatbot.settings import get_int_setting, require_setting
+
+if TYPE_CHECKING:
+    from azure.ai.documentintelligence import DocumentIntelligenceClient
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.storage.blob import BlobServiceClient
+    from openai import AzureOpenAI
+
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_ready_containers: Set[str] = set()
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def _pooled_transport() -> "RequestsTransport":
+    """requests-based Azure transport with a connection pool sized for our worker threads."""
+    import requests
+    from azure.core.pipeline.transport import RequestsTransport
+
+    pool_size = get_int_setting("AZURE_HTTP_POOL_SIZE", 20)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+
+# ----- factories -----
+def _new_blob_service() -> "BlobServiceClient":
+    from azure.storage.blob import BlobServiceClient
+
+    conn = require_setting(
+        "AZURE_STORAGE_CONNECTION_STRING",
+        "DefaultEndpointsProtocol=...;AccountName=...;AccountKey=...;EndpointSuffix=core.windows.net",
+    )
+    return BlobServiceClient.from_connection_string(conn, transport=_pooled_transport())
+
+
+def _new_docintel_client() -> "DocumentIntelligenceClient":
+    from azure.ai.documentintelligence import DocumentIntelligenceClient
+    from azure.core.credentials import AzureKeyCredential
+
+    endpoint = require_setting("AZURE_DOCINTEL_ENDPOINT", "https://<your-resource>.cognitiveservices.azure.com")
+    key = require_setting("AZURE_DOCINTEL_KEY", "<your-key>")
+    # 429s and transient errors are retried by chatbot.governor, which needs to see every attempt
+    return DocumentIntelligenceClient(endpoint, AzureKeyCredential(key), transport=_pooled_transport(), retry_total=0)
+
+
+def _new_openai_client() -> "AzureOpenAI":
+    import httpx
+    from openai import AzureOpenAI, DefaultHttpxClient
+
+    max_conn = get_int_setting("OPENAI_MAX_CONNECTIONS", 20)
+    # DefaultHttpxClient keeps the SDK's default timeouts / redirect handling
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=max_conn, max_keepalive_connections=max_conn),
+    )
+    return AzureOpenAI(
+        api_key=require_setting("AZURE_OPENAI_API_KEY", "<your-key>"),
+        azure_endpoint=require_setting("AZURE_OPENAI_ENDPOINT", "https://<your-resource>.openai.azure.com"),
+        api_version=require_setting("AZURE_OPENAI_VERSION", "<api-version>"),
+        http_client=http_client,
+        max_retries=0,  # 429s and transient errors are retried by chatbot.governor
+    )
+
+
+# ----- public API -----
+def get_blob_service() -> "BlobServiceClient":
+    return _get_or_create("blob", _new_blob_service)
+
+
+def get_docintel_client() -> "DocumentIntelligenceClient":
+    return _get_or_create("docintel", _new_docintel_client)
+
+
+def get_openai_client() -> "AzureOpenAI":
+    return _get_or_create("openai", _new_openai_client)
+
+
+def ensure_container(container: str):
+    """
+    Container client for `container`, creating the container the first time
+    this process sees it. Later calls skip the create_container round trip.
+    """
+    container_client = get_blob_service().get_container_client(container)
+    if container not in _ready_containers:
+        try:
+            container_client.create_container()
+        except Exception:
+            pass  # ignore if already exists
+        with _lock:
+            _ready_containers.add(container)
+    return container_client
+
+
+def set_client(name: str, client: Any) -> None:
+    """Register a pre-built client ("blob", "docintel", "openai"), e.g. a local stand-in."""
+    with _lock:
+        _clients[name] = client
+        _ready_containers.clear()
+
+
+def reset_clients() -> None:
+    """Drop all shared clients (they are rebuilt on next use)."""
+    with _lock:
+        _clients.clear()
+        _ready_containers.clear()
@@ -0,0 +1,390 @@
+# chatbot/dedup.py
+"""
+Fingerprint index of validated forms, to catch resubmissions.
+
+Clinics often send the same referral again: the identical file, a re-scan
+of it, or a copy with one field fixed. Every validated form is recorded
+with three fingerprints:
+
+  - sha256 of the PDF bytes        -> "exact": same file again
+  - hash of the normalized fields  -> "same_fields": a re-scan that reads the same
+  - MinHash signature of the fields, banded for LSH -> "near": most fields agree
+
+An exact or same-fields match validated by the same rules, prompt and
+model is reused as is (pipeline.validate_referrals skips the sanity check and
+the reply, and an exact match also skips Document Intelligence). Near
+matches are only flagged, with the fields that differ, for a human to judge.
+
+Near-match lookup cost does not grow with the archive: each LSH band is
+one indexed SQLite query, and only a bounded number of candidates sharing
+a band bucket are compared field by field. Signatures cover the
+informative values (names, numbers, free text), so an edited checkbox
+keeps the signature, and with BANDS x ROWS = 16 x 4 forms whose values
+overlap by half or more share a bucket with high probability.
+DEDUP_SIMILARITY (the fraction of non-blank fields that agree) decides.
+
+The index is a local SQLite database (WAL mode, one connection per thread).
+It holds the forms' field values, i.e. patient data, so forms older than
+DEDUP_RETENTION_DAYS are deleted when the process first opens it (like
+validation jobs, see chatbot.jobs).
+
+Settings: DEDUP_ENABLED (default 1), DEDUP_DB_PATH, DEDUP_SIMILARITY
+(default 0.85), DEDUP_MAX_MATCHES, DEDUP_RETENTION_DAYS (default 30).
+"""
+import hashlib
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from chatbot.cache import content_key
+from chatbot.settings import get_int_setting, get_setting
+
+
+_DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / ".cache" / "fingerprints.sqlite3"
+BANDS = 16
+ROWS = 4  # minhash values per band
+CANDIDATES_PER_BUCKET = 64  # newest forms read from one band bucket
+MAX_CANDIDATES = 32  # compared field by field, most shared bands first
+REUSABLE_KINDS = ("exact", "same_fields")
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0xF0F5)  # fixed seed: signatures must be comparable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    id           INTEGER PRIMARY KEY,
+    pdf_hash     TEXT,
+    fields_hash  TEXT NOT NULL,
+    version      TEXT NOT NULL,
+    filename     TEXT,
+    created_at   REAL NOT NULL,
+    verdict      TEXT,
+    fields       TEXT NOT NULL,
+    outcome      TEXT,
+    save_id      TEXT
+);
+CREATE INDEX IF NOT EXISTS forms_pdf ON forms (pdf_hash);
+CREATE INDEX IF NOT EXISTS forms_fields ON forms (fields_hash);
+CREATE INDEX IF NOT EXISTS forms_created ON forms (created_at);
+CREATE TABLE IF NOT EXISTS lsh (
+    band     INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    form_id  INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, form_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lsh_form ON lsh (form_id);
+"""
+
+log = logging.getLogger(__name__)
+
+
+# ----- fingerprints -----
+def _norm(value: Any) -> str:
+    return " ".join(str(value if value is not None else "").lower().split())
+
+
+def pdf_fingerprint(pdf_bytes: bytes) -> str:
+    return content_key(pdf_bytes)
+
+
+def fields_fingerprint(data: Dict[str, Any]) -> str:
+    """Hash of the fields with case and whitespace normalized (what a re-scan changes)."""
+    return content_key(json.dumps({k: _norm(v) for k, v in data.items()}, sort_keys=True, ensure_ascii=False))
+
+
+_UNINFORMATIVE = {"", "yes", "no"}
+
+
+def field_tokens(data: Dict[str, Any]) -> Set[str]:
+    """
+    LSH tokens: one per informative field value, plus one per word of
+    multi-word values (so OCR noise in a word still overlaps). Blanks and
+    checkboxes are left out: most forms share them, and buckets built from
+    them would hold half the archive.
+    """
+    tokens = set()
+    for name, value in data.items():
+        text = _norm(value)
+        if text in _UNINFORMATIVE:
+            continue
+        tokens.add(f"{name}\x1f{text}")
+        words = text.split()
+        if len(words) > 1:
+            tokens.update(f"{name}\x1f#{word}" for word in words)
+    return tokens
+
+
+def minhash(tokens: Iterable[str]) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big") for t in tokens]
+    if not hashes:
+        hashes = [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    """One signed 64-bit bucket id per band (fits an SQLite INTEGER)."""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(b"".join(v.to_bytes(8, "big") for v in rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def _field_similarity(a: str, b: str) -> float:
+    a, b = _norm(a), _norm(b)
+    if a == b:
+        return 1.0
+    wa, wb = set(a.split()), set(b.split())
+    if len(wa) > 1 or len(wb) > 1:
+        return len(wa & wb) / len(wa | wb)  # free text: partial credit for a re-read word
+    return 0.0
+
+
+def compare_fields(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    {"similarity": mean per-field agreement, "differs": fields that are not equal}.
+    Fields blank in both forms are not counted: agreeing blanks say nothing.
+    """
+    names = sorted(n for n in set(a) | set(b) if _norm(a.get(n, "")) or _norm(b.get(n, "")))
+    if not names:
+        return {"similarity": 1.0, "differs": []}
+    scores = {name: _field_similarity(a.get(name, ""), b.get(name, "")) for name in names}
+    return {
+        "similarity": sum(scores.values()) / len(names),
+        "differs": [name for name in names if scores[name] < 1.0],
+    }
+
+
+def validator_version(generator=None) -> str:
+    """What a stored result depends on: the sanity rules, the reply prompt and deployment, the extraction model."""
+    from chatbot.sanity_check import RULES
+
+    prompt = generator.prompt_version() if generator is not None and hasattr(generator, "prompt_version") else ""
+    return content_key(
+        "per-document",  # results stored before bundles were split into referrals are not reused
+        repr(RULES),
+        prompt,
+        get_setting("AZURE_OPENAI_DEPLOYMENT", "") or "",
+        get_setting("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "") or "",
+    )
+
+
+# ----- index -----
+class FingerprintIndex:
+    """SQLite-backed fingerprint index; one connection per thread."""
+
+    def __init__(self, path: Union[str, Path], similarity: float = 0.85, max_matches: int = 5):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.similarity = float(similarity)
+        self.max_matches = max(1, int(max_matches))
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _match(row: sqlite3.Row, kind: str, version: Optional[str], similarity: float = 1.0, differs=()) -> Dict[str, Any]:
+        return {
+            "kind": kind,
+            "form_id": row["id"],
+            "similarity": round(similarity, 3),
+            "differs": list(differs),
+            "validated_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(row["created_at"])),
+            "filename": row["filename"] or "",
+            "verdict": row["verdict"],
+            "save_id": row["save_id"],
+            "reusable": kind in REUSABLE_KINDS and version is not None and row["version"] == version,
+        }
+
+    def _newest(self, column: str, value: str, version: Optional[str]) -> Optional[sqlite3.Row]:
+        # prefer a row validated by the current version, else the newest
+        return self._conn().execute(
+            f"SELECT * FROM forms WHERE {column} = ? ORDER BY version = ? DESC, id DESC LIMIT 1",
+            (value, version or ""),
+        ).fetchone()
+
+    def match_pdf(self, pdf_hash: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The form last validated from these exact bytes, or None."""
+        row = self._newest("pdf_hash", pdf_hash, version)
+        return self._match(row, "exact", version) if row is not None else None
+
+    def match_fields(self, data: Dict[str, Any], version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Earlier forms like `data`, best first: a same-fields match (if any)
+        followed by near matches at or above the similarity threshold.
+        """
+        conn = self._conn()
+        matches = []
+        same = self._newest("fields_hash", fields_fingerprint(data), version)
+        if same is not None:
+            matches.append(self._match(same, "same_fields", version))
+
+        shared: Dict[int, int] = {}
+        for band, bucket in enumerate(band_buckets(minhash(field_tokens(data)))):
+            for (form_id,) in conn.execute(
+                "SELECT form_id FROM lsh WHERE band = ? AND bucket = ? ORDER BY form_id DESC LIMIT ?",
+                (band, bucket, CANDIDATES_PER_BUCKET),
+            ):
+                shared[form_id] = shared.get(form_id, 0) + 1
+        if same is not None:
+            shared.pop(same["id"], None)
+        candidates = sorted(shared, key=lambda i: (shared[i], i), reverse=True)[:MAX_CANDIDATES]
+        if candidates:
+            rows = conn.execute(
+                f"SELECT * FROM forms WHERE id IN ({','.join('?' * len(candidates))})", candidates
+            ).fetchall()
+            near = []
+            for row in rows:
+                diff = compare_fields(data, json.loads(row["fields"]))
+                if diff["similarity"] >= self.similarity:
+                    near.append(self._match(row, "near", version, diff["similarity"], diff["differs"]))
+            near.sort(key=lambda m: (m["similarity"], m["form_id"]), reverse=True)
+            matches.extend(near)
+        return matches[: self.max_matches]
+
+    def outcome(self, form_id: int) -> Optional[Dict[str, Any]]:
+        """Stored outcome of a form (as pipeline.validate_referrals returned it), or None."""
+        row = self._conn().execute("SELECT fields, outcome FROM forms WHERE id = ?", (form_id,)).fetchone()
+        if row is None or not row["outcome"]:
+            return None
+        return {**json.loads(row["outcome"]), "data": json.loads(row["fields"])}
+
+    def add(
+        self,
+        pdf_hash: Optional[str],
+        data: Dict[str, Any],
+        outcome: Dict[str, Any],
+        version: str,
+        filename: str = "",
+    ) -> int:
+        """Record a validated form; returns its id. Forms with already-indexed fields get no new LSH rows."""
+        fields_hash = fields_fingerprint(data)
+        # the fields are stored once, in their own column
+        stored = {k: v for k, v in outcome.items()
+                  if k not in ("data", "duplicates", "reused", "reused_from", "fingerprint_id", "save_id", "already_saved")}
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            known = conn.execute("SELECT 1 FROM forms WHERE fields_hash = ? LIMIT 1", (fields_hash,)).fetchone()
+            cur = conn.execute(
+                "INSERT INTO forms (pdf_hash, fields_hash, version, filename, created_at, verdict, fields, outcome) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pdf_hash, fields_hash, version, filename, time.time(), outcome.get("result"),
+                 json.dumps(data, ensure_ascii=False), json.dumps(stored, ensure_ascii=False, default=str)),
+            )
+            form_id = cur.lastrowid
+            if known is None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO lsh (band, bucket, form_id) VALUES (?, ?, ?)",
+                    [(band, bucket, form_id) for band, bucket in enumerate(band_buckets(minhash(field_tokens(data))))],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return form_id
+
+    def record_save(self, form_id: int, save_id: str) -> None:
+        self._conn().execute("UPDATE forms SET save_id = ? WHERE id = ?", (save_id, form_id))
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM forms").fetchone()[0]
+
+    def purge(self, older_than_days: int) -> int:
+        """
+        Delete forms recorded more than `older_than_days` ago, with their LSH
+        rows. Only the first form of a fields hash has LSH rows (see add), so
+        when it goes they are handed to the oldest one kept. Returns the number of forms deleted.
+        """
+        cutoff = time.time() - older_than_days * 86400
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexed = conn.execute(
+                "SELECT DISTINCT f.id, f.fields_hash FROM forms f JOIN lsh ON lsh.form_id = f.id WHERE f.created_at < ?",
+                (cutoff,),
+            ).fetchall()
+            for row in indexed:
+                heir = conn.execute(
+                    "SELECT MIN(id) FROM forms WHERE fields_hash = ? AND created_at >= ?", (row["fields_hash"], cutoff)
+                ).fetchone()[0]
+                if heir is not None:
+                    conn.execute("UPDATE OR IGNORE lsh SET form_id = ? WHERE form_id = ?", (heir, row["id"]))
+            conn.execute("DELETE FROM lsh WHERE form_id IN (SELECT id FROM forms WHERE created_at < ?)", (cutoff,))
+            cur = conn.execute("DELETE FROM forms WHERE created_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount
+
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[FingerprintIndex]:
+    """Process-wide index, or None when DEDUP_ENABLED is 0."""
+    global _index
+    if _index is None:
+        if not get_int_setting("DEDUP_ENABLED", 1):
+            return None
+        with _index_lock:
+            if _index is None:
+                index = FingerprintIndex(
+                    get_setting("DEDUP_DB_PATH", str(_DEFAULT_DB_PATH)),
+                    similarity=float(get_setting("DEDUP_SIMILARITY", "0.85")),
+                    max_matches=get_int_setting("DEDUP_MAX_MATCHES", 5),
+                )
+                try:
+                    index.purge(get_int_setting("DEDUP_RETENTION_DAYS", 30))
+                except sqlite3.Error as e:
+                    log.warning("Could not purge old forms from the fingerprint index: %s", e)
+                _index = index
+    return _index
+
+
+def public_matches(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Matches as reported to users / API clients."""
+    return [{k: v for k, v in m.items() if k != "reusable"} for m in matches]
+
+
+def persist_outcome(outcome: Dict[str, Any], name_suffix: str = "") -> str:
+    """
+    Queue the save of a validated form and return its tracking id, unless the
+    result was reused from a form that is already saved: then no new blob is
+    written and the earlier save's id is returned (outcome["already_saved"]).
+    """
+    from chatbot.persist_queue import enqueue_save
+
+    if outcome.get("reused"):
+        # only the save of the form whose result was reused (not, say, an exact match under an older version)
+        prior = next((m.get("save_id") for m in outcome.get("duplicates", [])
+                      if m["form_id"] == outcome.get("reused_from")), None)
+        if prior:
+            outcome["save_id"], outcome["already_saved"] = prior, True
+            return prior
+    outcome["save_id"] = enqueue_save(outcome["record"], name_suffix=name_suffix)
+    index = get_index()
+    if index is not None and outcome.get("fingerprint_id"):
+        try:
+            index.record_save(outcome["fingerprint_id"], outcome["save_id"])
+        except sqlite3.Error as e:
+            log.warning("Could not record save in the fingerprint index: %s", e)
+    return outcome["save_id"]
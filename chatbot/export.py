@@ -0,0 +1,216 @@
+# chatbot/export.py
+"""
+Bulk export of saved forms (the dashboard's "Export" button), e.g. every
+form matching the current status / date filters for an audit:
+
+    python -m chatbot.export --start 2025-01-01 --end 2025-03-31 --format csv --out q1.csv
+
+Formats:
+    csv      one combined CSV, one row per form, plus a "blob" column
+    parquet  the same table as Parquet (all columns strings)
+    zip      the original CSV blobs, keeping their status/date folders
+
+Blobs are downloaded on a thread pool (EXPORT_MAX_WORKERS) and written to
+the output as they arrive, in listing order, with at most a few downloads
+per worker buffered. The combined formats spool rows to a temporary file
+first, because the header needs the union of all forms' columns; either
+way memory stays bounded by the window, not by the number of forms.
+Exports bypass blob_reader's cache so a big export does not evict the
+forms people are looking at.
+
+The dashboard's download button hands the finished file to Streamlit, which
+holds it in server memory until the session moves on, so the dashboard only
+offers exports of up to DASHBOARD_EXPORT_MAX_FORMS forms and points to this
+command (which streams to disk) for larger ranges.
+"""
+import argparse
+import csv
+import io
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from chatbot.blob_layout import STATUSES
+from chatbot.clients import get_blob_service
+from chatbot.settings import get_int_setting
+
+
+EXPORT_MAX_WORKERS = get_int_setting("EXPORT_MAX_WORKERS", 16)
+BUFFER_PER_WORKER = 4  # downloads done or in flight ahead of the writer, per worker
+PARQUET_BATCH_ROWS = 5_000
+DASHBOARD_EXPORT_MAX_FORMS = get_int_setting("DASHBOARD_EXPORT_MAX_FORMS", 2_000)
+
+# format -> (mime type, file extension)
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "zip": ("application/zip", ".zip"),
+}
+
+
+def iter_blobs(container: str, names: Sequence[str], max_workers: int = EXPORT_MAX_WORKERS) -> Iterator[Tuple[str, bytes]]:
+    """
+    (name, bytes) for each blob in `names`, in order, downloaded concurrently
+    with a bounded window. Blobs deleted or moved since they were listed are skipped.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+
+    container_client = get_blob_service().get_container_client(container)
+
+    def download(name: str) -> Optional[bytes]:
+        try:
+            return container_client.get_blob_client(name).download_blob().readall()
+        except ResourceNotFoundError:
+            return None
+
+    workers = max(1, min(int(max_workers), len(names) or 1))
+    window = workers * BUFFER_PER_WORKER
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as pool:
+        pending: "deque[Tuple[str, Any]]" = deque()
+        todo = iter(names)
+        try:
+            for name in todo:
+                pending.append((name, pool.submit(download, name)))
+                if len(pending) >= window:
+                    done_name, fut = pending.popleft()
+                    payload = fut.result()
+                    if payload is not None:
+                        yield done_name, payload
+            while pending:
+                done_name, fut = pending.popleft()
+                payload = fut.result()
+                if payload is not None:
+                    yield done_name, payload
+        finally:
+            for _, fut in pending:  # the consumer stopped early (or a download failed)
+                fut.cancel()
+
+
+def _rows(blobs: Iterable[Tuple[str, bytes]]) -> Iterator[Dict[str, str]]:
+    for name, payload in blobs:
+        for row in csv.DictReader(io.StringIO(payload.decode("utf-8-sig"))):
+            yield {"blob": name, **{k: v for k, v in row.items() if k is not None}}
+
+
+def _spool_rows(rows: Iterable[Dict[str, str]]) -> Tuple[IO[str], List[str], int]:
+    """Write rows to a temporary JSONL file; returns (file rewound, column union in first-seen order, row count)."""
+    spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+    columns: Dict[str, None] = {}
+    count = 0
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+        spool.write(json.dumps(row, ensure_ascii=False) + "\n")
+        count += 1
+    spool.seek(0)
+    return spool, list(columns), count
+
+
+def export_csv(container: str, names: Sequence[str], out: IO[bytes], max_workers: int = EXPORT_MAX_WORKERS) -> int:
+    """Write the forms as one combined CSV to a binary stream; returns the row count."""
+    spool, columns, count = _spool_rows(_rows(iter_blobs(container, names, max_workers)))
+    with spool:
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        try:
+            writer = csv.DictWriter(text, fieldnames=columns or ["blob"], restval="")
+            writer.writeheader()
+            for line in spool:
+                writer.writerow(json.loads(line))
+        finally:
+            text.detach()  # leave `out` open for the caller
+    return count
+
+
+def export_parquet(container: str, names: Sequence[str], out: IO[bytes], max_workers: int = EXPORT_MAX_WORKERS) -> int:
+    """Same table as export_csv, as Parquet, written in row groups of PARQUET_BATCH_ROWS."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    spool, columns, count = _spool_rows(_rows(iter_blobs(container, names, max_workers)))
+    schema = pa.schema([(c, pa.string()) for c in columns or ["blob"]])
+    with spool, pq.ParquetWriter(out, schema) as writer:
+        batch: List[Dict[str, Any]] = []
+        for line in spool:
+            batch.append(json.loads(line))
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch or not count:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return count
+
+
+def export_zip(container: str, names: Sequence[str], out: IO[bytes], max_workers: int = EXPORT_MAX_WORKERS) -> int:
+    """Zip the original blobs (names keep their folders) into a binary stream; returns the file count."""
+    count = 0
+    with ZipFile(out, "w", compression=ZIP_DEFLATED) as archive:
+        for name, payload in iter_blobs(container, names, max_workers):
+            archive.writestr(name, payload)
+            count += 1
+    return count
+
+
+_EXPORTERS = {"csv": export_csv, "parquet": export_parquet, "zip": export_zip}
+
+
+def export_forms(container: str, names: Sequence[str], fmt: str, out: IO[bytes], max_workers: int = EXPORT_MAX_WORKERS) -> int:
+    if fmt not in _EXPORTERS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    return _EXPORTERS[fmt](container, names, out, max_workers)
+
+
+def export_to_tempfile(container: str, names: Sequence[str], fmt: str, max_workers: int = EXPORT_MAX_WORKERS) -> IO[bytes]:
+    """Export into an anonymous temporary file, rewound for reading (for st.download_button)."""
+    out = tempfile.TemporaryFile()
+    try:
+        export_forms(container, names, fmt, out, max_workers)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+
+def cli_command(start: date, end: date, fmt: str, statuses: Optional[Sequence[str]] = None, container: str = "filled-forms") -> str:
+    """The `python -m chatbot.export` command line for the same export (for ranges too big for the dashboard)."""
+    parts = ["python -m chatbot.export", f"--start {min(start, end):%Y-%m-%d}", f"--end {max(start, end):%Y-%m-%d}",
+             f"--format {fmt}"]
+    if container != "filled-forms":
+        parts.append(f"--container {container}")
+    if statuses and set(statuses) != set(STATUSES):
+        parts.extend(f"--status {s}" for s in sorted(statuses))
+    return " ".join(parts)
+
+
+def export_file_name(start: date, end: date, fmt: str, statuses: Optional[Sequence[str]] = None) -> str:
+    status_part = "" if not statuses or set(statuses) == set(STATUSES) else "_" + "-".join(sorted(statuses))
+    return f"forms_{min(start, end):%Y-%m-%d}_to_{max(start, end):%Y-%m-%d}{status_part}{FORMATS[fmt][1]}"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from chatbot.blob_reader import list_forms
+
+    parser = argparse.ArgumentParser(description="Export saved forms in a date range.")
+    parser.add_argument("--container", default="filled-forms")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="first UTC save date, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last UTC save date (default: --start)")
+    parser.add_argument("--status", action="append", choices=STATUSES, help="repeat for several (default: all)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--out", help="output file (default: forms_<start>_to_<end>.<ext>)")
+    parser.add_argument("--workers", type=int, default=EXPORT_MAX_WORKERS)
+    args = parser.parse_args(argv)
+
+    end = args.end or args.start
+    statuses = args.status or list(STATUSES)
+    names = list_forms(args.container, args.start, end, statuses)["name"].tolist()
+    out_path = args.out or export_file_name(args.start, end, args.format, statuses)
+    with open(out_path, "wb") as out:
+        count = export_forms(args.container, names, args.format, out, args.workers)
+    print(f"Exported {count} {'files' if args.format == 'zip' else 'rows'} from {len(names)} forms to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
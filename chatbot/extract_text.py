@@ -1,29 +1,46 @@
 # extract_text.py
+import asyncio
 from pathlib import Path
-from typing import Any, Dict, Optional
-import streamlit as st
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+from typing import Any, Dict, List, Optional
 
+from chatbot.acroform import read_acroform_fields
+from chatbot.cache import TieredCache, content_key
+from chatbot.clients import get_docintel_client
+from chatbot.governor import docintel_governor
+from chatbot.metrics import span
+from chatbot.settings import get_int_setting, get_setting, require_setting
 
-# --- Load Azure keys from Streamlit secrets ---
-try:
-    ENDPOINT = st.secrets["AZURE_DOCINTEL_ENDPOINT"]
-    KEY = st.secrets["AZURE_DOCINTEL_KEY"]
-    MODEL_ID = st.secrets["AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID"]
-except KeyError as e:
-    raise RuntimeError(
-        f"Missing required key in Streamlit secrets: {e}\n\n"
-        "In your Streamlit app → ⋯ → Edit secrets, add:\n"
-        'AZURE_DOCINTEL_ENDPOINT = "https://<your-resource>.cognitiveservices.azure.com"\n'
-        'AZURE_DOCINTEL_KEY = "<your-key>"\n'
-        'AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID = "<your-model-id>"'
-    )
 
+# --- Model id (Streamlit secrets, read on first use) ---
+def _model_id() -> str:
+    return require_setting("AZURE_DOCUMENT_INTELLIGENCE_MODEL_ID", "<your-model-id>")
 
-# --- Create client ---
-_client = DocumentIntelligenceClient(ENDPOINT, AzureKeyCredential(KEY))
+
+# --- Extraction cache (same PDF bytes + same model => same fields) ---
+# Values are lists of field dicts, one per document found in the PDF.
+# Built on first use so importing this module reads no settings.
+_DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache" / "extraction"
+_cache: Optional[TieredCache] = None
+
+
+def _get_cache() -> TieredCache:
+    global _cache
+    if _cache is None:
+        _cache = TieredCache(
+            "extraction",
+            max_items=get_int_setting("EXTRACTION_CACHE_MAX_ITEMS", 256),
+            disk_dir=get_setting("EXTRACTION_CACHE_DIR", str(_DEFAULT_CACHE_DIR)),
+            max_disk_bytes=get_int_setting("EXTRACTION_CACHE_MAX_MB", 100) * 1024 * 1024,
+            ttl_seconds=get_int_setting("EXTRACTION_CACHE_TTL_HOURS", 24 * 30) * 3600,
+        )
+    return _cache
+
+
+def _analyze_request(pdf_bytes: bytes):
+    # the Document Intelligence SDK is only imported once a PDF actually needs it
+    from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+
+    return AnalyzeDocumentRequest(bytes_source=pdf_bytes)
 
 
 # --- Field normalization helper ---
@@ -51,21 +68,130 @@ def _normalize_value(field: Optional[Dict[str, Any]]) -> str:
 
 
 # --- Main functions ---
+def extraction_cache_key(pdf_bytes: bytes) -> str:
+    """Cache key for a PDF: hash of the model id and the raw bytes."""
+    return content_key(_model_id(), pdf_bytes)
+
+
+def extraction_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the extraction cache."""
+    return _get_cache().stats()
+
+
+def _cached_documents(key: str) -> Optional[List[Dict[str, str]]]:
+    cached = _get_cache().get(key)
+    if not isinstance(cached, list):
+        return None  # miss, or an entry from before bundles were split (first document only)
+    return [dict(doc) for doc in cached]
+
+
+def extract_documents_bytes(pdf_bytes: bytes) -> List[Dict[str, str]]:
+    """
+    Return extracted fields for a PDF, one dict per document in it (a faxed
+    bundle can hold several referral forms; a PDF with no recognised form
+    gives one empty dict).
+    Fillable PDFs are read locally from their AcroForm; everything else goes
+    to Document Intelligence, with repeat submissions of the exact same file
+    served from the extraction cache.
+    """
+    local = extract_acroform_bytes(pdf_bytes)
+    if local is not None:
+        return [local]
+
+    key = extraction_cache_key(pdf_bytes)
+    cached = _cached_documents(key)
+    if cached is not None:
+        return cached
+
+    documents = _analyze_bytes(pdf_bytes)
+    _get_cache().set(key, documents)
+    return [dict(doc) for doc in documents]
+
+
 def extract_form_bytes(pdf_bytes: bytes) -> Dict[str, str]:
-    """Analyze PDF bytes and return extracted fields."""
-    req = AnalyzeDocumentRequest(bytes_source=pdf_bytes)
-    poller = _client.begin_analyze_document(MODEL_ID, req)
-    result = poller.result()
-
-    data = {}
-    if result.documents:
-        doc = result.documents[0]
-        for name, field in (doc.fields or {}).items():
-            data[name] = _normalize_value({
-                "value": getattr(field, "value", None),
-                "content": getattr(field, "content", None)
+    """Fields of the first document in a PDF (see extract_documents_bytes for bundles)."""
+    return extract_documents_bytes(pdf_bytes)[0]
+
+
+async def extract_documents_bytes_async(pdf_bytes: bytes, client) -> List[Dict[str, str]]:
+    """
+    asyncio version of extract_documents_bytes using a caller-owned
+    azure.ai.documentintelligence.aio.DocumentIntelligenceClient.
+    Shares the AcroForm fast path and the extraction cache with the sync API;
+    both parse / hash the PDF or touch the disk tier, so they run on a worker
+    thread instead of blocking the event loop.
+    """
+    local = await asyncio.to_thread(extract_acroform_bytes, pdf_bytes)
+    if local is not None:
+        return [local]
+
+    key = await asyncio.to_thread(extraction_cache_key, pdf_bytes)
+    cached = await asyncio.to_thread(_cached_documents, key)
+    if cached is not None:
+        return cached
+
+    req = _analyze_request(pdf_bytes)
+
+    async def analyze():
+        with span("docintel.submit"):
+            poller = await client.begin_analyze_document(_model_id(), req)
+        with span("docintel.poll"):
+            return await poller.result()
+
+    documents = documents_from_result(await docintel_governor().acall(analyze))
+    await asyncio.to_thread(_get_cache().set, key, documents)
+    return [dict(doc) for doc in documents]
+
+
+async def extract_form_bytes_async(pdf_bytes: bytes, client) -> Dict[str, str]:
+    """Fields of the first document in a PDF, asyncio version."""
+    return (await extract_documents_bytes_async(pdf_bytes, client))[0]
+
+
+def extract_acroform_bytes(pdf_bytes: bytes) -> Optional[Dict[str, str]]:
+    """Local fast path: normalized AcroForm fields, or None if the PDF is not fillable."""
+    with span("acroform"):
+        fields = read_acroform_fields(pdf_bytes)
+    if fields is None:
+        return None
+    with span("normalize"):
+        return {name: _normalize_value(field) for name, field in fields.items()}
+
+
+def _analyze_bytes(pdf_bytes: bytes) -> List[Dict[str, str]]:
+    """
+    Analyze PDF bytes with Document Intelligence and return each document's fields.
+    Admission, 429 retries and backoff are handled by the shared governor.
+    """
+    req = _analyze_request(pdf_bytes)
+
+    def analyze():
+        with span("docintel.submit"):
+            poller = get_docintel_client().begin_analyze_document(_model_id(), req)
+        with span("docintel.poll"):
+            return poller.result()
+
+    return documents_from_result(docintel_governor().call(analyze))
+
+
+def documents_from_result(result) -> List[Dict[str, str]]:
+    """Normalized fields of every document in an AnalyzeResult, in order (at least one, possibly empty, dict)."""
+    documents = []
+    with span("normalize"):
+        for doc in result.documents or []:
+            documents.append({
+                name: _normalize_value({
+                    "value": getattr(field, "value", None),
+                    "content": getattr(field, "content", None)
+                })
+                for name, field in (doc.fields or {}).items()
             })
-    return data
+    return documents or [{}]
+
+
+def fields_from_result(result) -> Dict[str, str]:
+    """Normalized fields of the first document in an AnalyzeResult."""
+    return documents_from_result(result)[0]
 
 
 def extract_form_file(filepath: str) -> Dict[str, str]:
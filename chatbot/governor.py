@@ -0,0 +1,417 @@
+# chatbot/governor.py
+"""
+Admission control for the rate-limited Azure services.
+
+One Governor per Azure OpenAI deployment and one per Document Intelligence
+resource, shared by every session, job worker and batch in the process:
+
+    result = openai_governor(deployment).call(
+        lambda: client.chat.completions.create(...),
+        tokens=estimated_tokens,
+        usage=lambda response: response.usage.total_tokens,
+    )
+
+A call is admitted when
+  - the requests/minute and tokens/minute buckets have room (token costs are
+    estimated up front and reconciled with the real usage afterwards),
+  - fewer calls than the adaptive concurrency limit are in flight, and
+  - no Retry-After from an earlier 429 is still pending.
+The concurrency limit follows AIMD: +1 per limit's worth of successes, halved
+on a 429 (other failures leave it alone). Waiting callers are admitted
+round-robin by tenant (a Streamlit session, see tenant_scope), so one large
+batch can't starve everyone else. A 429 is retried after its Retry-After
+(or exponential backoff), and a transient failure (connection error,
+timeout, 408/500/502/504) after exponential backoff, up to max_retries
+times. The SDK clients are built with their own retries off, so every
+attempt goes through admission and a 429 is never retried behind our back.
+
+Settings (0 = no limit): OPENAI_RPM, OPENAI_TPM, OPENAI_MAX_CONCURRENCY,
+DOCINTEL_RPM, DOCINTEL_MAX_CONCURRENCY, RATE_LIMIT_MAX_RETRIES.
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional
+
+from chatbot.metrics import observe
+from chatbot.settings import get_int_setting
+
+
+BACKOFF_BASE_SECONDS = 1.0
+TRANSIENT_STATUS_CODES = (408, 500, 502, 504)
+# connection / timeout errors of openai, httpx and azure-core, matched by name so no SDK is imported here
+TRANSIENT_ERROR_NAMES = frozenset({"APIConnectionError", "TransportError", "ServiceRequestError", "ServiceResponseError"})
+BACKOFF_MAX_SECONDS = 60.0
+DECREASE_COOLDOWN_SECONDS = 1.0  # one halving per burst of concurrent 429s
+DEFAULT_TENANT = "default"
+
+_tenant: contextvars.ContextVar = contextvars.ContextVar("governor_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[None]:
+    """Attribute governed calls made inside the block to `tenant` (e.g. a session id)."""
+    token = _tenant.set(tenant or DEFAULT_TENANT)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+
+def session_tenant() -> str:
+    """Id of the Streamlit session running this script (DEFAULT_TENANT outside Streamlit)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    return ctx.session_id if ctx is not None else DEFAULT_TENANT
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return (len(text or "") + 3) // 4
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """
+    For a throttling error (HTTP 429, or 503 "busy", from openai or azure-core)
+    the server's Retry-After in seconds, or 0.0 when it sent none; None for
+    other errors.
+    """
+    if getattr(exc, "status_code", None) not in (429, 503):
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except (TypeError, ValueError):
+            continue
+    return 0.0
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for failures worth retrying that are not throttling: lost connections, timeouts, 5xx."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(exc, "status_code", None) in TRANSIENT_STATUS_CODES:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute`; may go into debt."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (amounts above capacity only need a full bucket)."""
+        needed = min(amount, self.capacity) - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+
+class _Waiter:
+    __slots__ = ("tenant", "tokens", "granted")
+
+    def __init__(self, tenant: str, tokens: int):
+        self.tenant, self.tokens, self.granted = tenant, tokens, False
+
+
+class Permit:
+    def __init__(self, governor: "Governor", tokens: int):
+        self.governor, self.tokens = governor, tokens
+
+
+class Governor:
+    def __init__(
+        self,
+        name: str,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_concurrency: int = 16,
+        max_retries: int = 5,
+    ):
+        self.name = name
+        self.requests = _Bucket(rpm) if rpm > 0 else None
+        self.tokens = _Bucket(tpm) if tpm > 0 else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max(0, int(max_retries))
+
+        self._cond = threading.Condition()
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._order: Deque[str] = deque()  # tenants with waiters, in round-robin order
+        self._stats = {"admitted": 0, "throttled": 0, "retries": 0}
+
+    # ----- admission -----
+    def _enqueue(self, waiter: _Waiter) -> None:
+        queue = self._queues.setdefault(waiter.tenant, deque())
+        if not queue:
+            self._order.append(waiter.tenant)
+        queue.append(waiter)
+
+    def _dispatch(self, now: float) -> float:
+        """
+        Admit waiters round-robin while capacity allows (caller holds the lock).
+        Returns how long until capacity could next free up (for wait timeouts).
+        """
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.refill(now)
+
+        granted = False
+        delay = 1.0
+        while self._order:
+            if now < self._blocked_until:
+                delay = self._blocked_until - now
+                break
+            if self._in_flight >= int(self._limit):
+                break  # a release will notify
+            tenant = self._order[0]
+            waiter = self._queues[tenant][0]
+            bucket_wait = max(
+                self.requests.wait_for(1) if self.requests else 0.0,
+                self.tokens.wait_for(waiter.tokens) if self.tokens else 0.0,
+            )
+            if bucket_wait > 0:
+                delay = bucket_wait
+                break
+
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= waiter.tokens
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            waiter.granted = True
+            granted = True
+
+            queue = self._queues[tenant]
+            queue.popleft()
+            self._order.popleft()
+            if queue:
+                self._order.append(tenant)  # back of the line for fairness
+            else:
+                del self._queues[tenant]
+
+        if granted:
+            self._cond.notify_all()
+        return max(0.001, delay)
+
+    def acquire(self, tokens: int = 0, tenant: Optional[str] = None) -> Permit:
+        """Block until admitted."""
+        waiter = _Waiter(tenant or current_tenant(), max(0, int(tokens)))
+        start = time.perf_counter()
+        with self._cond:
+            self._enqueue(waiter)
+            try:
+                while True:
+                    delay = self._dispatch(time.monotonic())
+                    if waiter.granted:
+                        break
+                    self._cond.wait(delay)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        observe(f"governor.{self.name}.wait", time.perf_counter() - start)
+        return Permit(self, waiter.tokens)
+
+    async def aacquire(self, tokens: int = 0, tenant: Optional[str] = None) -> Permit:
+        """asyncio version of acquire (waits with asyncio.sleep, never blocks the loop)."""
+        waiter = _Waiter(tenant or current_tenant(), max(0, int(tokens)))
+        start = time.perf_counter()
+        with self._cond:
+            self._enqueue(waiter)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._dispatch(time.monotonic())
+                    if waiter.granted:
+                        break
+                await asyncio.sleep(min(delay, 0.05))
+        except BaseException:  # e.g. the task was cancelled
+            with self._cond:
+                self._abandon(waiter)
+            raise
+        observe(f"governor.{self.name}.wait", time.perf_counter() - start)
+        return Permit(self, waiter.tokens)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Drop a waiter that gave up (caller holds the lock); hands back its slot if it got one."""
+        if waiter.granted:
+            self._in_flight -= 1
+            if self.tokens is not None:
+                self.tokens.level += waiter.tokens
+            self._cond.notify_all()
+            return
+        queue = self._queues.get(waiter.tenant)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.tenant]
+                self._order.remove(waiter.tenant)
+
+    def release(
+        self,
+        permit: Permit,
+        used_tokens: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        failed: bool = False,
+    ) -> None:
+        """
+        Return a permit. `used_tokens` reconciles the up-front estimate;
+        `retry_after` (seconds, from retry_after_seconds) marks the call as
+        throttled, which pauses admission and halves the concurrency limit.
+        Only calls that neither failed nor were throttled raise the limit.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            if self.tokens is not None and used_tokens is not None:
+                self.tokens.level -= used_tokens - permit.tokens
+            if retry_after is None:
+                if not failed:
+                    self._limit = min(self.max_concurrency, self._limit + 1.0 / self._limit)
+            else:
+                self._stats["throttled"] += 1
+                if retry_after > 0:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                    self._limit = max(1.0, self._limit / 2)
+                    self._last_decrease = now
+            self._dispatch(now)
+            self._cond.notify_all()
+
+    # ----- governed calls -----
+    def backoff(self, attempt: int, retry_after: float) -> float:
+        """Seconds to wait before retry `attempt` (0-based) of a throttled or failed call."""
+        if retry_after > 0:
+            return retry_after
+        return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def release_failed(self, permit: Permit, exc: BaseException, attempt: int) -> Optional[float]:
+        """
+        Return the permit of attempt `attempt` (0-based) that raised `exc`.
+        Seconds to wait before retrying a throttled or transient failure, or
+        None when the error is final or the retries are used up.
+        """
+        retry_after = retry_after_seconds(exc)
+        self.release(permit, retry_after=retry_after, failed=True)
+        if (retry_after is None and not is_transient(exc)) or attempt >= self.max_retries:
+            return None
+        self._count_retry()
+        return self.backoff(attempt, retry_after or 0.0)
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """Run fn() once admitted, retrying 429s and transient errors; `usage(result)` reports the real token count."""
+        for attempt in range(self.max_retries + 1):
+            permit = self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                wait = self.release_failed(permit, e, attempt)
+                if wait is None:
+                    raise
+                time.sleep(wait)
+                continue
+            self.release(permit, used_tokens=usage(result) if usage else None)
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """asyncio version of call; fn returns a fresh awaitable per attempt."""
+        for attempt in range(self.max_retries + 1):
+            permit = await self.aacquire(tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                wait = self.release_failed(permit, e, attempt)
+                if wait is None:
+                    raise
+                await asyncio.sleep(wait)
+                continue
+            self.release(permit, used_tokens=usage(result) if usage else None)
+            return result
+
+    def _count_retry(self) -> None:
+        with self._cond:
+            self._stats["retries"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "governor": self.name,
+                "limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "waiting": sum(len(q) for q in self._queues.values()),
+                "blocked_for_s": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+                **self._stats,
+            }
+
+
+_lock = threading.Lock()
+_governors: Dict[str, Governor] = {}
+
+
+def _get(name: str, factory: Callable[[], Governor]) -> Governor:
+    with _lock:
+        if name not in _governors:
+            _governors[name] = factory()
+        return _governors[name]
+
+
+def openai_governor(deployment: str) -> Governor:
+    return _get(f"openai:{deployment}", lambda: Governor(
+        f"openai:{deployment}",
+        rpm=get_int_setting("OPENAI_RPM", 0),
+        tpm=get_int_setting("OPENAI_TPM", 0),
+        max_concurrency=get_int_setting("OPENAI_MAX_CONCURRENCY", 16),
+        max_retries=get_int_setting("RATE_LIMIT_MAX_RETRIES", 5),
+    ))
+
+
+def docintel_governor() -> Governor:
+    return _get("docintel", lambda: Governor(
+        "docintel",
+        rpm=get_int_setting("DOCINTEL_RPM", 0),
+        max_concurrency=get_int_setting("DOCINTEL_MAX_CONCURRENCY", 16),
+        max_retries=get_int_setting("RATE_LIMIT_MAX_RETRIES", 5),
+    ))
+
+
+def governor_stats() -> list:
+    with _lock:
+        governors = list(_governors.values())
+    return [g.stats() for g in governors]
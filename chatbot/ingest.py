@@ -0,0 +1,314 @@
+# chatbot/ingest.py
+"""
+Command-line / hot-folder ingester for folders of referral PDFs.
+
+    python -m chatbot.ingest forms test-forms --out ingest.jsonl --workers 8
+    python -m chatbot.ingest /mnt/referrals --out ingest.jsonl --watch --persist
+
+Each PDF goes extract -> sanity check -> reply for every referral form in
+it (pipeline.validate_referrals, so resubmitted forms reuse earlier
+results, see chatbot/dedup.py) and, with --persist, into the background
+save queue, on a pool of worker threads. One JSON line per file (with a
+"referrals" list for bundles, see pipeline.pdf_response) is appended to
+--out (and fsynced) as soon as it finishes. That file is also the checkpoint: a re-run skips every file
+already recorded with the same size and modification time, so a crashed or
+interrupted run resumes where it stopped; files that errored are retried.
+(A file whose line was lost still isn't re-analyzed: its fields are in the
+extraction cache.)
+
+--parquet writes every result in --out (this run and earlier ones) as a
+Parquet table at the end. --watch keeps scanning the folders every
+--interval seconds; a new file is picked up once its size and modification
+time stop changing, so half-copied files are not read. A file that
+errored is retried after a backoff (RETRY_BACKOFF_SECONDS, doubling) and
+given up on after --max-attempts tries, until it changes. Progress (done /
+total, files/s, ETA) goes to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from chatbot.governor import tenant_scope
+from chatbot.pipeline import pdf_response, validate_referrals
+
+
+PROGRESS_INTERVAL_SECONDS = 2.0
+RETRY_BACKOFF_SECONDS = 60.0  # first wait before a failed file is tried again in watch mode
+RETRY_BACKOFF_MAX_SECONDS = 3600.0
+TENANT = "ingest"  # the ingester's share of the rate limits, next to UI sessions
+
+# (size, mtime_ns) identifies the version of a file we processed
+Stamp = Tuple[int, int]
+
+
+def _stamp(path: Path) -> Stamp:
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def scan(roots: Iterable[Union[str, Path]]) -> List[Path]:
+    """All PDFs under `roots` (files or folders, searched recursively), sorted."""
+    found: Set[Path] = set()
+    for root in map(Path, roots):
+        if root.is_file():
+            candidates: Iterable[Path] = [root]
+        elif root.is_dir():
+            candidates = root.rglob("*")
+        else:
+            continue
+        found.update(p.resolve() for p in candidates if p.is_file() and p.suffix.lower() == ".pdf")
+    return sorted(found)
+
+
+def read_results(out: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+    """Latest result line per file in a results JSONL (missing file -> {})."""
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(out, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                if isinstance(row, dict) and row.get("file"):
+                    results[row["file"]] = row
+    except FileNotFoundError:
+        pass
+    return results
+
+
+def write_parquet(out: Union[str, Path], parquet: Union[str, Path]) -> int:
+    """
+    Write the results in `out` as a Parquet table (one column per field, one
+    row per referral); returns the row count.
+    """
+    import pandas as pd
+
+    rows = []
+    for row in read_results(out).values():
+        file_info = {k: v for k, v in row.items() if k not in ("fields", "referrals", "validation_status", "documents")}
+        for form in row.get("referrals") or [row]:
+            flat = {**file_info, **{k: v for k, v in form.items() if k != "fields"}}
+            flat.update({k: v for k, v in (form.get("fields") or {}).items() if k not in flat})
+            rows.append(flat)
+    pd.DataFrame(rows, dtype="object").astype("string").to_parquet(parquet, index=False)
+    return len(rows)
+
+
+class Progress:
+    """Throughput / ETA line on stderr, at most every PROGRESS_INTERVAL_SECONDS."""
+
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+        self.start = time.monotonic()
+        self.total = 0
+        self.done = 0
+        self.errors = 0
+        self._last = 0.0
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        rate = self.done / elapsed
+        remaining = self.total - self.done
+        eta = f"{int(remaining / rate // 60)}:{int(remaining / rate % 60):02d}" if rate and remaining else "-"
+        return (f"[{self.done:>{len(str(self.total))}}/{self.total}] {rate:.2f} files/s, "
+                f"ETA {eta}, {self.errors} errors")
+
+    def update(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - self._last >= PROGRESS_INTERVAL_SECONDS:
+            self._last = now
+            print(self.line(), file=self.stream, flush=True)
+
+
+class Ingester:
+    def __init__(
+        self,
+        roots: Sequence[Union[str, Path]],
+        out: Union[str, Path],
+        workers: int = 4,
+        persist: bool = False,
+        generator=None,
+        progress: Optional[Progress] = None,
+        max_attempts: int = 3,
+    ):
+        self.roots = list(roots)
+        self.out = Path(out)
+        self.workers = max(1, int(workers))
+        self.persist = persist
+        self._generator = generator
+        self.progress = progress or Progress()
+        self._done: Dict[str, Stamp] = {
+            name: (row["size"], row["mtime_ns"])
+            for name, row in read_results(self.out).items()
+            if "error" not in row and "size" in row and "mtime_ns" in row
+        }
+        # watch mode: file -> (stamp that failed, attempts, monotonic time of the next try)
+        self._failed: Dict[str, Tuple[Stamp, int, float]] = {}
+        self.max_attempts = max(1, int(max_attempts))
+        self.skipped = 0
+
+    def _get_generator(self):
+        # built on first file so --help and an empty run need no credentials
+        if self._generator is None:
+            from chatbot.openai_client import OpenAIClient
+            from chatbot.reply_generator import ReplyGenerator
+
+            self._generator = ReplyGenerator(OpenAIClient())
+        return self._generator
+
+    # ----- one file -----
+    def process(self, path: Path) -> Dict[str, Any]:
+        size, mtime_ns = _stamp(path)
+        row: Dict[str, Any] = {"file": str(path), "size": size, "mtime_ns": mtime_ns}
+        start = time.perf_counter()
+        try:
+            with tenant_scope(TENANT):
+                outcomes = validate_referrals(path.read_bytes(), self._get_generator(), filename=str(path))
+            if self.persist:
+                from chatbot.dedup import persist_outcome
+
+                for outcome in outcomes:
+                    persist_outcome(outcome, name_suffix=f"doc{outcome['document']}" if len(outcomes) > 1 else "")
+            row.update(pdf_response(outcomes))
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        row["seconds"] = round(time.perf_counter() - start, 3)
+        row["finished_at"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+        return row
+
+    def _record(self, row: Dict[str, Any]) -> None:
+        # called from the run loop only, so lines never interleave
+        self.out.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())  # the checkpoint must survive a crash right after
+        stamp = (row["size"], row["mtime_ns"])
+        if "error" in row:
+            self.progress.errors += 1
+            self._note_failure(row["file"], stamp)
+        else:
+            self._done[row["file"]] = stamp
+            self._failed.pop(row["file"], None)
+        self.progress.done += 1
+        self.progress.update()
+
+    def _note_failure(self, key: str, stamp: Stamp) -> None:
+        previous = self._failed.get(key)
+        attempts = previous[1] + 1 if previous and previous[0] == stamp else 1
+        if attempts >= self.max_attempts:
+            next_try = float("inf")  # until the file changes
+        else:
+            next_try = time.monotonic() + min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+        self._failed[key] = (stamp, attempts, next_try)
+
+    def _backing_off(self, key: str, stamp: Stamp) -> bool:
+        failed = self._failed.get(key)
+        return failed is not None and failed[0] == stamp and time.monotonic() < failed[2]
+
+    # ----- discovery -----
+    def _todo(self, busy: Set[str], previous: Optional[Dict[str, Stamp]]) -> Tuple[List[Path], Dict[str, Stamp]]:
+        """
+        Files not processed yet (in their current version) and not in flight.
+        With `previous` (watch mode), only files unchanged since the last scan
+        and not waiting out a retry backoff after failing.
+        """
+        todo, stamps = [], {}
+        for path in scan(self.roots):
+            key = str(path)
+            try:
+                stamps[key] = _stamp(path)
+            except OSError:
+                continue  # removed while scanning
+            if key in busy:
+                continue
+            if self._done.get(key) == stamps[key]:
+                if previous is None:
+                    self.skipped += 1
+                continue
+            if previous is not None and previous.get(key) != stamps[key]:
+                continue  # new or still being written; look again next scan
+            if previous is not None and self._backing_off(key, stamps[key]):
+                continue
+            todo.append(path)
+        return todo, stamps
+
+    def run(self, watch: bool = False, interval: float = 5.0) -> Progress:
+        """Process everything pending (and, with watch, keep going until interrupted)."""
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        try:
+            if watch:
+                self._watch(pool, interval)
+            else:
+                todo, _ = self._todo(set(), None)
+                self.progress.total = len(todo)
+                for fut in as_completed([pool.submit(self.process, path) for path in todo]):
+                    self._record(fut.result())
+        except KeyboardInterrupt:
+            print("Interrupted; finished files are checkpointed, re-run to resume.", file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self.progress.update(force=True)
+        pool.shutdown()
+        return self.progress
+
+    def _watch(self, pool: ThreadPoolExecutor, interval: float) -> None:
+        in_flight: Dict[Future, str] = {}
+        previous: Dict[str, Stamp] = {}
+        while True:
+            todo, previous = self._todo(set(in_flight.values()), previous)
+            self.progress.total += len(todo)
+            for path in todo:
+                in_flight[pool.submit(self.process, path)] = str(path)
+            if not in_flight:
+                time.sleep(interval)
+                continue
+            finished, _ = wait(list(in_flight), timeout=interval, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                del in_flight[fut]
+                self._record(fut.result())
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Validate folders of referral PDFs (resumable).")
+    parser.add_argument("paths", nargs="+", help="PDF files or folders (searched recursively)")
+    parser.add_argument("--out", default="ingest-results.jsonl", help="results JSONL, also the resume checkpoint")
+    parser.add_argument("--parquet", help="also write all results to this Parquet file at the end")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--persist", action="store_true", help="save each form to Blob Storage (via the save queue)")
+    parser.add_argument("--watch", action="store_true", help="keep watching the folders for new PDFs")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between scans with --watch")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="with --watch, tries per failing file until it changes")
+    args = parser.parse_args(argv)
+
+    ingester = Ingester(args.paths, args.out, workers=args.workers, persist=args.persist, max_attempts=args.max_attempts)
+    start = time.monotonic()
+    try:
+        progress = ingester.run(watch=args.watch, interval=args.interval)
+    except KeyboardInterrupt:
+        progress = ingester.progress
+    elapsed = time.monotonic() - start
+
+    if args.persist:
+        from chatbot.persist_queue import get_queue
+
+        print("Waiting for queued saves...", file=sys.stderr)
+        get_queue().flush()
+    if args.parquet:
+        rows = write_parquet(args.out, args.parquet)
+        print(f"Wrote {rows} rows to {args.parquet}", file=sys.stderr)
+    print(f"{progress.done} files in {elapsed:.1f}s ({progress.done / max(elapsed, 1e-9):.2f} files/s), "
+          f"{progress.errors} errors, {ingester.skipped} already done")
+
+
+if __name__ == "__main__":
+    main()
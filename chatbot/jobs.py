@@ -0,0 +1,383 @@
+# chatbot/jobs.py
+"""
+Durable validation jobs.
+
+    job_id = submit_job(pdf_bytes, filename="referral.pdf")
+    get_job(job_id)   # {"status": queued|running|done|error, "verdict", "partial", "result", ...}
+    job_referrals(get_job(job_id))   # one outcome per referral form in the PDF, once done
+
+Jobs live in a local SQLite database (WAL mode, so the worker threads and
+every Streamlit session read and write concurrently). A pool of worker
+threads claims queued jobs and runs extract -> check -> reply for every
+referral in the PDF (and, for jobs submitted with persist=True, queues
+their saves). The job id is the
+content hash of the PDF and the validator version (rules, prompt,
+deployment, extraction model; see dedup.validator_version), so submitting
+the same file again returns the existing job and its result instead of
+validating twice, until the rules or prompt change. Submitting it again
+with persist=True still gets it saved: a queued or running job picks the
+flag up, and a job that already finished unsaved has its referrals' saves
+queued by submit_job.
+
+While the (first referral's) reply streams, the worker stores the verdict
+and the explanation so far, so a polling UI can show them before the job finishes. Jobs found
+"running" at startup (the process died mid-job) are put back in the queue,
+so use one app process per database file.
+
+Settings: JOBS_DB_PATH, JOB_WORKERS, JOBS_RETENTION_DAYS.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from chatbot.cache import content_key
+from chatbot.dedup import persist_outcome, validator_version
+from chatbot.governor import session_tenant, tenant_scope
+from chatbot.openai_client import OpenAIClient
+from chatbot.pipeline import overall_result, validate_referrals
+from chatbot.reply_generator import ReplyGenerator
+from chatbot.settings import get_int_setting, get_setting
+
+
+_DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / ".cache" / "jobs.sqlite3"
+PROGRESS_INTERVAL_SECONDS = 0.25  # how often a streaming reply is written back
+IDLE_POLL_SECONDS = 1.0           # idle workers re-check the queue at least this often
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    filename    TEXT,
+    persist     INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    pdf         BLOB,
+    verdict     TEXT,
+    partial     TEXT,
+    result      TEXT,
+    error       TEXT,
+    tenant      TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at);
+"""
+
+log = logging.getLogger(__name__)
+
+
+def job_id_for(pdf_bytes: bytes, version: str = "") -> str:
+    return content_key(pdf_bytes, version)
+
+
+def bundle_result(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A job's stored result: overall verdict and text, plus every referral's outcome."""
+    if len(outcomes) == 1:
+        text = outcomes[0]["text"]
+    else:
+        failed = sum(o["result"] != "PASS" for o in outcomes)
+        text = f"{failed} of {len(outcomes)} referrals need review." if failed else ""
+    return {"result": overall_result(outcomes), "text": text, "referrals": outcomes}
+
+
+def job_referrals(job: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-referral outcomes of a finished job (jobs stored before bundles held a single outcome)."""
+    result = (job or {}).get("result") or {}
+    if "referrals" in result:
+        return result["referrals"]
+    return [result] if result else []
+
+
+class JobStore:
+    """SQLite-backed job table; one connection per thread."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        if "tenant" not in columns:  # databases created before rate-limit fairness
+            conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(
+        self, pdf_bytes: bytes, filename: str = "", persist: bool = False, tenant: str = "", version: str = ""
+    ) -> str:
+        """
+        Queue a PDF (no-op if the same content is already queued, running or
+        done under this validator version, except that persist=True is added
+        to a queued or running job; see claim_save for a done one).
+        """
+        job_id = job_id_for(pdf_bytes, version)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, filename, persist, created_at, updated_at, pdf, tenant) "
+                    "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                    (job_id, filename, int(persist), now, now, sqlite3.Binary(pdf_bytes), tenant),
+                )
+            elif row["status"] == "error":
+                # retry a failed job when the same file is submitted again
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', pdf = ?, error = NULL, verdict = NULL, partial = NULL, "
+                    "persist = MAX(persist, ?), tenant = ?, updated_at = ? WHERE id = ?",
+                    (sqlite3.Binary(pdf_bytes), int(persist), tenant, now, job_id),
+                )
+            elif row["status"] in ("queued", "running") and persist:
+                # run_job re-checks the flag before finishing
+                conn.execute("UPDATE jobs SET persist = 1 WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Atomically take the oldest queued job (marks it running)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def progress(self, job_id: str, verdict: str, partial: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET verdict = ?, partial = ?, updated_at = ? WHERE id = ?",
+            (verdict, partial, time.time(), job_id),
+        )
+
+    def finish(self, job_id: str, result: Dict[str, Any], persisted: bool = False) -> bool:
+        """
+        Store a job's result. Unless `persisted`, only while nobody asked for
+        a save in the meantime: returns False (job left running) if persist
+        was set since the job was claimed.
+        """
+        # the PDF is no longer needed once the result is stored
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, verdict = ?, partial = ?, pdf = NULL, updated_at = ? "
+            "WHERE id = ? AND (? OR persist = 0)",
+            (json.dumps(result, default=str), result.get("result"), result.get("text"), time.time(), job_id,
+             int(persisted)),
+        )
+        return cur.rowcount > 0
+
+    def claim_save(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The result of a job that finished without being saved, marking it as
+        saved (the caller queues the saves, or calls release_save if it can't).
+        None if the job isn't done or is already saved.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = 'done' AND persist = 0", (job_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET persist = 1 WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row["result"]) if row is not None and row["result"] else None
+
+    def release_save(self, job_id: str) -> None:
+        self._conn().execute("UPDATE jobs SET persist = 0 WHERE id = ?", (job_id,))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'error', error = ?, updated_at = ? WHERE id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, status, filename, created_at, updated_at, attempts, verdict, partial, result, error "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def requeue_running(self) -> int:
+        """Put jobs a dead process left 'running' back in the queue."""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),)
+        )
+        return cur.rowcount
+
+    def purge(self, older_than_days: int) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?",
+            (time.time() - older_than_days * 86400,),
+        )
+        return cur.rowcount
+
+
+class JobRunner:
+    """Pool of worker threads running queued jobs from a JobStore."""
+
+    def __init__(self, store: JobStore, workers: int = 4):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._generator = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"validation-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _get_generator(self):
+        # built on first job so importing this module needs no credentials
+        if self._generator is None:
+            self._generator = ReplyGenerator(OpenAIClient())
+        return self._generator
+
+    def validator_version(self) -> str:
+        """dedup.validator_version of the generator the workers use (part of every job id)."""
+        return validator_version(self._get_generator())
+
+    def save_finished(self, job_id: str) -> bool:
+        """Queue the saves of a job that finished before anyone asked for them; False if there was nothing to save."""
+        result = self.store.claim_save(job_id)
+        if result is None:
+            return False
+        try:
+            _persist_referrals(job_referrals({"result": result}))
+        except BaseException:
+            self.store.release_save(job_id)
+            raise
+        self.store.finish(job_id, result, persisted=True)  # keep the save ids with the result
+        return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                row = self.store.claim()
+            except sqlite3.Error as e:
+                log.warning("Could not claim a job: %s", e)
+                row = None
+            if row is None:
+                self._wake.wait(IDLE_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self.run_job(row)
+
+    def run_job(self, row: sqlite3.Row) -> None:
+        job_id = row["id"]
+        last_write = [0.0]
+
+        def on_progress(verdict: str, explanation: str) -> None:
+            now = time.monotonic()
+            if now - last_write[0] >= PROGRESS_INTERVAL_SECONDS or not explanation:
+                last_write[0] = now
+                self.store.progress(job_id, verdict, explanation)
+
+        try:
+            # rate limits are shared fairly between the sessions that submitted jobs
+            with tenant_scope(row["tenant"]):
+                outcomes = validate_referrals(
+                    bytes(row["pdf"]), self._get_generator(), on_progress=on_progress, filename=row["filename"] or ""
+                )
+            persist = bool(row["persist"])
+            while True:
+                if persist:
+                    _persist_referrals(outcomes)
+                if self.store.finish(job_id, bundle_result(outcomes), persisted=persist) or persist:
+                    break
+                persist = True  # submitted again with persist=True while it ran
+        except Exception as e:
+            log.warning("Validation job %s failed: %s", job_id[:12], e)
+            self.store.fail(job_id, str(e))
+
+
+def _persist_referrals(outcomes: List[Dict[str, Any]]) -> None:
+    for outcome in outcomes:
+        persist_outcome(outcome, name_suffix=f"doc{outcome.get('document', 1)}" if len(outcomes) > 1 else "")
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """Process-wide store + worker pool, started on first use."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                store = JobStore(get_setting("JOBS_DB_PATH", str(_DEFAULT_DB_PATH)))
+                store.requeue_running()
+                store.purge(get_int_setting("JOBS_RETENTION_DAYS", 7))
+                runner = JobRunner(store, workers=get_int_setting("JOB_WORKERS", 4))
+                runner.start()
+                _runner = runner
+    return _runner
+
+
+def submit_job(pdf_bytes: bytes, filename: str = "", persist: bool = False, tenant: Optional[str] = None) -> str:
+    """
+    Queue a validation; `tenant` (default: the calling Streamlit session) is
+    used for rate-limit fairness. With persist=True, a job for the same file
+    that already finished unsaved has its referrals' saves queued here.
+    """
+    runner = get_runner()
+    job_id = runner.store.submit(pdf_bytes, filename, persist, tenant or session_tenant(), runner.validator_version())
+    if persist:
+        runner.save_finished(job_id)
+    runner.notify()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return get_runner().store.get(job_id)
+
+
+def job_counts() -> Dict[str, int]:
+    return get_runner().store.counts()
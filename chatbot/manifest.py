@@ -0,0 +1,288 @@
+# chatbot/manifest.py
+"""
+Compact index of the forms saved to a container (status, save time and
+issue categories per form), so whole-archive jobs (bulk_validation's
+archive re-scoring) can read one small file instead of listing the whole
+container. The dashboard lists just the dated folders of its window
+instead (see chatbot.blob_layout).
+
+Layout inside the container:
+  _manifest/live/<YYYY-MM-DD>.jsonl   append blobs, one JSON row per save
+  _manifest/compacted.jsonl           older days merged by compact_manifest()
+
+Each row: {"name", "status", "timestamp", "categories"}.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from chatbot.clients import get_blob_service
+from chatbot.sanity_check import issue_categories
+
+
+MANIFEST_PREFIX = "_manifest/"
+LIVE_PREFIX = MANIFEST_PREFIX + "live/"
+COMPACTED_BLOB = MANIFEST_PREFIX + "compacted.jsonl"
+TS_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})")
+
+# compact at most this often per process (triggered from append_entry)
+COMPACT_INTERVAL_SECONDS = 3600
+# merges redone when another process replaced compacted.jsonl first
+COMPACT_ATTEMPTS = 5
+
+log = logging.getLogger(__name__)
+_compact_lock = threading.Lock()
+_last_compact = {"at": 0.0}
+
+
+def manifest_row(blob_name: str, data: Dict[str, Any], ts: Optional[datetime]) -> Dict[str, Any]:
+    """Manifest row for a form saved as `blob_name` at UTC time `ts`."""
+    status = str(data.get("validation_status", "")).lower()
+    return {
+        "name": blob_name,
+        "status": status if status in ("pass", "fail") else "fail",
+        "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%S") if ts else None,
+        "categories": issue_categories(str(data.get("failed") or "")),
+    }
+
+
+def _to_jsonl(rows: Iterable[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
+
+def _parse_jsonl(payload: bytes) -> List[Dict[str, Any]]:
+    rows = []
+    for line in payload.decode("utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            continue  # torn line from an interrupted append
+    return rows
+
+
+def append_entry(container: str, row: Dict[str, Any]) -> None:
+    """Append one row to today's live segment (creating it if needed)."""
+    append_entries(container, [row])
+
+
+def append_entries(container: str, rows: List[Dict[str, Any]]) -> None:
+    """Append rows to their days' live segments, one append block per day."""
+    from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_day.setdefault(row["timestamp"][:10], []).append(row)
+
+    for day, day_rows in sorted(by_day.items()):
+        blob = get_blob_service().get_blob_client(container, f"{LIVE_PREFIX}{day}.jsonl")
+        payload = _to_jsonl(day_rows)
+        try:
+            blob.append_block(payload)
+        except ResourceNotFoundError:
+            try:
+                blob.create_append_blob()
+            except ResourceExistsError:
+                pass  # another writer created it first
+            blob.append_block(payload)
+    _maybe_compact(container)
+
+
+def _read_blob(container: str, name: str) -> bytes:
+    # ETag-cached: unchanged segments (e.g. compacted.jsonl) cost a 304, not a download
+    from chatbot.blob_reader import read_blob_bytes
+
+    return read_blob_bytes(container, name)
+
+
+def _live_segments(container: str) -> List[str]:
+    client = get_blob_service().get_container_client(container)
+    return sorted(b.name for b in client.list_blobs(name_starts_with=LIVE_PREFIX))
+
+
+def _merge_rows(by_file: Dict[str, Dict[str, Any]], rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Later rows win, keyed by file name so a blob moved into its dated folder
+    (chatbot.blob_layout) keeps one row; the flat name it was moved from
+    never replaces the dated one.
+    """
+    for row in rows:
+        name = row.get("name")
+        if not name:
+            continue
+        key = name.rsplit("/", 1)[-1]
+        previous = by_file.get(key)
+        if previous is not None and "/" in previous["name"] and "/" not in name:
+            continue
+        by_file[key] = row
+
+
+def read_manifest_rows(container: str) -> List[Dict[str, Any]]:
+    """All manifest rows (compacted + live), deduplicated by file name."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        segments = _live_segments(container)
+    except ResourceNotFoundError:
+        return []
+
+    by_file: Dict[str, Dict[str, Any]] = {}
+    for name in [COMPACTED_BLOB] + segments:
+        try:
+            payload = _read_blob(container, name)
+        except ResourceNotFoundError:
+            continue
+        _merge_rows(by_file, _parse_jsonl(payload))
+    return list(by_file.values())
+
+
+def _read_versioned(container: str, name: str) -> Tuple[bytes, Optional[str]]:
+    """(payload, ETag) of a blob, or (b"", None) if it doesn't exist; bypasses the read cache."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        stream = get_blob_service().get_blob_client(container, name).download_blob()
+    except ResourceNotFoundError:
+        return b"", None
+    return stream.readall(), stream.properties.etag
+
+
+def compact_manifest(container: str, keep_live_days: int = 1, attempts: int = COMPACT_ATTEMPTS) -> int:
+    """
+    Merge live segments older than the newest `keep_live_days` days into
+    _manifest/compacted.jsonl and delete them. Returns the number of segments merged.
+
+    Safe against other processes compacting the same container: compacted.jsonl
+    is only replaced if its ETag is still the one read (created only if it still
+    doesn't exist), otherwise the merge is redone from the new copy, up to
+    `attempts` times. A segment is deleted only if unchanged since it was
+    merged; one appended to meanwhile stays live until the next compaction.
+    Readers dedupe by file name, so a crash between the write and the deletes is harmless.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+    with _compact_lock:
+        svc = get_blob_service()
+        for attempt in range(1, attempts + 1):
+            segments = _live_segments(container)
+            old = segments[:-keep_live_days] if keep_live_days > 0 else segments
+            if not old:
+                return 0
+
+            by_file: Dict[str, Dict[str, Any]] = {}
+            compacted, compacted_etag = _read_versioned(container, COMPACTED_BLOB)
+            _merge_rows(by_file, _parse_jsonl(compacted))
+            merged: Dict[str, str] = {}  # segment -> ETag of the copy merged
+            for name in old:
+                payload, etag = _read_versioned(container, name)
+                if etag is not None:
+                    _merge_rows(by_file, _parse_jsonl(payload))
+                    merged[name] = etag
+
+            rows = sorted(by_file.values(), key=lambda r: (r.get("timestamp") or "", r["name"]))
+            target = svc.get_blob_client(container, COMPACTED_BLOB)
+            try:
+                if compacted_etag is None:
+                    target.upload_blob(_to_jsonl(rows), overwrite=False)
+                else:
+                    target.upload_blob(_to_jsonl(rows), overwrite=True,
+                                       etag=compacted_etag, match_condition=MatchConditions.IfNotModified)
+            except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError):
+                log.info("compacted.jsonl changed while merging (attempt %d of %d)", attempt, attempts)
+                continue
+
+            for name, etag in merged.items():
+                try:
+                    svc.get_blob_client(container, name).delete_blob(
+                        etag=etag, match_condition=MatchConditions.IfNotModified)
+                except (ResourceNotFoundError, ResourceModifiedError):
+                    pass  # already compacted elsewhere / appended to since: merged next time
+            return len(merged)
+        raise RuntimeError(f"compacted.jsonl kept changing; gave up after {attempts} attempts")
+
+
+def _maybe_compact(container: str) -> None:
+    now = time.time()
+    if now - _last_compact["at"] < COMPACT_INTERVAL_SECONDS:
+        return
+    _last_compact["at"] = now
+
+    def _run():
+        try:
+            compact_manifest(container)
+        except Exception as e:
+            log.warning("Manifest compaction failed: %s", e)
+
+    threading.Thread(target=_run, name="manifest-compact", daemon=True).start()
+
+
+def timestamp_from_name(name: str) -> Optional[datetime]:
+    """UTC save time encoded in a blob name like [pass/2024/05/01/]form_YYYY-MM-DD_HH-MM-SS_pass.csv."""
+    m = TS_REGEX.search(name or "")
+    if not m:
+        return None
+    try:
+        return datetime.strptime(f"{m.group(1)} {m.group(2)}", "%Y-%m-%d %H-%M-%S")
+    except ValueError:
+        return None
+
+
+def rebuild_manifest(container: str) -> int:
+    """
+    Backfill: rebuild _manifest/compacted.jsonl from the CSVs already in the
+    container (reads each CSV once for its `failed` column). Returns the row count.
+    """
+    from chatbot.blob_reader import list_csv_blobs, read_csv_blob
+
+    rows = []
+    for name in list_csv_blobs(container, refresh=True)["name"]:
+        try:
+            record = read_csv_blob(container, name).iloc[0].to_dict()
+        except Exception:
+            record = {}
+        if "validation_status" not in record:
+            record["validation_status"] = "pass" if "pass" in name.lower() else "fail"
+        if not isinstance(record.get("failed"), str):  # NaN from an empty cell
+            record["failed"] = ""
+        ts = timestamp_from_name(name)
+        rows.append(manifest_row(name, record, ts))
+
+    get_blob_service().get_blob_client(container, COMPACTED_BLOB).upload_blob(_to_jsonl(rows), overwrite=True)
+    return len(rows)
+
+
+def rename_entries(container: str, renames: Dict[str, str]) -> None:
+    """Point the rows of moved blobs ({old name: new name}) at their new names."""
+    existing = {row["name"]: row for row in read_manifest_rows(container)}
+    rows = []
+    for old, new in renames.items():
+        row = existing.get(old)
+        if row is None:  # saved before the manifest existed
+            status = "pass" if "pass" in old.lower() else "fail"
+            row = manifest_row(old, {"validation_status": status}, timestamp_from_name(old))
+        if row.get("timestamp"):
+            rows.append(dict(row, name=new))
+    if rows:
+        append_entries(container, rows)
+
+
+def safe_append_entry(container: str, blob_name: str, data: Dict[str, Any], ts: datetime) -> Optional[Exception]:
+    """append_entry that never raises (the CSV itself is already saved); returns the error if any."""
+    return safe_append_entries(container, [(blob_name, data, ts)])
+
+
+def safe_append_entries(container: str, saved: List[Tuple[str, Dict[str, Any], datetime]]) -> Optional[Exception]:
+    """Batch version of safe_append_entry for (blob name, data, ts) triples."""
+    try:
+        append_entries(container, [manifest_row(name, data, ts) for name, data, ts in saved])
+        return None
+    except Exception as e:
+        log.warning("Could not update manifest for %d saved form(s): %s", len(saved), e)
+        return e
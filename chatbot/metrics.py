@@ -0,0 +1,192 @@
+# chatbot/metrics.py
+"""
+In-process latency / token metrics for the validation pipeline.
+
+    with span("docintel.poll"):
+        result = poller.result()
+    record_tokens(deployment, prompt_tokens, completion_tokens)
+
+Every span feeds a histogram per stage: cumulative Prometheus-style bucket
+counts plus a rolling window of recent samples for p50/p95. Metrics are
+process-wide (shared by all Streamlit sessions) and shown on pages/metrics.py.
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from chatbot.settings import get_int_setting, get_setting
+
+
+# seconds; spans cover sub-millisecond checks up to multi-second analyze polls
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WINDOW = get_int_setting("METRICS_WINDOW", 1000)
+
+
+class Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)  # last = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.recent: deque = deque(maxlen=WINDOW)
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.errors += int(error)
+        self.recent.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+_tokens: Dict[Tuple[str, str], int] = {}  # (deployment, prompt|cached_prompt|completion) -> count
+_token_requests: Dict[str, int] = {}
+
+
+def observe(stage: str, seconds: float, error: bool = False) -> None:
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds, error)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block into the `stage` histogram (errors are counted too)."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, error)
+
+
+def record_tokens(deployment: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> None:
+    with _lock:
+        for kind, count in (("prompt", prompt_tokens), ("cached_prompt", cached_prompt_tokens), ("completion", completion_tokens)):
+            _tokens[(deployment, kind)] = _tokens.get((deployment, kind), 0) + int(count or 0)
+        _token_requests[deployment] = _token_requests.get(deployment, 0) + 1
+
+
+def record_usage(deployment: str, response) -> None:
+    """
+    record_tokens from a chat completion response's `usage`, if present
+    (including the prompt tokens the provider served from its prompt cache).
+    """
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_tokens(
+            deployment,
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+            getattr(details, "cached_tokens", 0) if details is not None else 0,
+        )
+
+
+def stage_summary() -> List[Dict[str, float]]:
+    """One row per stage: count, errors, mean and rolling p50/p95/max in milliseconds."""
+    with _lock:
+        rows = []
+        for stage, h in sorted(_histograms.items()):
+            rows.append({
+                "stage": stage,
+                "count": h.count,
+                "errors": h.errors,
+                "mean_ms": (h.total / h.count * 1000) if h.count else 0.0,
+                "p50_ms": h.percentile(50) * 1000,
+                "p95_ms": h.percentile(95) * 1000,
+                "max_ms": max(h.recent, default=0.0) * 1000,
+            })
+    return rows
+
+
+def bucket_table(stage: str) -> List[Dict[str, float]]:
+    """Non-cumulative bucket counts for one stage (for charts)."""
+    with _lock:
+        h = _histograms.get(stage)
+        counts = list(h.bucket_counts) if h else [0] * (len(BUCKETS) + 1)
+    labels = [f"≤{b * 1000:g} ms" for b in BUCKETS] + ["> 60 s"]
+    return [{"bucket": label, "count": c} for label, c in zip(labels, counts)]
+
+
+def _price(name: str) -> float:
+    try:
+        return float(get_setting(name, 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def token_summary() -> List[Dict[str, float]]:
+    """
+    Tokens per deployment, with an estimated cost from the
+    LLM_PROMPT_PRICE_PER_1K / LLM_COMPLETION_PRICE_PER_1K settings (0 if unset).
+    """
+    prompt_price, completion_price = _price("LLM_PROMPT_PRICE_PER_1K"), _price("LLM_COMPLETION_PRICE_PER_1K")
+    with _lock:
+        rows = []
+        for d in sorted(_token_requests):
+            prompt, completion = _tokens.get((d, "prompt"), 0), _tokens.get((d, "completion"), 0)
+            rows.append({
+                "deployment": d,
+                "requests": _token_requests[d],
+                "prompt_tokens": prompt,
+                "cached_prompt_tokens": _tokens.get((d, "cached_prompt"), 0),
+                "completion_tokens": completion,
+                "prompt_tokens_per_request": prompt / _token_requests[d],
+                "est_cost": prompt / 1000 * prompt_price + completion / 1000 * completion_price,
+            })
+    return rows
+
+
+def to_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP surgical_forms_stage_seconds Latency of pipeline stages.",
+        "# TYPE surgical_forms_stage_seconds histogram",
+    ]
+    with _lock:
+        for stage, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, c in zip(BUCKETS, h.bucket_counts):
+                cumulative += c
+                lines.append(f'surgical_forms_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'surgical_forms_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'surgical_forms_stage_seconds_sum{{stage="{stage}"}} {h.total:.6f}')
+            lines.append(f'surgical_forms_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+        lines += [
+            "# HELP surgical_forms_stage_errors_total Pipeline stage invocations that raised.",
+            "# TYPE surgical_forms_stage_errors_total counter",
+        ]
+        for stage, h in sorted(_histograms.items()):
+            lines.append(f'surgical_forms_stage_errors_total{{stage="{stage}"}} {h.errors}')
+
+        lines += [
+            "# HELP surgical_forms_llm_tokens_total Tokens used by chat completions.",
+            "# TYPE surgical_forms_llm_tokens_total counter",
+        ]
+        for (deployment, kind), count in sorted(_tokens.items()):
+            lines.append(f'surgical_forms_llm_tokens_total{{deployment="{deployment}",kind="{kind}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _tokens.clear()
+        _token_requests.clear()
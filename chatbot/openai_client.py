@@ -1,18 +1,129 @@
-import streamlit as st
-from openai import AzureOpenAI
+from chatbot.clients import get_openai_client
+import time
+
+from chatbot.governor import estimate_tokens, openai_governor
+from chatbot.metrics import observe, record_usage, span
+from chatbot.settings import get_int_setting, get_setting, require_setting
+
+
+# reserved per call for the reply until the real usage is known
+COMPLETION_TOKENS_ESTIMATE = get_int_setting("OPENAI_COMPLETION_TOKENS_ESTIMATE", 200)
+
+
+def _token_estimate(messages):
+    return sum(estimate_tokens(str(m.get("content", ""))) for m in messages) + COMPLETION_TOKENS_ESTIMATE
+
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
 
 class OpenAIClient:
     def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=st.secrets["AZURE_OPENAI_API_KEY"],
-            azure_endpoint=st.secrets["AZURE_OPENAI_ENDPOINT"],
-            api_version=st.secrets["AZURE_OPENAI_VERSION"]
-        )
+        # shared, pooled AzureOpenAI client (cheap to construct per click)
+        self.client = get_openai_client()
 
     def chat_completion(self, messages, model=None):
-        model = model or st.secrets["AZURE_OPENAI_DEPLOYMENT"]
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=messages,
+        model = model or require_setting("AZURE_OPENAI_DEPLOYMENT", "<your-deployment>")
+
+        def create():
+            with span("llm.chat_completion"):
+                return self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                )
+
+        # rate limits, 429 retries and fairness across sessions
+        response = openai_governor(model).call(create, tokens=_token_estimate(messages), usage=_total_tokens)
+        record_usage(model, response)
+        return response.choices[0].message.content
+
+    def chat_completion_stream(self, messages, model=None):
+        """
+        Yield the reply text piece by piece as the model produces it.
+        Records time-to-first-token ("llm.first_token") and total time, and
+        token usage when the deployment reports it for streams
+        (OPENAI_STREAM_USAGE=0 turns the request off for older API versions).
+        A 429 or transient error is retried (see chatbot.governor) only
+        before the first piece arrives.
+        """
+        model = model or require_setting("AZURE_OPENAI_DEPLOYMENT", "<your-deployment>")
+        kwargs = {}
+        if str(get_setting("OPENAI_STREAM_USAGE", "1")).lower() not in ("0", "false", "no"):
+            kwargs["stream_options"] = {"include_usage": True}
+
+        governor = openai_governor(model)
+        tokens = _token_estimate(messages)
+        for attempt in range(governor.max_retries + 1):
+            permit = governor.acquire(tokens)
+            start = time.perf_counter()
+            try:
+                stream = self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+                break
+            except Exception as e:
+                wait = governor.release_failed(permit, e, attempt)
+                if wait is None:
+                    raise
+                time.sleep(wait)
+
+        first = None
+        error = False
+        used = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    record_usage(model, chunk)
+                    used = _total_tokens(chunk)
+                # Azure sends content-filter chunks with no choices
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    if first is None:
+                        first = time.perf_counter() - start
+                        observe("llm.first_token", first)
+                    yield piece
+        except BaseException:
+            error = True
+            raise
+        finally:
+            governor.release(permit, used_tokens=used, failed=error)
+            observe("llm.chat_completion", time.perf_counter() - start, error)
+
+
+class AsyncOpenAIClient:
+    """
+    asyncio twin of OpenAIClient; `chat_completion` must be awaited.
+    `client` is a pre-built AsyncAzureOpenAI (or a stand-in); built from settings by default.
+    """
+
+    def __init__(self, client=None):
+        if client is not None:
+            self.client = client
+            return
+        from openai import AsyncAzureOpenAI  # heavy; only batch/async callers need it
+
+        self.client = AsyncAzureOpenAI(
+            api_key=require_setting("AZURE_OPENAI_API_KEY", "<your-key>"),
+            azure_endpoint=require_setting("AZURE_OPENAI_ENDPOINT", "https://<your-resource>.openai.azure.com"),
+            api_version=require_setting("AZURE_OPENAI_VERSION", "<api-version>"),
+            max_retries=0,  # 429s and transient errors are retried by the governor
         )
+
+    async def chat_completion(self, messages, model=None):
+        model = model or require_setting("AZURE_OPENAI_DEPLOYMENT", "<your-deployment>")
+
+        async def create():
+            with span("llm.chat_completion"):
+                return await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                )
+
+        response = await openai_governor(model).acall(create, tokens=_token_estimate(messages), usage=_total_tokens)
+        record_usage(model, response)
         return response.choices[0].message.content
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,280 @@
+# chatbot/persist_queue.py
+"""
+Background persistence for saved forms.
+
+    tracking_id = enqueue_save(record)      # returns immediately
+    save_status(tracking_id)                # {"state": queued|saved|failed, ...}
+
+Each save is first written to a local spool directory (one JSON file per
+save, written atomically), so queued writes survive a process restart: the
+spool is replayed when the queue starts. A background thread drains the
+queue in batches, uploads each batch concurrently, appends all of the
+batch's manifest rows in one block, and deletes the spool files. Failed
+uploads are retried with exponential backoff; after PERSIST_MAX_ATTEMPTS
+the spool file is moved to <spool>/failed/ for inspection.
+
+The blob name is fixed when the save is queued, so a retry rewrites the
+same blob instead of creating a duplicate.
+
+Settings: PERSIST_SPOOL_DIR, PERSIST_BATCH_SIZE, PERSIST_UPLOAD_WORKERS,
+PERSIST_MAX_ATTEMPTS. One process per spool directory.
+"""
+import heapq
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from chatbot.blob_layout import file_name_of
+from chatbot.blob_uploader import blob_name_for, upload_csv
+from chatbot.manifest import safe_append_entries
+from chatbot.settings import get_int_setting, get_setting
+
+
+_DEFAULT_SPOOL_DIR = Path(__file__).resolve().parents[1] / ".cache" / "spool"
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 300.0
+STATUS_HISTORY = 1000  # finished saves remembered for save_status
+
+log = logging.getLogger(__name__)
+
+
+class PersistQueue:
+    def __init__(
+        self,
+        spool_dir: Union[str, Path],
+        batch_size: int = 16,
+        upload_workers: int = 4,
+        max_attempts: int = 8,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.failed_dir = self.spool_dir / "failed"
+        self.batch_size = max(1, int(batch_size))
+        self.upload_workers = max(1, int(upload_workers))
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._cond = threading.Condition()
+        self._ready: List = []  # heap of (due time, seq, tracking id)
+        self._seq = 0
+        self._status: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="persist-upload")
+
+    # ----- public API -----
+    def submit(self, data: Dict, container: str = "filled-forms", name_suffix: str = "") -> str:
+        """Spool a save and queue it; returns its tracking id."""
+        ts = datetime.utcnow()
+        file_name = blob_name_for(data, name_suffix, ts)
+        tracking_id = file_name_of(file_name)[: -len(".csv")]
+        entry = {
+            "id": tracking_id,
+            "container": container,
+            "name": file_name,
+            "ts": ts.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "data": data,
+            "attempts": 0,
+        }
+        self._write_spool(entry)
+        self._push(entry, due=0.0)
+        self.start()
+        return tracking_id
+
+    def status(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        """{"state": queued|saved|failed, "blob_path", "attempts", "error"} or None if unknown."""
+        with self._cond:
+            status = self._status.get(tracking_id)
+            return dict(status) if status else None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._ready)
+
+    def start(self) -> None:
+        """Start the worker (idempotent), replaying anything left in the spool."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="persist-queue", daemon=True)
+        self._recover()
+        self._thread.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until nothing is queued (including backoff waits); False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._ready or any(s["state"] == "uploading" for s in self._status.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    # ----- spool -----
+    def _spool_path(self, tracking_id: str) -> Path:
+        return self.spool_dir / f"{tracking_id}.json"
+
+    def _write_spool(self, entry: Dict[str, Any]) -> None:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._spool_path(entry["id"]))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _recover(self) -> None:
+        if not self.spool_dir.exists():
+            return
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                log.warning("Skipping unreadable spool file %s: %s", path, e)
+                continue
+            with self._cond:
+                if entry["id"] in self._status:
+                    continue  # already queued in this process
+            self._push(entry, due=0.0)
+
+    # ----- queue -----
+    def _push(self, entry: Dict[str, Any], due: float) -> None:
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._ready, (due, self._seq, entry["id"], entry))
+            self._set_status(entry, "queued")
+            self._cond.notify_all()
+
+    def _set_status(self, entry: Dict[str, Any], state: str, error: Optional[str] = None) -> None:
+        # caller holds self._cond
+        self._status[entry["id"]] = {
+            "state": state,
+            "blob_path": f"{entry['container']}/{entry['name']}",
+            "attempts": entry["attempts"],
+            "error": error,
+        }
+        self._status.move_to_end(entry["id"])
+        while len(self._status) > STATUS_HISTORY:
+            oldest = next(iter(self._status))
+            if self._status[oldest]["state"] not in ("saved", "failed"):
+                break
+            self._status.popitem(last=False)
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._ready and self._ready[0][0] <= now:
+                    batch = []
+                    while self._ready and self._ready[0][0] <= now and len(batch) < self.batch_size:
+                        entry = heapq.heappop(self._ready)[3]
+                        self._set_status(entry, "uploading")
+                        batch.append(entry)
+                    return batch
+                self._cond.wait(self._ready[0][0] - now if self._ready else None)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self._upload_batch(batch)
+            except Exception as e:  # never let the worker die
+                log.exception("Persist batch failed unexpectedly: %s", e)
+                for entry in batch:
+                    self._retry(entry, str(e))
+
+    def _upload_batch(self, batch: List[Dict[str, Any]]) -> None:
+        def upload(entry):
+            try:
+                upload_csv(entry["data"], entry["container"], entry["name"])
+                return None
+            except Exception as e:
+                return e
+
+        errors = list(self._pool.map(upload, batch))
+
+        saved_by_container: Dict[str, List] = {}
+        for entry, error in zip(batch, errors):
+            if error is None:
+                ts = datetime.strptime(entry["ts"], "%Y-%m-%dT%H:%M:%S.%f")
+                saved_by_container.setdefault(entry["container"], []).append((entry["name"], entry["data"], ts))
+
+        # one manifest append per container (and day) for the whole batch
+        for container, saved in saved_by_container.items():
+            safe_append_entries(container, saved)
+
+        for entry, error in zip(batch, errors):
+            if error is None:
+                try:
+                    self._spool_path(entry["id"]).unlink()
+                except FileNotFoundError:
+                    pass
+                with self._cond:
+                    self._set_status(entry, "saved")
+                    self._cond.notify_all()
+            else:
+                self._retry(entry, str(error))
+
+    def _retry(self, entry: Dict[str, Any], error: str) -> None:
+        entry["attempts"] += 1
+        if entry["attempts"] >= self.max_attempts:
+            log.warning("Giving up on %s after %d attempts: %s", entry["name"], entry["attempts"], error)
+            self.failed_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                os.replace(self._spool_path(entry["id"]), self.failed_dir / f"{entry['id']}.json")
+            except FileNotFoundError:
+                pass
+            with self._cond:
+                self._set_status(entry, "failed", error)
+                self._cond.notify_all()
+            return
+
+        self._write_spool(entry)  # persist the attempt count
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (entry["attempts"] - 1))
+        delay *= random.uniform(0.5, 1.0)  # jitter so a burst of failures doesn't retry in lockstep
+        self._push(entry, due=time.monotonic() + delay)
+        with self._cond:
+            self._status[entry["id"]]["error"] = error
+
+
+_queue: Optional[PersistQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> PersistQueue:
+    """Process-wide queue (started on first use, replaying the spool)."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = PersistQueue(
+                    get_setting("PERSIST_SPOOL_DIR", str(_DEFAULT_SPOOL_DIR)),
+                    batch_size=get_int_setting("PERSIST_BATCH_SIZE", 16),
+                    upload_workers=get_int_setting("PERSIST_UPLOAD_WORKERS", 4),
+                    max_attempts=get_int_setting("PERSIST_MAX_ATTEMPTS", 8),
+                )
+                _queue.start()
+    return _queue
+
+
+def enqueue_save(data: Dict, container: str = "filled-forms", name_suffix: str = "") -> str:
+    """Non-blocking save_csv_to_blob: spools the form and returns a tracking id."""
+    return get_queue().submit(data, container, name_suffix)
+
+
+def save_status(tracking_id: str) -> Optional[Dict[str, Any]]:
+    return get_queue().status(tracking_id)
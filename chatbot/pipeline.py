@@ -0,0 +1,336 @@
+# chatbot/pipeline.py
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chatbot.dedup import get_index, pdf_fingerprint, public_matches, validator_version
+from chatbot.extract_text import extract_documents_bytes
+from chatbot.governor import current_tenant, tenant_scope
+from chatbot.sanity_check import data_sanity_check
+from chatbot.settings import get_int_setting
+
+
+log = logging.getLogger(__name__)
+
+
+def dict_to_lines(d: dict) -> str:
+    return "\n".join(f"{k}: {v}" for k, v in (d or {}).items())
+
+
+def parse_verdict(reply_text: str) -> Tuple[str, str]:
+    """
+    Split an LLM reply into (PASS/FAIL, explanation).
+    Anything that does not start with PASS or FAIL is treated as FAIL.
+    """
+    parts = (reply_text or "").strip().split(maxsplit=1)
+    first_word = parts[0].upper() if parts else ""
+    if first_word not in {"PASS", "FAIL"}:
+        first_word = "FAIL"  # fallback if model forgets
+    explanation = parts[1] if len(parts) > 1 else ""
+    return first_word, explanation.strip()
+
+
+class VerdictStream:
+    """
+    Streaming counterpart of parse_verdict over an iterable of text pieces
+    (e.g. ReplyGenerator.generate_stream):
+
+        stream = VerdictStream(pieces)
+        stream.verdict          # PASS / FAIL once the first word is complete
+        for text in stream:     # the explanation, as it arrives
+            ...
+        stream.reply            # full reply text (after iteration / read())
+
+    The first word may be split across pieces and preceded by whitespace.
+    """
+
+    def __init__(self, pieces: Iterable[str]):
+        self._pieces = iter(pieces)
+        self._parts: List[str] = []
+        self._pending = ""  # explanation text read while looking for the verdict
+        self.verdict: Optional[str] = None
+        self._read_verdict()
+
+    def _read_verdict(self) -> None:
+        buffered = ""
+        for piece in self._pieces:
+            self._parts.append(piece)
+            buffered += piece
+            head = buffered.lstrip()
+            word_end = next((i for i, ch in enumerate(head) if ch.isspace()), None)
+            if word_end is not None:
+                self._set_verdict(head[:word_end])
+                self._pending = head[word_end:].lstrip()
+                return
+        self._set_verdict(buffered.strip())
+
+    def _set_verdict(self, word: str) -> None:
+        word = word.upper()
+        self.verdict = word if word in {"PASS", "FAIL"} else "FAIL"  # same fallback as parse_verdict
+
+    def __iter__(self) -> Iterator[str]:
+        leading = True
+        if self._pending:
+            yield self._pending
+            leading = False
+            self._pending = ""
+        for piece in self._pieces:
+            self._parts.append(piece)
+            if leading:
+                piece = piece.lstrip()
+                if not piece:
+                    continue
+                leading = False
+            yield piece
+
+    def read(self) -> str:
+        """Consume the rest of the stream and return the full reply."""
+        for _ in self:
+            pass
+        return self.reply
+
+    @property
+    def reply(self) -> str:
+        return "".join(self._parts)
+
+
+def build_record(data: dict, result: str, check: Any, message: Optional[str]) -> Dict[str, Any]:
+    """
+    The row we export / save: extracted fields plus `validation_status`,
+    `failed` (sanity-check issues) and `message` (full LLM reply).
+    """
+    record = dict(data or {})
+    record["validation_status"] = "PASS" if result == "PASS" else "FAIL"
+
+    if check:
+        if isinstance(check, list):
+            record["failed"] = " | ".join(str(x) for x in check)
+        else:
+            record["failed"] = str(check)
+
+    if message:
+        record["message"] = str(message)
+    return record
+
+
+def form_response(outcome: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON view of one validated form: the saved CSV's columns plus the extracted fields."""
+    record = outcome["record"]
+    body = {
+        "validation_status": record["validation_status"],
+        "failed": record.get("failed", ""),
+        "message": record.get("message", ""),
+        "fields": outcome["data"],
+    }
+    if outcome.get("documents", 1) > 1:
+        body["document"] = outcome["document"]
+    if "save_id" in outcome:
+        body["save_id"] = outcome["save_id"]
+        if outcome.get("already_saved"):
+            body["already_saved"] = True
+    if outcome.get("duplicates"):
+        body["duplicates"] = outcome["duplicates"]
+    if outcome.get("reused"):
+        body["reused"] = outcome["reused"]
+    return body
+
+
+def overall_result(outcomes: List[Dict[str, Any]]) -> str:
+    """PASS only if every referral in a PDF passed."""
+    return "PASS" if outcomes and all(o.get("result") == "PASS" for o in outcomes) else "FAIL"
+
+
+def pdf_response(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    JSON view of a validated PDF: form_response of its referral, or for a
+    bundle {"validation_status": overall, "documents": n, "referrals": [form_response, ...]}.
+    """
+    if len(outcomes) == 1:
+        return form_response(outcomes[0])
+    return {
+        "validation_status": overall_result(outcomes),
+        "documents": len(outcomes),
+        "referrals": [form_response(o) for o in outcomes],
+    }
+
+
+def document_key(pdf_hash: str, document: int) -> str:
+    """Fingerprint of one referral in a PDF: the PDF hash for the first, "<hash>#<n>" for the others."""
+    return pdf_hash if document == 1 else f"{pdf_hash}#{document}"
+
+
+def _reuse(index, match: Dict[str, Any], on_progress: Optional[Callable[[str, str], None]]) -> Optional[Dict[str, Any]]:
+    """The stored outcome of an exact / same-fields match, or None if it can't be reused."""
+    if not match["reusable"]:
+        return None
+    outcome = index.outcome(match["form_id"])
+    if outcome is None:
+        return None
+    outcome["reused"] = match["kind"]
+    outcome["reused_from"] = outcome["fingerprint_id"] = match["form_id"]
+    if on_progress is not None:
+        on_progress(outcome["result"], outcome["text"])
+    return outcome
+
+
+def _reuse_exact(index, pdf_hash: str, version: str) -> Tuple[Optional[List[Dict[str, Any]]], Dict[int, Dict[str, Any]]]:
+    """
+    (stored outcomes of every referral in this exact PDF, or None unless all
+    are reusable; the exact matches found, by document number).
+    """
+    matches: Dict[int, Dict[str, Any]] = {}
+    outcomes = []
+    document, count = 1, 1
+    while document <= count:
+        match = index.match_pdf(document_key(pdf_hash, document), version)
+        if match is None:
+            return None, matches
+        matches[document] = match
+        outcome = _reuse(index, match, None)
+        if outcome is None:
+            return None, matches
+        count = outcome.get("documents", 1) if document == 1 else count
+        outcomes.append(outcome)
+        document += 1
+    return outcomes, matches
+
+
+def _validate_document(
+    index,
+    version: Optional[str],
+    pdf_hash: Optional[str],
+    document: int,
+    count: int,
+    data: Dict[str, str],
+    generator,
+    on_progress: Optional[Callable[[str, str], None]],
+    filename: str,
+    exact: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """One referral of a PDF: reuse a same-fields result or validate, then index it."""
+    matches = [exact] if exact else []
+    outcome = None
+    if index is not None:
+        try:
+            similar = index.match_fields(data, version)
+            seen = {m["form_id"] for m in matches}
+            matches.extend(m for m in similar if m["form_id"] not in seen)
+            if similar and similar[0]["kind"] == "same_fields":
+                outcome = _reuse(index, similar[0], on_progress)
+        except sqlite3.Error as e:
+            log.warning("Fingerprint lookup failed: %s", e)
+    if outcome is None:
+        outcome = validate_fields(data, generator, on_progress)
+
+    outcome.update(document=document, documents=count)
+    if count > 1:
+        outcome["record"]["referral"] = f"{document} of {count}"  # saved CSVs say which form of the bundle
+    else:
+        outcome["record"].pop("referral", None)
+    outcome["duplicates"] = public_matches(matches)
+
+    if index is not None:
+        try:
+            outcome["fingerprint_id"] = index.add(document_key(pdf_hash, document), data, outcome, version, filename)
+        except sqlite3.Error as e:
+            log.warning("Could not add form to the fingerprint index: %s", e)
+    return outcome
+
+
+def validate_referrals(
+    pdf_bytes: bytes,
+    generator,
+    on_progress: Optional[Callable[[str, str], None]] = None,
+    filename: str = "",
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run one PDF through extract -> sanity check -> reply, once per referral
+    form in it (faxed bundles often hold several). Returns one outcome per
+    referral, in document order: the pieces app.py keeps in session state
+    plus the export record, and "document" / "documents" (1-based number,
+    count).
+
+    The PDF is analyzed once; the referrals' checks and replies then run
+    concurrently (up to `max_workers`, default REFERRAL_MAX_WORKERS or 8), so a bundle
+    takes about as long as its slowest form. With `on_progress`, the first
+    referral's reply is streamed and on_progress(verdict, explanation so
+    far) is called as soon as the verdict is known and after every piece.
+
+    Resubmissions are looked up in the fingerprint index (chatbot.dedup):
+    the same file, or a re-scan that reads the same, gets the earlier result
+    back (outcome["reused"] = "exact" / "same_fields"; an exact match skips
+    extraction too). Earlier forms that look alike are listed in
+    outcome["duplicates"].
+    """
+    index = get_index()
+    pdf_hash = version = None
+    exact: Dict[int, Dict[str, Any]] = {}
+    if index is not None:
+        pdf_hash, version = pdf_fingerprint(pdf_bytes), validator_version(generator)
+        try:
+            reused, exact = _reuse_exact(index, pdf_hash, version)
+        except sqlite3.Error as e:
+            log.warning("Fingerprint lookup failed, validating without it: %s", e)
+            index, reused = None, None
+        if reused is not None:
+            for outcome in reused:
+                outcome["duplicates"] = public_matches([exact[outcome.get("document", 1)]])
+            if on_progress is not None:
+                on_progress(reused[0]["result"], reused[0]["text"])
+            return reused
+
+    documents = extract_documents_bytes(pdf_bytes)
+    count = len(documents)
+    tenant = current_tenant()
+
+    def run(document: int, data: Dict[str, str]) -> Dict[str, Any]:
+        # worker threads don't inherit the caller's governor tenant
+        with tenant_scope(tenant):
+            return _validate_document(
+                index, version, pdf_hash, document, count, data, generator,
+                on_progress if document == 1 else None, filename, exact.get(document),
+            )
+
+    if count == 1:
+        return [run(1, documents[0])]
+    if max_workers is None:
+        max_workers = get_int_setting("REFERRAL_MAX_WORKERS", 8)
+    workers = max(1, min(count, int(max_workers)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="referral") as pool:
+        return list(pool.map(run, range(1, count + 1), documents))
+
+
+def validate_pdf(
+    pdf_bytes: bytes,
+    generator,
+    on_progress: Optional[Callable[[str, str], None]] = None,
+    filename: str = "",
+) -> Dict[str, Any]:
+    """The first referral's outcome of validate_referrals, for callers that handle one form per PDF."""
+    return validate_referrals(pdf_bytes, generator, on_progress, filename)[0]
+
+
+def validate_fields(data: Dict[str, str], generator, on_progress: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    """Sanity check -> reply for one referral's already extracted fields."""
+    check: List[str] = data_sanity_check(data)
+    if on_progress is None:
+        reply_text = generator.generate(dict_to_lines(data), check, data)
+    else:
+        stream = VerdictStream(generator.generate_stream(dict_to_lines(data), check, data))
+        explanation = ""
+        on_progress(stream.verdict, explanation)
+        for piece in stream:
+            explanation += piece
+            on_progress(stream.verdict, explanation)
+        reply_text = stream.reply
+    result, text = parse_verdict(reply_text)
+    return {
+        "data": data,
+        "check": check,
+        "reply": reply_text,
+        "result": result,
+        "text": text,
+        "record": build_record(data, result, check, reply_text),
+    }
@@ -0,0 +1,70 @@
+# chatbot/reply_cache.py
+"""
+Cache of LLM replies for forms the deterministic renderer can't decide.
+
+The prompt only uses the form text for its spam step, so two forms with the
+same issues and the same spam-relevant shape get the same reply. Keys are
+built from:
+  - the prompt version (a hash of the prompt template, so editing the
+    prompt invalidates every entry without a manual flush)
+  - the chat deployment name
+  - the canonical issue list (stripped, de-duplicated, sorted)
+  - spam features of the form, rounded so near-identical forms share a key
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from chatbot.cache import TieredCache, content_key
+from chatbot.reply_renderer import spam_features
+from chatbot.settings import get_int_setting, get_setting
+
+
+_DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache" / "replies"
+_cache: Optional[TieredCache] = None
+
+
+def _get_cache() -> TieredCache:
+    global _cache
+    if _cache is None:
+        _cache = TieredCache(
+            "replies",
+            max_items=get_int_setting("REPLY_CACHE_MAX_ITEMS", 512),
+            disk_dir=get_setting("REPLY_CACHE_DIR", str(_DEFAULT_CACHE_DIR)),
+            max_disk_bytes=get_int_setting("REPLY_CACHE_MAX_MB", 20) * 1024 * 1024,
+            ttl_seconds=get_int_setting("REPLY_CACHE_TTL_HOURS", 24 * 7) * 3600,
+        )
+    return _cache
+
+
+def canonical_issues(check) -> List[str]:
+    issues = check if isinstance(check, list) else str(check or "").split("|")
+    return sorted({str(i).strip() for i in issues if str(i).strip()})
+
+
+def _rounded_features(data: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    return {k: round(v, 1) if isinstance(v, float) else v for k, v in spam_features(data).items()}
+
+
+def reply_cache_key(prompt_version: str, deployment: str, check, data: Optional[Dict[str, str]]) -> str:
+    return content_key(
+        prompt_version,
+        deployment or "",
+        json.dumps(canonical_issues(check)),
+        json.dumps(_rounded_features(data), sort_keys=True),
+    )
+
+
+def get_reply(key: str) -> Optional[str]:
+    return _get_cache().get(key)
+
+
+def set_reply(key: str, reply: str) -> None:
+    # only well-formed verdicts are worth replaying
+    if (reply or "").strip().split(None, 1)[:1] in (["PASS"], ["FAIL"]):
+        _get_cache().set(key, reply)
+
+
+def reply_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the reply cache."""
+    return _get_cache().stats()
@@ -1,18 +1,20 @@
-class ReplyGenerator:
-    def __init__(self, openai_client):
-        self.client = openai_client
+import asyncio
 
-    def generate(self, form_data_text, check):
+from chatbot.cache import content_key
+from chatbot.governor import estimate_tokens
+from chatbot.reply_cache import get_reply, reply_cache_key, set_reply
+from chatbot.reply_renderer import record_outcome, render_reply
+from chatbot.sanity_check import RULES
+from chatbot.settings import get_int_setting, get_setting
 
-        if isinstance(check, list):
-            if len(check) == 1 and check[0].strip().upper() == "PASS":
-                sanity_str = "PASS"
-            else:
-                sanity_str = " | ".join(str(c) for c in check if str(c).strip())
-        else:
-            sanity_str = str(check or "").strip()
 
-        system_prompt = f"""
+# Static instructions, identical for every form; per-form input goes in a
+# separate user message (see form_input). Note this prefix is only ~780
+# tokens, below the 1024-token minimum of Azure OpenAI's prompt caching, so
+# requests do not get cache hits from it today (the metrics page's cached
+# prompt tokens show whether that changes). The saving comes from the compact
+# form message.
+SYSTEM_PROMPT = """
 You are the Surgical Referral Form Checker Copilot.
 
 You ONLY output:
@@ -101,15 +103,162 @@ STYLE RULES
 - Assume meaningful text is intentional unless clearly spam-like
 
 -----------------------------------------------------
-BEGIN INPUT
-SanityCheckResult:
-{sanity_str}
-
-Extracted Form Data:
-{form_data_text}
-END INPUT
+INPUT
+-----------------------------------------------------
+The user message contains:
+- SanityCheckResult: "PASS" or the issues, separated by "|"
+- Form summary: how many fields are empty and how many options are ticked
+- Extracted Form Data: the fields the checks look at (empty ones shown as
+  "(blank)") followed by the other filled-in fields. Long values are cut
+  short and end with "…".
 """
 
-        return self.client.chat_completion([
-            {"role": "system", "content": system_prompt},
-        ])
+# Fields the sanity-check rules read; always sent, even when blank.
+RULE_FIELDS = tuple(dict.fromkeys(
+    name for rule in RULES for name in (getattr(rule, "field", None), getattr(rule, "flag", None), getattr(rule, "text", None)) if name
+))
+FIELD_MAX_CHARS = get_int_setting("PROMPT_FIELD_MAX_CHARS", 120)
+FORM_MAX_TOKENS = get_int_setting("PROMPT_FORM_MAX_TOKENS", 400)
+
+
+def _truncate(value, limit):
+    return value if len(value) <= limit else value[:limit - 1].rstrip() + "…"
+
+
+def _sanity_str(check):
+    if isinstance(check, list):
+        if len(check) == 1 and check[0].strip().upper() == "PASS":
+            return "PASS"
+        return " | ".join(str(c) for c in check if str(c).strip())
+    return str(check or "").strip()
+
+
+def form_input(data, check):
+    """
+    Compact per-form user message: the sanity-check result, a one-line form
+    summary (what the spam step needs), the rule fields, then other filled-in
+    fields until the FORM_MAX_TOKENS budget is spent. Empty non-rule fields
+    are only counted, never listed.
+    """
+    fields = {k: str(v or "").strip() for k, v in (data or {}).items()}
+    values = [v for k, v in fields.items() if k != "Program name"]
+    flags = [v for v in values if v in ("Yes", "No")]
+    summary = (
+        f"{len(values)} fields, {sum(1 for v in values if not v)} empty, "
+        f"{sum(1 for v in flags if v == 'Yes')} of {len(flags)} options ticked"
+    )
+
+    lines = [f"{name}: {_truncate(fields.get(name, ''), FIELD_MAX_CHARS) or '(blank)'}" for name in RULE_FIELDS]
+    budget = FORM_MAX_TOKENS - estimate_tokens("\n".join(lines))
+    extra = [(k, v) for k, v in fields.items() if v and k not in RULE_FIELDS]
+    for i, (name, value) in enumerate(extra):
+        line = f"{name}: {_truncate(value, FIELD_MAX_CHARS)}"
+        cost = estimate_tokens(line) + 1
+        if cost > budget:
+            lines.append(f"(+{len(extra) - i} more filled-in fields not shown)")
+            break
+        lines.append(line)
+        budget -= cost
+
+    return (
+        f"SanityCheckResult:\n{_sanity_str(check)}\n\n"
+        f"Form summary: {summary}\n\n"
+        "Extracted Form Data:\n" + "\n".join(lines)
+    )
+
+
+def _lines_to_dict(form_data_text):
+    """Inverse of dict_to_lines, for callers that only pass the text."""
+    data = {}
+    for line in (form_data_text or "").splitlines():
+        name, sep, value = line.partition(": ")
+        if sep:
+            data[name] = value
+    return data
+
+
+class ReplyGenerator:
+    def __init__(self, openai_client):
+        self.client = openai_client
+        self._prompt_version = None
+
+    def generate(self, form_data_text, check, data=None):
+        """
+        Reply for a validated form. Decided outcomes (PASS, wrong form, known
+        issues on a clearly real or clearly blank form) are rendered locally,
+        repeat patterns come from the reply cache, and only new ambiguous
+        cases cost a chat completion.
+        """
+        reply, key = self.reply_without_llm(form_data_text, check, data)
+        if reply is not None:
+            return reply
+        reply = self.client.chat_completion(self.build_messages(form_data_text, check, data))
+        set_reply(key, reply)
+        return reply
+
+    def generate_stream(self, form_data_text, check, data=None):
+        """
+        Same as generate, but yields the reply in pieces as the LLM streams it.
+        Local and cached replies arrive as a single piece.
+        """
+        reply, key = self.reply_without_llm(form_data_text, check, data)
+        if reply is not None:
+            yield reply
+            return
+        parts = []
+        for piece in self.client.chat_completion_stream(self.build_messages(form_data_text, check, data)):
+            parts.append(piece)
+            yield piece
+        set_reply(key, "".join(parts))
+
+    async def agenerate(self, form_data_text, check, data=None):
+        """
+        Same as generate, for an async client (see openai_client.AsyncOpenAIClient).
+        The reply cache lookup and store touch its disk tier, so they run on a worker thread.
+        """
+        reply, key = await asyncio.to_thread(self.reply_without_llm, form_data_text, check, data)
+        if reply is not None:
+            return reply
+        reply = await self.client.chat_completion(self.build_messages(form_data_text, check, data))
+        await asyncio.to_thread(set_reply, key, reply)
+        return reply
+
+    def reply_without_llm(self, form_data_text, check, data=None):
+        """
+        (reply, None) when the reply is rendered locally or cached, otherwise
+        (None, cache key) for storing the LLM's answer.
+        """
+        data = data if data is not None else _lines_to_dict(form_data_text)
+        local = self.render_locally(form_data_text, check, data)
+        if local is not None:
+            return local, None
+        key = self.cache_key(check, data)
+        cached = get_reply(key)
+        record_outcome("cached" if cached is not None else "llm")
+        return cached, key
+
+    def render_locally(self, form_data_text, check, data=None):
+        reply = render_reply(check, data if data is not None else _lines_to_dict(form_data_text))
+        if reply is not None:
+            record_outcome("deterministic")
+        return reply
+
+    def prompt_version(self):
+        """Hash of the prompt template (rendered with placeholder inputs)."""
+        if self._prompt_version is None:
+            messages = self.build_messages("Field: {value}", "{check}")
+            self._prompt_version = content_key(
+                *(m["role"] + m["content"] for m in messages), str(FIELD_MAX_CHARS), str(FORM_MAX_TOKENS)
+            )
+        return self._prompt_version
+
+    def cache_key(self, check, data):
+        return reply_cache_key(self.prompt_version(), get_setting("AZURE_OPENAI_DEPLOYMENT", ""), check, data)
+
+    def build_messages(self, form_data_text, check, data=None):
+        """Static system prefix + compact per-form user message."""
+        data = data if data is not None else _lines_to_dict(form_data_text)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": form_input(data, check)},
+        ]
@@ -0,0 +1,141 @@
+# chatbot/reply_renderer.py
+import re
+import threading
+from typing import Dict, Optional
+
+from chatbot import sanity_check as sc
+
+
+# Fixed replies the system prompt asks the model to output verbatim.
+PASS_REPLY = "PASS"
+WRONG_FORM_REPLY = "FAIL\nwrong form — this does not appear to be the FAST General Surgery Referral form."
+SPAM_REPLY = "FAIL\nThis submission appears mostly blank or unclear. Please try again."
+
+# sanity-check message -> (error title, polite explanation)
+ISSUE_REPLIES = {
+    sc.SURGEON_BOTH: (
+        "Surgeon Error",
+        "Please choose only one routing option: either the next available surgeon or a specific hospital or surgeon, not both.",
+    ),
+    sc.SURGEON_NEITHER: (
+        "Surgeon Error",
+        "Please choose one routing option: either the next available surgeon or a specific hospital or surgeon.",
+    ),
+    sc.FIT_REASON_WITHOUT_CHECK: (
+        "Positive FIT Error",
+        "A reason for ineligibility was provided, so please also check the Positive FIT option.",
+    ),
+    sc.FIT_CHECK_WITHOUT_REASON: (
+        "Positive FIT Error",
+        "Positive FIT is selected, so please also provide the matching reason for ineligibility.",
+    ),
+    sc.OTHER_TEXT_WITHOUT_CHECK: (
+        "Other Condition Error",
+        "A description was provided for Other Condition, so please also check the Other Condition option.",
+    ),
+    sc.OTHER_CHECK_WITHOUT_TEXT: (
+        "Other Condition Error",
+        "Other Condition is selected, so please provide a brief description of the condition.",
+    ),
+}
+
+PLACEHOLDER_VALUES = {"none", "non", "n/a", "na", "nil", "null", "-", "--", ".", "x", "xx", "test", "asdf"}
+_REPEATED_CHARS = re.compile(r"^(.)\1{2,}$")
+
+_stats_lock = threading.Lock()
+_stats = {"deterministic": 0, "cached": 0, "llm": 0}
+
+
+# ----- spam / blank-form heuristic -----
+def _is_placeholder(value: str) -> bool:
+    v = value.strip().lower()
+    return v in PLACEHOLDER_VALUES or bool(_REPEATED_CHARS.match(v.replace(" ", "")))
+
+
+def spam_features(data: Dict[str, str]) -> Dict[str, float]:
+    """The form properties the spam step looks at (field values themselves are not needed)."""
+    fields = {k: str(v or "").strip() for k, v in (data or {}).items() if k != "Program name"}
+    values = list(fields.values())
+    flags = [v for v in values if v in ("Yes", "No")]
+    texts = [v for v in values if v and v not in ("Yes", "No")]
+    return {
+        "fields": len(values),
+        "flags": len(flags),
+        "empty_ratio": (sum(1 for v in values if not v) / len(values)) if values else 1.0,
+        "placeholder_ratio": (sum(1 for v in texts if _is_placeholder(v)) / len(texts)) if texts else 0.0,
+        "yes_ratio": (sum(1 for v in flags if v == "Yes") / len(flags)) if flags else 0.0,
+        "has_text": bool(texts),
+        "meaningful_text": any(not _is_placeholder(v) and len(v) > 2 for v in texts),
+    }
+
+
+def spam_verdict(data: Dict[str, str]) -> str:
+    """
+    Local version of the prompt's spam step.
+    Returns "spam", "ok", or "unsure" (only "unsure" needs the LLM).
+    """
+    f = spam_features(data)
+    if not f["fields"]:
+        return "spam"
+
+    # most fields empty, or mostly filler text
+    if f["empty_ratio"] >= 0.9 or (f["has_text"] and f["placeholder_ratio"] >= 0.75 and not f["meaningful_text"]):
+        return "spam"
+    # nearly every option ticked without meaningful detail
+    if f["flags"] >= 5 and f["yes_ratio"] >= 0.9 and not f["meaningful_text"]:
+        return "spam"
+
+    # clearly a real, filled-in form
+    if f["empty_ratio"] < 0.6 and f["placeholder_ratio"] < 0.25 and f["yes_ratio"] < 0.6:
+        return "ok"
+    return "unsure"
+
+
+# ----- renderer -----
+def render_reply(check, data: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Build the PASS/FAIL reply locally when the outcome is already decided.
+    Returns None for ambiguous cases (possible spam, unrecognised issues),
+    which still go to the LLM.
+    """
+    issues = check if isinstance(check, list) else [c for c in str(check or "").split("|")]
+    issues = [str(i).strip() for i in issues if str(i).strip()]
+
+    if not issues or (len(issues) == 1 and issues[0].upper() == "PASS"):
+        return PASS_REPLY
+    if "wrong_form" in sc.issue_categories(issues):
+        return WRONG_FORM_REPLY
+    if any(issue not in ISSUE_REPLIES for issue in issues):
+        return None
+
+    verdict = spam_verdict(data)
+    if verdict == "spam":
+        return SPAM_REPLY
+    if verdict == "unsure":
+        return None
+
+    titles, sentences = [], []
+    for issue in issues:
+        title, sentence = ISSUE_REPLIES[issue]
+        if title not in titles:
+            titles.append(title)
+        sentences.append(sentence)
+
+    if len(titles) == 1:
+        return f"FAIL\n{titles[0]}: {' '.join(sentences)}"
+    return f"FAIL\n{' and '.join(titles)}: A few items on the form need correction. {' '.join(sentences)}"
+
+
+def record_outcome(source: str) -> None:
+    """Count one reply by where it came from: "deterministic", "cached" or "llm"."""
+    with _stats_lock:
+        _stats[source] += 1
+
+
+def reply_stats() -> Dict[str, float]:
+    """How many replies were rendered locally, served from the reply cache or by the LLM."""
+    with _stats_lock:
+        s = dict(_stats)
+    total = s["deterministic"] + s["cached"] + s["llm"]
+    s["bypass_rate"] = (s["deterministic"] + s["cached"]) / total if total else 0.0
+    return s
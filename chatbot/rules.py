@@ -0,0 +1,185 @@
+# chatbot/rules.py
+"""
+Declarative validation rules, compiled once into a fast validator.
+
+A rule table is a list of rule objects (see chatbot/sanity_check.RULES):
+
+    EqualsRule(field, expected, message)
+        fails with `message` unless the stripped field value == expected
+    PairRule(flag, text, text_when_yes, mismatch_message, fallback_message)
+        a Yes/No checkbox and its companion text field. With
+        text_when_yes=True the valid states are Yes+text and No+blank
+        (Positive FIT, Other Condition); with False they are Yes+blank and
+        No+text (surgeon routing). The "No+text" (resp. "Yes+text") state
+        reports `mismatch_message`, every other invalid state
+        `fallback_message`.
+
+Any rule can set stop=True to skip the remaining rules when it fails.
+compile_rules() returns a CompiledValidator that runs per record
+(`validate`) or over a whole DataFrame (`validate_frame`) and produces the
+same error strings either way. numpy/pandas are only imported by the frame
+path, so per-record validation doesn't pay for them.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+@dataclass(frozen=True)
+class EqualsRule:
+    field: str
+    expected: str
+    message: str
+    stop: bool = False
+
+
+@dataclass(frozen=True)
+class PairRule:
+    flag: str
+    text: str
+    text_when_yes: bool
+    mismatch_message: str
+    fallback_message: str
+    stop: bool = False
+
+
+def _clean(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+# ----- per-record compilation -----
+def _compile_equals(rule: EqualsRule) -> Callable[[Dict[str, Any]], Optional[str]]:
+    field, expected, message = rule.field, rule.expected, rule.message
+
+    def check(data):
+        return None if _clean(data.get(field)) == expected else message
+    return check
+
+
+def _compile_pair(rule: PairRule) -> Callable[[Dict[str, Any]], Optional[str]]:
+    flag, text = rule.flag, rule.text
+    mismatch, fallback = rule.mismatch_message, rule.fallback_message
+    # valid states, checked first since almost every form is valid
+    ok_states = {("YES", True), ("NO", False)} if rule.text_when_yes else {("YES", False), ("NO", True)}
+    mismatch_state = ("NO", True) if rule.text_when_yes else ("YES", True)
+
+    def check(data):
+        state = (_clean(data.get(flag)).upper(), _clean(data.get(text)) != "")
+        if state in ok_states:
+            return None
+        return mismatch if state == mismatch_state else fallback
+    return check
+
+
+# ----- frame compilation -----
+def _frame_clean(df: "pd.DataFrame", name: str, upper: bool = False) -> "np.ndarray":
+    """
+    Stripped (optionally upper-cased) string value per row; a missing column,
+    NaN or None reads as "". Columns hold few distinct values, so each distinct
+    value is cleaned once and broadcast back through the factorized codes
+    instead of running string ops on every row.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if name not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    codes, uniques = pd.factorize(df[name])
+    cleaned = [_clean(u) for u in uniques]
+    if upper:
+        cleaned = [c.upper() for c in cleaned]
+    return np.array(cleaned + [""], dtype=object)[codes]  # code -1 (NaN / None) picks the trailing ""
+
+
+def _frame_codes(rule, df: "pd.DataFrame") -> "np.ndarray":
+    """Per-row outcome code: 0 = OK, 1 = primary message, 2 = fallback message."""
+    import numpy as np
+
+    if isinstance(rule, EqualsRule):
+        return (_frame_clean(df, rule.field) != rule.expected).astype(np.int8)
+
+    flag = _frame_clean(df, rule.flag, upper=True)
+    yes, no = flag == "YES", flag == "NO"
+    has_text = _frame_clean(df, rule.text) != ""
+    if rule.text_when_yes:
+        ok = (yes & has_text) | (no & ~has_text)
+        mismatch = no & has_text
+    else:
+        ok = (yes & ~has_text) | (no & has_text)
+        mismatch = yes & has_text
+    return np.where(ok, 0, np.where(mismatch, 1, 2)).astype(np.int8)
+
+
+def _messages(rule) -> Sequence[str]:
+    if isinstance(rule, EqualsRule):
+        return (rule.message,)
+    return (rule.mismatch_message, rule.fallback_message)
+
+
+class CompiledValidator:
+    """Validator built by compile_rules(); returns ["PASS"] when no rule fails."""
+
+    def __init__(self, rules: Sequence[Any]):
+        self.rules = tuple(rules)
+        compilers = {EqualsRule: _compile_equals, PairRule: _compile_pair}
+        self._checks = tuple((compilers[type(r)](r), r.stop) for r in self.rules)
+        self._frame_tables = None  # built by the first validate_frame call
+
+    def validate(self, data: Dict[str, Any]) -> List[str]:
+        errors = []
+        for check, stop in self._checks:
+            message = check(data)
+            if message is not None:
+                errors.append(message)
+                if stop:
+                    break
+        return errors or ["PASS"]
+
+    def _tables(self):
+        """Frame path lookups: message_table[rule, code] and which rules short-circuit."""
+        if self._frame_tables is None:
+            import numpy as np
+
+            padded = [(None,) + tuple(_messages(r)) + (None,) * (2 - len(_messages(r))) for r in self.rules]
+            self._frame_tables = (
+                np.array(padded, dtype=object),
+                np.array([r.stop for r in self.rules], dtype=bool),
+            )
+        return self._frame_tables
+
+    def validate_frame(self, df: "pd.DataFrame") -> "pd.Series":
+        """
+        Per-row error lists for a DataFrame of records (one column per field).
+        Rules run as column operations; rows are then grouped by their
+        combination of outcome codes, so each distinct error list is built once.
+        """
+        import numpy as np
+        import pandas as pd
+
+        if df.empty:
+            return pd.Series([], index=df.index, dtype=object)
+
+        codes = np.ascontiguousarray(np.column_stack([_frame_codes(rule, df) for rule in self.rules]))
+        # one opaque bytes key per row makes np.unique a 1-D sort
+        keys = codes.view(np.dtype((np.void, codes.shape[1]))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        combos = codes[first]
+        message_table, stop_mask = self._tables()
+
+        outcomes = []
+        for combo in combos:
+            failed = np.flatnonzero(combo)
+            if stop_mask.any():
+                stops = failed[stop_mask[failed]]
+                if len(stops):
+                    failed = failed[failed <= stops[0]]
+            outcomes.append(message_table[failed, combo[failed]].tolist() or ["PASS"])
+
+        return pd.Series([list(outcomes[i]) for i in inverse.ravel()], index=df.index, dtype=object)
+
+
+def compile_rules(rules: Sequence[Any]) -> CompiledValidator:
+    return CompiledValidator(rules)
@@ -1,73 +1,81 @@
-def data_sanity_check(data: dict) -> list:
-    """
-    Deterministic data sanity validation.
-    Returns a list of error messages.
-    If everything passes, returns ["PASS"].
-    """
-
-    errors = []
-
-    # Required program name
-    required_program_name = "Edmonton Zone FAST Program Facilitated Access to Surgical Treatment"
-    program_name = data.get("Program name")
-
-    if program_name is None or str(program_name).strip() != required_program_name:
-        errors.append("Wrong form: Program name does not match required value.")
-
-    # Helpers
-    def is_yes(value):
-        return str(value).strip().upper() == "YES"
+from chatbot.rules import EqualsRule, PairRule, compile_rules
+from chatbot.metrics import span
 
-    def is_no(value):
-        return str(value).strip().upper() == "NO"
 
-    def has_text(value):
-        return value is not None and str(value).strip() != ""
+# Error messages. ReplyGenerator, the reply renderer and the dashboard's
+# highlight_errors key off this exact wording, so change it with care.
+WRONG_FORM = "Wrong form: Program name does not match required value."
+SURGEON_BOTH = "Invalid surgeon routing: cannot have both next available and a specific surgeon selected."
+SURGEON_NEITHER = "Invalid surgeon routing: must have either a next available or a specific surgeon selected not neither."
+FIT_REASON_WITHOUT_CHECK = "Invalid FIT section: If you provided an Ineligibility reason you must also select Positive FIT not just the Ineligibility reason."
+FIT_CHECK_WITHOUT_REASON = "Invalid FIT section: If you select Positive FIT you must also provide aan Ineligibility reason not just the Positive FIT."
+OTHER_TEXT_WITHOUT_CHECK = "Invalid Other Condition section: Please check the other condition box since you provided other condition description."
+OTHER_CHECK_WITHOUT_TEXT = "Invalid Other Condition section: Please provide other condition descritption since you checked off the other condition option."
 
-    # Extract fields
-    next_available = data.get("Refer to Next Available Surgeon")
-    surgeon_name = data.get("Refer to Specific Hospital or Surgeon")
 
-    positive_fit = data.get("Positive FIT")
-    reason_ineligibility = data.get("Reason for Ineligibility")
+PROGRAM_NAME = "Edmonton Zone FAST Program Facilitated Access to Surgical Treatment"
 
-    other_condition_flag = data.get("Other Condition Check")
-    other_condition_text = data.get("Other Condition")
-
-    # --- Surgeon Routing Logic ---
-    if is_yes(next_available) and not has_text(surgeon_name):
-        pass  # OK
-    elif is_no(next_available) and has_text(surgeon_name):
-        pass  # OK
-    elif is_yes(next_available) and has_text(surgeon_name):
-        errors.append("Invalid surgeon routing: cannot have both next available and a specific surgeon selected.")
-    else:
-        errors.append("Invalid surgeon routing: must have either a next available or a specific surgeon selected not neither.")
+# Declarative rule table, evaluated in order. Add new checks here rather
+# than as new branches; see chatbot/rules.py for the rule types.
+RULES = [
+    # Required program name
+    EqualsRule("Program name", PROGRAM_NAME, WRONG_FORM),
+    # Surgeon routing: next available XOR a specific hospital / surgeon
+    PairRule(
+        "Refer to Next Available Surgeon", "Refer to Specific Hospital or Surgeon",
+        text_when_yes=False, mismatch_message=SURGEON_BOTH, fallback_message=SURGEON_NEITHER,
+    ),
+    # Positive FIT needs an ineligibility reason (and vice versa)
+    PairRule(
+        "Positive FIT", "Reason for Ineligibility",
+        text_when_yes=True, mismatch_message=FIT_REASON_WITHOUT_CHECK, fallback_message=FIT_CHECK_WITHOUT_REASON,
+    ),
+    # Other Condition needs a description (and vice versa)
+    PairRule(
+        "Other Condition Check", "Other Condition",
+        text_when_yes=True, mismatch_message=OTHER_TEXT_WITHOUT_CHECK, fallback_message=OTHER_CHECK_WITHOUT_TEXT,
+    ),
+]
+
+VALIDATOR = compile_rules(RULES)
 
 
-    # --- Positive FIT Logic ---
-    if is_yes(positive_fit) and has_text(reason_ineligibility):
-        pass
-    elif is_no(positive_fit) and not has_text(reason_ineligibility):
-        pass
-    elif is_no(positive_fit) and has_text(reason_ineligibility):
-        errors.append("Invalid FIT section: If you provided an Ineligibility reason you must also select Positive FIT not just the Ineligibility reason.")
-    else:
-        errors.append("Invalid FIT section: If you select Positive FIT you must also provide aan Ineligibility reason not just the Positive FIT.")
+def data_sanity_check(data: dict) -> list:
+    """
+    Deterministic data sanity validation.
+    Returns a list of error messages.
+    If everything passes, returns ["PASS"].
+    """
+    with span("sanity_check"):
+        return VALIDATOR.validate(data)
 
 
-    # --- Other Condition Logic ---
-    if is_yes(other_condition_flag) and has_text(other_condition_text):
-        pass
-    elif is_no(other_condition_flag) and not has_text(other_condition_text):
-        pass
-    elif is_no(other_condition_flag) and  has_text(other_condition_text):
-        errors.append("Invalid Other Condition section: Please check the other condition box since you provided other condition description.")
-    else:
-        errors.append("Invalid Other Condition section: Please provide other condition descritption since you checked off the other condition option.")
+# Issue category -> prefix of the messages data_sanity_check produces for it.
+# Used to render replies locally and to tag saved forms.
+ISSUE_CATEGORIES = {
+    "wrong_form": "Wrong form:",
+    "surgeon": "Invalid surgeon routing:",
+    "fit": "Invalid FIT section:",
+    "other_condition": "Invalid Other Condition section:",
+}
 
 
-    # Final result
-    if errors:
-        return errors
-    return ["PASS"]
+def issue_categories(check) -> list:
+    """
+    Map sanity-check issues to categories (in issue order, no duplicates).
+    Unrecognised issues are reported as "unknown"; ["PASS"] gives [].
+    """
+    if not isinstance(check, list):
+        check = [c for c in str(check or "").split("|")]
+    categories = []
+    for issue in check:
+        text = str(issue).strip()
+        if not text or text.upper() == "PASS":
+            continue
+        category = next(
+            (name for name, prefix in ISSUE_CATEGORIES.items() if text.lower().startswith(prefix.lower())),
+            "unknown",
+        )
+        if category not in categories:
+            categories.append(category)
+    return categories
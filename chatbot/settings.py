@@ -0,0 +1,42 @@
+# chatbot/settings.py
+import os
+from typing import Any, Optional
+
+import streamlit as st
+
+
+def get_setting(name: str, default: Optional[Any] = None) -> Any:
+    """
+    Read an optional setting from Streamlit secrets, falling back to an
+    environment variable of the same name and finally to `default`.
+    Use require_setting for credentials that must be present.
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass  # no secrets.toml (e.g. CLI / benchmark runs)
+    return os.environ.get(name, default)
+
+
+def require_setting(name: str, hint: str = "...") -> Any:
+    """
+    Required setting (Streamlit secrets, then environment). Raises a
+    RuntimeError telling the user what to add when it is missing.
+    """
+    value = get_setting(name)
+    if value in (None, ""):
+        raise RuntimeError(
+            f"Missing {name} in Streamlit secrets.\n"
+            "Go to your Streamlit app → ⋯ → Edit secrets and add:\n"
+            f'{name} = "{hint}"'
+        )
+    return value
+
+
+def get_int_setting(name: str, default: int) -> int:
+    """Same as get_setting, coerced to int (bad values fall back to `default`)."""
+    try:
+        return int(get_setting(name, default))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,127 @@
+# pages/bulk_validation.py
+import io
+import pandas as pd
+import streamlit as st
+from pathlib import Path
+
+from chatbot.batch import DEFAULT_MAX_WORKERS, expand_uploads, summary_row, validate_many
+from chatbot.governor import session_tenant, tenant_scope
+from chatbot.persist_queue import enqueue_save
+from chatbot.openai_client import OpenAIClient
+from chatbot.reply_generator import ReplyGenerator
+
+
+st.set_page_config(page_title="Bulk Validation", page_icon="📚", layout="wide")
+
+app_root = Path(__file__).resolve().parents[1]
+logo_path = app_root / "cpe-government-of-alberta-logo.jpg"
+if logo_path.exists():
+    st.image(str(logo_path), width=220)
+
+st.title("Bulk Validation")
+
+# results of the last batch: list of (file name, outcome)
+if "bulk_results" not in st.session_state:
+    st.session_state.bulk_results = []
+
+
+# ----- helpers -----
+def records_to_csv_bytes(records: list) -> bytes:
+    df = pd.DataFrame(records)
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue().encode("utf-8")
+
+
+def batch_records(results: list) -> list:
+    """Export rows (same columns as a single-form CSV) plus the source file name."""
+    rows = []
+    for name, outcome in results:
+        if "record" in outcome:
+            rows.append({"source_file": name, **outcome["record"]})
+    return rows
+
+
+# ----- input -----
+uploads = st.file_uploader(
+    "Upload Surgical Referral PDFs (or a .zip of PDFs)",
+    type=["pdf", "zip"],
+    accept_multiple_files=True,
+    key="bulk_upload_box",
+)
+concurrency = st.slider(
+    "Concurrent validations", min_value=1, max_value=16, value=min(DEFAULT_MAX_WORKERS, 16)
+)
+
+if st.button("Validate all"):
+    if not uploads:
+        st.error("Please upload at least one PDF first.")
+        st.stop()
+
+    pdfs = expand_uploads((u.name, u.read()) for u in uploads)
+    if not pdfs:
+        st.error("No PDF files found in the upload.")
+        st.stop()
+
+    generator = ReplyGenerator(OpenAIClient())
+    progress = st.progress(0.0, text=f"Validating 0 / {len(pdfs)}")
+    table = st.empty()
+
+    results, rows, done = [], [], 0
+    # this batch's Azure calls queue behind other sessions' fairly, not ahead of them
+    with tenant_scope(session_tenant()):
+        for name, outcome in validate_many(pdfs, generator, max_workers=concurrency):
+            results.append((name, outcome))
+            rows.append(summary_row(name, outcome))
+            table.dataframe(pd.DataFrame(rows), use_container_width=True)
+            # a bundle yields one outcome per referral, the last one finishes its PDF
+            done += outcome.get("document", 1) == outcome.get("documents", 1)
+            progress.progress(done / len(pdfs), text=f"Validating {done} / {len(pdfs)}")
+
+    st.session_state.bulk_results = results
+    st.rerun()
+
+
+# ----- results -----
+results = st.session_state.bulk_results
+if not results:
+    st.info("No batch yet. Upload PDFs above and click Validate all.")
+    st.stop()
+
+summary = pd.DataFrame([summary_row(name, outcome) for name, outcome in results])
+counts = summary["result"].value_counts()
+st.subheader("Batch Result")
+st.caption(
+    f"{len(summary)} forms — PASS: {counts.get('PASS', 0)}, "
+    f"FAIL: {counts.get('FAIL', 0)}, ERROR: {counts.get('ERROR', 0)}"
+)
+st.dataframe(summary, use_container_width=True)
+
+records = batch_records(results)
+col1, col2 = st.columns(2)
+
+with col1:
+    st.download_button(
+        "Download batch CSV",
+        data=records_to_csv_bytes(records),
+        file_name="surgical_forms_batch.csv",
+        mime="text/csv",
+        key="download_batch_btn",
+        use_container_width=True,
+        disabled=not records,
+    )
+
+with col2:
+    if st.button("Save all to Case Management", key="save_batch_btn", use_container_width=True, disabled=not records):
+        queued, failed = [], []
+        for i, (name, outcome) in enumerate(results):
+            if "record" not in outcome:
+                continue
+            try:
+                queued.append(enqueue_save(outcome["record"], name_suffix=f"{i:04d}"))
+            except Exception as e:
+                failed.append(f"{name}: {e}")
+        if queued:
+            st.success(f"Queued {len(queued)} forms for Case Management ✅ (uploading in the background)")
+        if failed:
+            st.error("Could not queue:\n" + "\n".join(failed))
@@ -1,15 +1,19 @@
 # pages/Forms Browser.py
 import streamlit as st
 import pandas as pd
-from chatbot.blob_reader import list_csv_blobs, read_csv_blob
+from chatbot.blob_reader import invalidate, list_forms, read_csv_blob
+from chatbot.export import DASHBOARD_EXPORT_MAX_FORMS, FORMATS, cli_command, export_file_name, export_to_tempfile
 from pathlib import Path
-from PIL import Image
-from datetime import datetime, date
-import re
+from datetime import datetime, date, timedelta
+
+DEFAULT_DAYS = 30  # date range shown on first load
 
 # ---------- helpers ----------
 def infer_status_from_name(name: str) -> str:
     n = (name or "").lower()
+    folder = n.split("/", 1)[0] if "/" in n else ""
+    if folder in ("pass", "fail"):  # pass/YYYY/MM/DD/form_...csv
+        return folder
     if "pass" in n:
         return "pass"
     if "fail" in n:
@@ -19,18 +23,6 @@ def infer_status_from_name(name: str) -> str:
 def status_icon(status: str) -> str:
     return {"pass": "🟢", "fail": "🔴", "unknown": ""}.get(status, "")
 
-# expects names like: form_YYYY-MM-DD_HH-MM-SS_pass.csv
-TS_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})")
-
-def name_to_dt(name: str):
-    m = TS_REGEX.search(name or "")
-    if not m:
-        return None
-    try:
-        return datetime.strptime(f"{m.group(1)} {m.group(2)}", "%Y-%m-%d %H-%M-%S")
-    except ValueError:
-        return None
-
 
 # ---------- UI ----------
 st.set_page_config(page_title="Forms Dashboard", page_icon="📂", layout="wide")
@@ -47,24 +39,12 @@ st.markdown("""
 app_root = Path(__file__).resolve().parents[1]
 logo_path = app_root / "cpe-government-of-alberta-logo.jpg"
 if logo_path.exists():
-    st.image(Image.open(logo_path), width=220)
+    st.image(str(logo_path), width=220)
 
 st.title("Forms Dashboard")
 
 
-# ---- load blobs ----
 container = "filled-forms"
-blobs_df = list_csv_blobs(container)
-
-st.subheader("Open a form")
-if blobs_df.empty:
-    st.info("No files to open.")
-    st.stop()
-
-# add derived columns
-blobs_df = blobs_df.copy()
-blobs_df["status"] = blobs_df["name"].map(infer_status_from_name)
-blobs_df["timestamp"] = blobs_df["name"].map(name_to_dt)
 
 
 # ---- sidebar filters ----
@@ -77,42 +57,31 @@ with st.sidebar:
         "Status", options=status_options, default=status_options
     )
 
-    # date filter
-    ts_only = blobs_df.dropna(subset=["timestamp"])
-    date_range = None
-    if ts_only.empty:
-        st.caption("No timestamps found in filenames.")
-    else:
-        min_dt, max_dt = ts_only["timestamp"].min(), ts_only["timestamp"].max()
-        default = (min_dt.date(), max_dt.date())
-
-        date_input = st.date_input("Date range", default)
+    # date filter (UTC save dates)
+    today = datetime.utcnow().date()
+    default = (today - timedelta(days=DEFAULT_DAYS - 1), today)
+    date_input = st.date_input("Date range", default)
 
-        if isinstance(date_input, tuple) and len(date_input) == 2:
-            start_date, end_date = date_input
-        elif isinstance(date_input, date):
-            start_date = end_date = date_input
-        else:
-            start_date, end_date = default
-
-        date_range = (start_date, end_date)
+    if isinstance(date_input, tuple) and len(date_input) == 2:
+        start_date, end_date = date_input
+    elif isinstance(date_input, date):
+        start_date = end_date = date_input
+    else:
+        start_date, end_date = default
 
+    st.divider()
+    # moving the whole archive is a batch job, not something to run inside a rerun
+    st.caption(
+        "Forms saved before the status/date folders are still listed. "
+        "Move them into the folders with `python -m chatbot.blob_layout`."
+    )
 
-# ---- apply filters ----
-filtered = blobs_df[blobs_df["status"].isin(selected_status)].copy()
 
-if date_range:
-    start_dt = datetime.combine(date_range[0], datetime.min.time())
-    end_dt   = datetime.combine(date_range[1], datetime.max.time())
-    has_ts = filtered["timestamp"].notna()
+# ---- load blobs ----
+# filters are pushed down: only the status/date folders inside the window are listed
+filtered = list_forms(container, start_date, end_date, selected_status)
 
-    filtered = pd.concat(
-        [
-            filtered[~has_ts],
-            filtered[has_ts & filtered["timestamp"].between(start_dt, end_dt)]
-        ],
-        ignore_index=True
-    )
+st.subheader("Open a form")
 
 filtered = filtered.sort_values(
     by=["timestamp", "name"], ascending=[False, True], na_position="last"
@@ -123,6 +92,28 @@ if filtered.empty:
     st.stop()
 
 
+# ---- bulk export ----
+with st.expander(f"Export all {len(filtered)} matching forms"):
+    export_formats = {"Combined CSV": "csv", "Combined Parquet": "parquet", "Zip of original CSVs": "zip"}
+    export_label = st.radio("Format", list(export_formats), horizontal=True, key="export_format")
+    export_fmt = export_formats[export_label]
+    export_names = filtered["name"].tolist()
+    if len(export_names) > DASHBOARD_EXPORT_MAX_FORMS:
+        # the served file is held in server memory; big ranges go through the CLI, which writes to disk
+        st.info(f"Exports of more than {DASHBOARD_EXPORT_MAX_FORMS} forms run from the command line:")
+        st.code(cli_command(start_date, end_date, export_fmt, selected_status, container), language="bash")
+    else:
+        # data is a callable: the export is only built when the button is clicked
+        st.download_button(
+            f"Download {export_label.lower()}",
+            data=lambda: export_to_tempfile(container, export_names, export_fmt),
+            file_name=export_file_name(start_date, end_date, export_fmt, selected_status),
+            mime=FORMATS[export_fmt][0],
+            on_click="ignore",
+            use_container_width=True,
+        )
+
+
 # ---- selector ----
 # ---- selector ----
 selected = st.selectbox(
@@ -146,7 +137,16 @@ if selected:
     try:
         df = read_csv_blob(container, selected)
     except Exception as e:
-        st.error(f"Failed to read CSV: {e}")
+        from azure.core.exceptions import ResourceNotFoundError
+
+        if isinstance(e, ResourceNotFoundError):
+            # moved into its dated folder (or deleted) since this process listed it
+            invalidate(container)
+            st.warning("This form is no longer under that name; it was moved or deleted. Reload the list to see it again.")
+            if st.button("Reload list"):
+                st.rerun()
+        else:
+            st.error(f"Failed to read CSV: {e}")
         st.stop()
 
     if df.empty:
@@ -0,0 +1,73 @@
+# pages/metrics.py
+import pandas as pd
+import streamlit as st
+from pathlib import Path
+
+from chatbot import metrics
+from chatbot.governor import governor_stats
+
+
+st.set_page_config(page_title="Pipeline Metrics", page_icon="⏱️", layout="wide")
+
+app_root = Path(__file__).resolve().parents[1]
+logo_path = app_root / "cpe-government-of-alberta-logo.jpg"
+if logo_path.exists():
+    st.image(str(logo_path), width=220)
+
+st.title("Pipeline Metrics")
+st.caption(
+    f"Since this server process started. Percentiles cover the last {metrics.WINDOW} calls per stage; "
+    "counts and buckets are cumulative."
+)
+
+with st.sidebar:
+    if st.button("🔄 Refresh"):
+        st.rerun()
+    if st.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
+
+stages = pd.DataFrame(metrics.stage_summary())
+if stages.empty:
+    st.info("No forms have been processed yet.")
+    st.stop()
+
+# ----- per-stage latency -----
+st.subheader("Stage latency")
+st.dataframe(
+    stages.style.format({c: "{:.1f}" for c in ("mean_ms", "p50_ms", "p95_ms", "max_ms")}),
+    use_container_width=True,
+    hide_index=True,
+)
+
+slowest = stages.sort_values("p95_ms", ascending=False).iloc[0]
+st.caption(f"Slowest stage by p95: **{slowest['stage']}** ({slowest['p95_ms']:.0f} ms)")
+
+stage = st.selectbox("Histogram for stage", stages["stage"].tolist())
+buckets = pd.DataFrame(metrics.bucket_table(stage))
+st.bar_chart(buckets, x="bucket", y="count")
+
+# ----- tokens / cost -----
+st.subheader("LLM tokens")
+tokens = pd.DataFrame(metrics.token_summary())
+if tokens.empty:
+    st.caption("No chat completions yet.")
+else:
+    st.dataframe(tokens.style.format({"est_cost": "${:.4f}", "prompt_tokens_per_request": "{:.0f}"}), use_container_width=True, hide_index=True)
+
+# ----- rate-limit governors -----
+st.subheader("Rate limits")
+governors = pd.DataFrame(governor_stats())
+if governors.empty:
+    st.caption("No Azure calls yet.")
+else:
+    st.dataframe(governors, use_container_width=True, hide_index=True)
+    st.caption("`limit` is the adaptive concurrency limit; it halves on a 429 and grows back on success.")
+
+# ----- export -----
+st.download_button(
+    "⬇️ Export (Prometheus text format)",
+    data=metrics.to_prometheus().encode("utf-8"),
+    file_name="surgical_forms_metrics.prom",
+    mime="text/plain",
+)